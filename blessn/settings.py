@@ -71,11 +71,11 @@ INSTALLED_APPS = [
     'django.contrib.sites'
 ]
 LOCAL_APPS = [
-    'home',
+    'home.apps.HomeConfig',
     'users.apps.UsersConfig',
     'categories',
     'consumers',
-    'contributors',
+    'contributors.apps.ContributorsConfig',
     'terms_and_conditions',
     'privacy_policy',
     'socialauth',
@@ -83,10 +83,11 @@ LOCAL_APPS = [
     'notifications',
     'dropdowns',
     'orders',
-    'payments',
-    'posts',
-    'chat',
-    'customadmin'
+    'payments.apps.PaymentsConfig',
+    'posts.apps.PostsConfig',
+    'chat.apps.ChatConfig',
+    'customadmin.apps.CustomadminConfig',
+    'search.apps.SearchConfig'
 ]
 THIRD_PARTY_APPS = [
     'rest_framework',
@@ -159,6 +160,18 @@ if env.str("DATABASE_URL", default=None):
     }
 
 
+# Cache
+# https://docs.djangoproject.com/en/2.2/topics/cache/
+# The ranked feed snapshots, the suggestion index version and the banned word
+# matcher version must be shared by every web and Celery process, see
+# home/checks.py. The default keeps them in the database, created by the home
+# migrations, CACHE_URL can point at memcached instead
+
+CACHES = {
+    'default': env.cache("CACHE_URL", default="dbcache://blessn_cache")
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -261,6 +274,10 @@ if USE_S3:
     AWS_DEFAULT_ACL = env.str("AWS_DEFAULT_ACL", "public-read")
     AWS_MEDIA_LOCATION = env.str("AWS_MEDIA_LOCATION", "media")
     AWS_AUTO_CREATE_BUCKET = env.bool("AWS_AUTO_CREATE_BUCKET", True)
+    # Processed videos are uploaded in parts of AWS_S3_UPLOAD_CHUNK_SIZE bytes,
+    # AWS_S3_UPLOAD_CONCURRENCY of them in parallel, see MediaStorage.save_stream
+    AWS_S3_UPLOAD_CHUNK_SIZE = env.int("AWS_S3_UPLOAD_CHUNK_SIZE", 8 * 1024 * 1024)
+    AWS_S3_UPLOAD_CONCURRENCY = env.int("AWS_S3_UPLOAD_CONCURRENCY", 4)
     DEFAULT_FILE_STORAGE = env.str(
         "DEFAULT_FILE_STORAGE", "home.storage_backends.MediaStorage"
     )
@@ -332,3 +349,40 @@ PUBNUB_SUBSCRIBE_KEY = env.str("PUBNUB_SUBSCRIBE_KEY", "")
 CELERY_BROKER_URL = env.str("REDIS_URL", "redis://redis:6379/0")
 CELERY_RESULT_BACKEND = env.str("REDIS_URL", "redis://redis:6379/0")
 REDIS_URL = env.str("REDIS_URL", "redis://redis:6379/0")
+# Picks up the chat outbox events whose dispatch could not be scheduled when they were committed
+CHAT_OUTBOX_DISPATCH_INTERVAL = env.int("CHAT_OUTBOX_DISPATCH_INTERVAL", 60)
+CELERY_BEAT_SCHEDULE = {
+    "dispatch-chat-outbox": {
+        "task": "chat.tasks.dispatch_chat_outbox",
+        "schedule": CHAT_OUTBOX_DISPATCH_INTERVAL,
+        "kwargs": {"reschedule": False},
+    },
+}
+
+# Video watermarking, see orders/video.py
+# Falls back to the ffmpeg binary bundled with moviepy when FFMPEG_BINARY is not set
+FFMPEG_BINARY = env.str("FFMPEG_BINARY", "")
+VIDEO_WATERMARK_PATH = env.str("VIDEO_WATERMARK_PATH", os.path.join(BASE_DIR, "logo.png"))
+VIDEO_ENCODE_PRESET = env.str("VIDEO_ENCODE_PRESET", "veryfast")
+VIDEO_ENCODE_CRF = env.int("VIDEO_ENCODE_CRF", 23)
+# Threads given to each ffmpeg process, 0 lets ffmpeg decide
+VIDEO_ENCODE_THREADS = env.int("VIDEO_ENCODE_THREADS", 0)
+# Videos longer than VIDEO_SEGMENT_THRESHOLD seconds are encoded in segments of
+# VIDEO_SEGMENT_SECONDS, up to VIDEO_ENCODE_WORKERS of them at the same time
+VIDEO_SEGMENT_THRESHOLD = env.int("VIDEO_SEGMENT_THRESHOLD", 120)
+VIDEO_SEGMENT_SECONDS = env.int("VIDEO_SEGMENT_SECONDS", 30)
+VIDEO_ENCODE_WORKERS = env.int("VIDEO_ENCODE_WORKERS", os.cpu_count() or 1)
+# Optional HLS packaging of watermarked videos, as (height, video kbps) renditions
+VIDEO_HLS_ENABLED = env.bool("VIDEO_HLS_ENABLED", False)
+VIDEO_HLS_RENDITIONS = [(360, 800), (540, 1400), (720, 2800), (1080, 5000)]
+VIDEO_HLS_SEGMENT_SECONDS = env.int("VIDEO_HLS_SEGMENT_SECONDS", 6)
+
+# Thumbnails and previews generated for post and contributor media, see home/media.py
+MEDIA_THUMBNAIL_WIDTH = env.int("MEDIA_THUMBNAIL_WIDTH", 320)
+MEDIA_PREVIEW_WIDTH = env.int("MEDIA_PREVIEW_WIDTH", 720)
+MEDIA_PREVIEW_CLIP_WIDTH = env.int("MEDIA_PREVIEW_CLIP_WIDTH", 480)
+MEDIA_PREVIEW_CLIP_SECONDS = env.int("MEDIA_PREVIEW_CLIP_SECONDS", 5)
+
+# Files uploaded by clients straight to S3 with a presigned POST, see home/uploads.py
+DIRECT_UPLOAD_MAX_SIZE = env.int("DIRECT_UPLOAD_MAX_SIZE", 1024 * 1024 * 1024)
+DIRECT_UPLOAD_EXPIRES = env.int("DIRECT_UPLOAD_EXPIRES", 60 * 60)
@@ -11,4 +11,7 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = '__all__'
 
     def get_contributor_count(self, obj):
+        counts = self.context.get('category_contributor_counts')
+        if counts is not None:
+            return counts.get(obj.id, 0)
         return obj.contributor_count()
@@ -0,0 +1,106 @@
+from django.db.models import Case, Count, F, IntegerField, Q, Subquery, When
+from django.db.models.functions import Coalesce
+
+from .models import ChatChannel, ChatInboxEntry, ChatMessage
+
+
+def add_inbox_entries(channel_ids, user_ids):
+    """
+    Creates the inbox entries of users added to channels, every message sent
+    by someone else is unread for them
+    """
+    channels = ChatChannel.objects.filter(id__in=channel_ids).select_related('last_message')
+    unread = {}
+    for user_id in user_ids:
+        counts = ChatMessage.objects.filter(
+            channel_id__in=channel_ids
+        ).exclude(sender_id=user_id).order_by().values('channel_id').annotate(unread=Count('id'))
+        for row in counts:
+            unread[(row['channel_id'], user_id)] = row['unread']
+
+    ChatInboxEntry.objects.bulk_create(
+        [
+            ChatInboxEntry(
+                channel=channel,
+                user_id=user_id,
+                unread_count=unread.get((channel.id, user_id), 0),
+                last_activity_at=channel.last_message.timetoken if channel.last_message else channel.created_at
+            )
+            for channel in channels for user_id in user_ids
+        ],
+        ignore_conflicts=True
+    )
+
+
+def record_message(message):
+    """
+    Makes a new message the last one of its channel, bumping the channel in the
+    inbox of every member and its unread counter for everyone but the sender
+    """
+    ChatChannel.objects.filter(id=message.channel_id).filter(
+        Q(last_message__isnull=True) | Q(last_message__timetoken__lte=message.timetoken)
+    ).update(last_message=message)
+    ChatInboxEntry.objects.filter(channel_id=message.channel_id).update(
+        last_activity_at=message.timetoken,
+        unread_count=Case(
+            When(user_id=message.sender_id, then=F('unread_count')),
+            default=F('unread_count') + 1
+        )
+    )
+
+
+def sent_after(timetoken, message_id):
+    # Messages after (timetoken, id) in the order of chat_message_history_idx
+    return Q(timetoken__gt=timetoken) | Q(timetoken=timetoken, id__gt=message_id)
+
+
+def mark_channel_read(channel, user, message=None):
+    """
+    Moves the read watermark of the user up to a message, the last one of the
+    channel by default, with a single UPDATE of their inbox entry whatever the
+    length of the history. The unread counter is recounted from the messages
+    after the watermark, a range of chat_message_history_idx, so a message
+    arriving meanwhile stays unread. The watermark never moves back.
+    """
+    entry = ChatInboxEntry.objects.filter(channel=channel, user=user)
+    if message is None:
+        message = ChatMessage.objects.filter(channel=channel).order_by('-timetoken', '-id').first()
+    if message is None:
+        return entry.update(unread_count=0)
+
+    unread = ChatMessage.objects.filter(channel=channel).filter(
+        sent_after(message.timetoken, message.id)
+    ).exclude(sender_id=user.id).order_by().values('channel_id').annotate(count=Count('id')).values('count')
+
+    return entry.filter(
+        Q(last_read_at__isnull=True)
+        | Q(last_read_at__lt=message.timetoken)
+        | Q(last_read_at=message.timetoken, last_read_message__isnull=True)
+        | Q(last_read_at=message.timetoken, last_read_message_id__lte=message.id)
+    ).update(
+        last_read_message=message,
+        last_read_at=message.timetoken,
+        unread_count=Coalesce(Subquery(unread, output_field=IntegerField()), 0)
+    )
+
+
+def read_watermarks(channel):
+    """
+    The read watermarks of the members of a channel, as (user_id, timetoken, message_id)
+    """
+    return [
+        (user_id, timetoken, message_id or 0)
+        for user_id, timetoken, message_id in ChatInboxEntry.objects.filter(
+            channel=channel, last_read_at__isnull=False
+        ).values_list('user_id', 'last_read_at', 'last_read_message_id')
+    ]
+
+
+def is_read(message, watermarks):
+    """
+    Whether a member other than the sender has read the message
+    """
+    return any(
+        user_id != message.sender_id and (message.timetoken, message.id) <= (timetoken, message_id)
+        for user_id, timetoken, message_id in watermarks
+    )
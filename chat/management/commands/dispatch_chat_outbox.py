@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from chat.outbox import dispatch_pending
+
+
+class Command(BaseCommand):
+    help = "Publish the chat outbox events that are due to PubNub"
+
+    def handle(self, *args, **kwargs) -> None:
+        processed, next_attempt_at = dispatch_pending()
+        self.stdout.write(self.style.SUCCESS(f"Successfully processed {processed} chat outbox events."))
+        if next_attempt_at is not None:
+            self.stdout.write(f"Next pending event is due at {next_attempt_at}.")
@@ -0,0 +1,33 @@
+# Generated by Django 2.2.28 on 2026-10-18 10:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatOutboxEvent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('channel', models.CharField(max_length=255)),
+                ('message', models.TextField(help_text='The JSON encoded message to publish')),
+                ('sender_id', models.CharField(max_length=255)),
+                ('dedup_key', models.CharField(help_text='Identifies the event, enqueuing the same key again is a no-op', max_length=255, unique=True)),
+                ('status', models.CharField(choices=[('Pending', 'Pending'), ('Published', 'Published'), ('Failed', 'Failed')], default='Pending', max_length=255)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField()),
+                ('last_error', models.TextField(blank=True)),
+                ('published_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='chatoutboxevent',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='chat_outbox_due_idx'),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 2.2.28 on 2026-10-18 10:21
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count
+
+
+def populate_inbox(apps, schema_editor):
+    ChatChannel = apps.get_model('chat', 'ChatChannel')
+    ChatMessage = apps.get_model('chat', 'ChatMessage')
+    ChatInboxEntry = apps.get_model('chat', 'ChatInboxEntry')
+
+    entries = []
+    for channel in ChatChannel.objects.prefetch_related('users').iterator():
+        last_message = ChatMessage.objects.filter(channel=channel).order_by('-timetoken', '-id').first()
+        if last_message:
+            channel.last_message = last_message
+            channel.save(update_fields=['last_message'])
+        unread = dict(
+            ChatMessage.objects.filter(channel=channel, read=False)
+            .order_by().values_list('sender_id').annotate(count=Count('id'))
+        )
+        total_unread = sum(unread.values())
+        for user in channel.users.all():
+            entries.append(ChatInboxEntry(
+                channel=channel,
+                user=user,
+                unread_count=total_unread - unread.get(user.id, 0),
+                last_activity_at=last_message.timetoken if last_message else channel.created_at
+            ))
+    ChatInboxEntry.objects.bulk_create(entries, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('chat', '0002_chatoutboxevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatchannel',
+            name='last_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='chat.ChatMessage'),
+        ),
+        migrations.CreateModel(
+            name='ChatInboxEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unread_count', models.PositiveIntegerField(default=0)),
+                ('last_activity_at', models.DateTimeField()),
+                ('channel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inbox_entries', to='chat.ChatChannel')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chat_inbox_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='chatinboxentry',
+            index=models.Index(fields=['user', '-last_activity_at', '-id'], name='chat_inbox_activity_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='chatinboxentry',
+            unique_together={('channel', 'user')},
+        ),
+        migrations.RunPython(populate_inbox, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.28 on 2026-10-18 10:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_chatinboxentry'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['channel', '-timetoken', '-id'], name='chat_message_history_idx'),
+        ),
+    ]
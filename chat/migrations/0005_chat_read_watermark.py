@@ -0,0 +1,46 @@
+# Generated by Django 2.2.28 on 2026-10-18 10:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_read_watermarks(apps, schema_editor):
+    # The last message sent to a user and flagged as read becomes their watermark
+    ChatMessage = apps.get_model('chat', 'ChatMessage')
+    ChatInboxEntry = apps.get_model('chat', 'ChatInboxEntry')
+
+    entries = []
+    for entry in ChatInboxEntry.objects.iterator():
+        last_read = ChatMessage.objects.filter(channel_id=entry.channel_id, read=True).exclude(
+            sender_id=entry.user_id
+        ).order_by('-timetoken', '-id').first()
+        if last_read:
+            entry.last_read_message = last_read
+            entry.last_read_at = last_read.timetoken
+            entries.append(entry)
+    ChatInboxEntry.objects.bulk_update(entries, ['last_read_message', 'last_read_at'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0004_chatmessage_history_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatinboxentry',
+            name='last_read_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='chatinboxentry',
+            name='last_read_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='chat.ChatMessage'),
+        ),
+        migrations.RunPython(populate_read_watermarks, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='chatmessage',
+            name='read',
+        ),
+    ]
@@ -20,6 +20,13 @@ class ChatChannel(models.Model):
         blank=True,
         null=True
     )
+    last_message = models.ForeignKey(
+        'ChatMessage',
+        on_delete=models.SET_NULL,
+        related_name='+',
+        blank=True,
+        null=True
+    )
     created_at = models.DateTimeField(
         auto_now_add=True
     )
@@ -49,7 +56,98 @@ class ChatMessage(models.Model):
         max_length=255,
         blank=True
     )
-    read = models.BooleanField(default=False)
 
     class Meta:
         ordering = ['-timetoken']
+        indexes = [
+            models.Index(fields=['channel', '-timetoken', '-id'], name='chat_message_history_idx'),
+        ]
+
+
+class ChatInboxEntry(models.Model):
+    """
+    A model to represent a chat channel in the inbox of one of its users,
+    kept up to date on every message and read, see chat.inbox.
+    Messages up to (last_read_at, last_read_message) were read by the user.
+    """
+    channel = models.ForeignKey(
+        ChatChannel,
+        related_name='inbox_entries',
+        on_delete=models.CASCADE
+    )
+    user = models.ForeignKey(
+        User,
+        related_name='chat_inbox_entries',
+        on_delete=models.CASCADE
+    )
+    unread_count = models.PositiveIntegerField(
+        default=0
+    )
+    last_activity_at = models.DateTimeField()
+    last_read_message = models.ForeignKey(
+        ChatMessage,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        blank=True,
+        null=True
+    )
+    last_read_at = models.DateTimeField(
+        blank=True,
+        null=True
+    )
+
+    class Meta:
+        unique_together = ('channel', 'user')
+        indexes = [
+            models.Index(fields=['user', '-last_activity_at', '-id'], name='chat_inbox_activity_idx'),
+        ]
+
+
+class ChatOutboxEvent(models.Model):
+    """
+    A model to represent a realtime event waiting to be published to PubNub.
+    Events are written in the same transaction as the change they announce
+    and published by the outbox dispatcher, see chat.outbox
+    """
+    channel = models.CharField(
+        max_length=255
+    )
+    message = models.TextField(
+        help_text="The JSON encoded message to publish"
+    )
+    sender_id = models.CharField(
+        max_length=255
+    )
+    dedup_key = models.CharField(
+        max_length=255,
+        unique=True,
+        help_text="Identifies the event, enqueuing the same key again is a no-op"
+    )
+    status = models.CharField(
+        max_length=255,
+        choices=(
+            ('Pending', 'Pending'),
+            ('Published', 'Published'),
+            ('Failed', 'Failed')
+        ),
+        default='Pending'
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0
+    )
+    next_attempt_at = models.DateTimeField()
+    last_error = models.TextField(
+        blank=True
+    )
+    published_at = models.DateTimeField(
+        blank=True,
+        null=True
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='chat_outbox_due_idx'),
+        ]
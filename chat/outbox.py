@@ -0,0 +1,123 @@
+import json
+import logging
+import random
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import ChatOutboxEvent
+from .publisher import publish_message
+
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+MAX_ATTEMPTS = 8
+# Retries wait BACKOFF_BASE * 2 ** attempts seconds, up to BACKOFF_MAX, with some jitter
+BACKOFF_BASE = 2
+BACKOFF_MAX = 600
+# How long a dispatcher owns the events it claimed before another one may retry them
+CLAIM_TIMEOUT = timedelta(minutes=2)
+
+
+def enqueue_event(channel, message, sender_id, dedup_key):
+    """
+    Records a realtime event to publish once the current transaction commits.
+    An event whose dedup_key was already enqueued is not recorded again.
+    """
+    try:
+        with transaction.atomic():
+            event = ChatOutboxEvent.objects.create(
+                channel=str(channel),
+                message=json.dumps(message),
+                sender_id=str(sender_id),
+                dedup_key=dedup_key,
+                next_attempt_at=timezone.now()
+            )
+    except IntegrityError:
+        return None
+    transaction.on_commit(schedule_dispatch)
+    return event
+
+
+def schedule_dispatch(countdown=None):
+    from .tasks import dispatch_chat_outbox
+    try:
+        dispatch_chat_outbox.apply_async(countdown=countdown)
+    except Exception:
+        # The events stay pending, the periodic dispatch of CELERY_BEAT_SCHEDULE picks them up
+        logger.exception("Could not schedule the chat outbox dispatcher")
+
+
+def _backoff(attempts):
+    delay = min(BACKOFF_BASE * 2 ** attempts, BACKOFF_MAX)
+    return timedelta(seconds=delay + random.uniform(0, delay / 4))
+
+
+def _claim_batch(batch_size):
+    """
+    Takes the due events for this dispatcher by pushing their next attempt past
+    CLAIM_TIMEOUT, so concurrent dispatchers skip them while they are published
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        events = list(
+            ChatOutboxEvent.objects
+            .select_for_update(skip_locked=True)
+            .filter(status='Pending', next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        ChatOutboxEvent.objects.filter(id__in=[event.id for event in events]).update(
+            next_attempt_at=now + CLAIM_TIMEOUT
+        )
+    return events
+
+
+def dispatch_batch(batch_size=BATCH_SIZE):
+    """
+    Publishes one batch of due events, rescheduling the failed ones with an
+    exponential backoff. Returns the number of events processed.
+    """
+    events = _claim_batch(batch_size)
+    processed = []
+    try:
+        for event in events:
+            try:
+                publish_message(event.channel, json.loads(event.message), event.sender_id)
+            except Exception as error:
+                # Any error is a failed attempt, so an event that always fails ends up Failed
+                event.attempts += 1
+                event.last_error = str(error)
+                if event.attempts >= MAX_ATTEMPTS:
+                    event.status = 'Failed'
+                    logger.error("Giving up on chat outbox event %s: %s", event.dedup_key, error)
+                else:
+                    event.next_attempt_at = timezone.now() + _backoff(event.attempts)
+            else:
+                event.attempts += 1
+                event.status = 'Published'
+                event.published_at = timezone.now()
+            processed.append(event)
+    finally:
+        # Records the events published so far even if the batch stops, so they are not published again
+        ChatOutboxEvent.objects.bulk_update(
+            processed, ['status', 'attempts', 'next_attempt_at', 'last_error', 'published_at']
+        )
+    return len(processed)
+
+
+def dispatch_pending(batch_size=BATCH_SIZE, max_batches=50):
+    """
+    Drains the due events batch by batch. Returns the number of events
+    processed and when the next pending event is due, if any.
+    """
+    processed = 0
+    for _ in range(max_batches):
+        count = dispatch_batch(batch_size)
+        processed += count
+        if count < batch_size:
+            break
+
+    next_event = ChatOutboxEvent.objects.filter(status='Pending').order_by('next_attempt_at').first()
+    return processed, next_event.next_attempt_at if next_event else None
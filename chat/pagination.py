@@ -0,0 +1,125 @@
+from base64 import b64decode, b64encode
+from urllib import parse
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, CursorPagination
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .inbox import sent_after
+
+
+class ChatInboxCursorPagination(CursorPagination):
+    """
+    Pages through the inbox of a user, the channels with the most recent activity first
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+    ordering = ('-last_activity_at', '-id')
+
+
+class ChatMessageHistoryPagination(BasePagination):
+    """
+    Pages through the messages of a channel, newest first, keyed on (timetoken, id).
+    ?before=<cursor> loads the older messages and ?after=<cursor> the newer ones,
+    every page is a single index range scan on chat_message_history_idx however
+    long the history is.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    before_query_param = 'before'
+    after_query_param = 'after'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        before = self.decode_cursor(request, self.before_query_param)
+        after = self.decode_cursor(request, self.after_query_param)
+        if before and after:
+            raise NotFound(self.invalid_cursor_message)
+
+        if after:
+            timetoken, pk = after
+            messages = list(
+                queryset
+                .filter(sent_after(timetoken, pk))
+                .order_by('timetoken', 'id')[:self.page_size + 1]
+            )
+            self.has_newer = len(messages) > self.page_size
+            self.has_older = True
+            messages = messages[:self.page_size][::-1]
+        else:
+            if before:
+                timetoken, pk = before
+                queryset = queryset.filter(Q(timetoken__lt=timetoken) | Q(timetoken=timetoken, id__lt=pk))
+            messages = list(queryset.order_by('-timetoken', '-id')[:self.page_size + 1])
+            self.has_older = len(messages) > self.page_size
+            self.has_newer = before is not None
+            messages = messages[:self.page_size]
+
+        self.page = messages
+        # Polling with the after cursor of an empty page keeps waiting from the same position
+        self.after_position = (messages[0].timetoken, messages[0].id) if messages else after
+        return messages
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def decode_cursor(self, request, query_param):
+        encoded = request.query_params.get(query_param)
+        if encoded is None:
+            return None
+
+        try:
+            querystring = b64decode(encoded.encode('ascii')).decode('ascii')
+            tokens = parse.parse_qs(querystring, keep_blank_values=True)
+            timetoken = parse_datetime(tokens['t'][0])
+            pk = int(tokens['i'][0])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if timetoken is None:
+            raise NotFound(self.invalid_cursor_message)
+        return timetoken, pk
+
+    def encode_cursor(self, position):
+        timetoken, pk = position
+        querystring = parse.urlencode({'t': timetoken.isoformat(), 'i': str(pk)})
+        return b64encode(querystring.encode('ascii')).decode('ascii')
+
+    def get_before_cursor(self):
+        if not self.has_older or not self.page:
+            return None
+        return self.encode_cursor((self.page[-1].timetoken, self.page[-1].id))
+
+    def get_after_cursor(self):
+        if self.after_position is None:
+            return None
+        return self.encode_cursor(self.after_position)
+
+    def get_link(self, query_param, cursor):
+        if cursor is None:
+            return None
+        url = remove_query_param(self.base_url, self.before_query_param)
+        url = remove_query_param(url, self.after_query_param)
+        return replace_query_param(url, query_param, cursor)
+
+    def get_paginated_data(self, data):
+        before, after = self.get_before_cursor(), self.get_after_cursor()
+        return {
+            'before': before,
+            'after': after,
+            'has_older': self.has_older,
+            'has_newer': self.has_newer,
+            'older': self.get_link(self.before_query_param, before),
+            'newer': self.get_link(self.after_query_param, after),
+            'results': data,
+        }
@@ -0,0 +1,66 @@
+import threading
+from collections import OrderedDict
+
+from pubnub.pnconfiguration import PNConfiguration
+from pubnub.pubnub import PubNub
+from pubnub.request_handlers.requests_handler import RequestsRequestHandler
+
+from blessn.settings import PUBNUB_PUBLISH_KEY, PUBNUB_SUBSCRIBE_KEY
+
+
+# user_id of the client owning the shared connection pool
+SERVER_USER_ID = 'blessn-server'
+
+
+class PubNubPublisher:
+    """
+    Publishes chat messages through one HTTP session per process, so its
+    connections to PubNub stay open between requests. A lightweight client is
+    kept for each recent sender, messages are still published under the
+    sender's user_id, but every client sends through the same session
+    """
+    max_clients = 1000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = OrderedDict()
+        self._request_handler = None
+
+    def _config(self, user_id):
+        config = PNConfiguration()
+        config.subscribe_key = PUBNUB_SUBSCRIBE_KEY
+        config.publish_key = PUBNUB_PUBLISH_KEY
+        config.user_id = user_id
+        config.enable_subscribe = False
+        return config
+
+    def client(self, user_id):
+        user_id = str(user_id)
+        with self._lock:
+            client = self._clients.get(user_id)
+            if client is not None:
+                self._clients.move_to_end(user_id)
+                return client
+
+            if self._request_handler is None:
+                self._request_handler = RequestsRequestHandler(PubNub(self._config(SERVER_USER_ID)))
+            client = PubNub(self._config(user_id))
+            client.set_request_handler(self._request_handler)
+
+            self._clients[user_id] = client
+            if len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+            return client
+
+    def publish(self, channel, message, sender_id):
+        return self.client(sender_id).publish().channel(str(channel)).message(message).sync()
+
+
+publisher = PubNubPublisher()
+
+
+def publish_message(channel, message, sender_id):
+    """
+    Publishes a message to a chat channel on behalf of the sender, raises PubNubException on failure
+    """
+    return publisher.publish(channel, message, sender_id)
@@ -1,7 +1,10 @@
+from django.contrib.auth import get_user_model
 from rest_framework import serializers
 
-from chat.models import ChatChannel, ChatMessage
-from orders.serializers import OrderSerializer
+from chat.inbox import is_read
+from chat.models import ChatChannel, ChatInboxEntry, ChatMessage
+from orders.models import Order
+from orders.serializers import OrderListSerializer
 from users.serializers import UserSerializer
 
 
@@ -21,8 +24,11 @@ class ChatMessageSerializer(serializers.ModelSerializer):
 
 
 class ChatChannelSerializer(serializers.ModelSerializer):
-    messages = ChatMessageSerializer(many=True)
-    order = OrderSerializer(required=False)
+    """
+    A chat channel without its history, the messages are paged through with
+    the messages action of ChatChannelViewSet
+    """
+    order = OrderListSerializer(read_only=True)
 
     class Meta:
         model = ChatChannel
@@ -36,32 +42,66 @@ class ChatChannelSerializer(serializers.ModelSerializer):
         return rep
 
 
-class MyChatChannelSerializer(serializers.ModelSerializer):
-    last_message = serializers.SerializerMethodField()
-    unread_messages_count = serializers.SerializerMethodField()
-    order = OrderSerializer(required=False)
+class ChatUserSerializer(serializers.ModelSerializer):
+    """
+    The few User fields a chat needs to show its participants
+    """
+    class Meta:
+        model = get_user_model()
+        fields = ('id', 'username', 'name', 'first_name', 'last_name', 'picture')
+
 
+class ChatOrderSerializer(serializers.ModelSerializer):
     class Meta:
-        model = ChatChannel
-        exclude = ('users',)
+        model = Order
+        fields = ('id', 'consumer', 'contributor', 'video_for', 'occasion', 'turnaround_selected', 'status',
+                  'total', 'video_processing', 'created_at', 'updated_at')
+
+
+class ChatLastMessageSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ChatMessage
+        fields = ('id', 'text', 'timetoken', 'sender', 'file', 'file_type')
 
+    def to_representation(self, instance):
+        rep = super().to_representation(instance)
+        rep['id'] = str(rep['id'])
+        return rep
 
-    def get_last_message(self, obj):
-        try:
-            message = obj.messages.latest('timetoken')
-        except ChatMessage.DoesNotExist:
-            serializer = None
-        else:
-            serializer = ChatMessageSerializer(message).data
-        return serializer
 
-    def get_unread_messages_count(self, obj):
-        current_user = self.context['request'].user
-        unread_messages = obj.messages.exclude(sender=current_user).filter(read=False).count()
-        return unread_messages
+class ChatHistoryMessageSerializer(serializers.ModelSerializer):
+    """
+    A message of the channel history, the sender is only referenced by id,
+    the senders of a page are serialized once next to its messages.
+    A message is read once another member's read watermark reached it.
+    """
+    read = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ChatMessage
+        fields = ('id', 'channel', 'text', 'timetoken', 'sender', 'file', 'file_type', 'read')
 
     def to_representation(self, instance):
         rep = super().to_representation(instance)
-        if instance.users:
-            rep['users'] = UserSerializer(instance.users.all(), many=True).data
+        rep['id'] = str(rep['id'])
+        rep['channel'] = str(rep['channel'])
         return rep
+
+    def get_read(self, obj):
+        return is_read(obj, self.context.get('read_watermarks', []))
+
+
+class ChatInboxEntrySerializer(serializers.ModelSerializer):
+    """
+    A channel as listed in the inbox of a user, read from ChatInboxEntry
+    """
+    id = serializers.IntegerField(source='channel.id')
+    order = ChatOrderSerializer(source='channel.order')
+    users = ChatUserSerializer(source='channel.users', many=True)
+    last_message = ChatLastMessageSerializer(source='channel.last_message')
+    unread_messages_count = serializers.IntegerField(source='unread_count')
+    created_at = serializers.DateTimeField(source='channel.created_at')
+
+    class Meta:
+        model = ChatInboxEntry
+        fields = ('id', 'order', 'users', 'last_message', 'unread_messages_count', 'last_activity_at', 'created_at')
@@ -0,0 +1,31 @@
+from django.db.models.signals import post_save, m2m_changed
+from django.dispatch import receiver
+
+from .inbox import add_inbox_entries, record_message
+from .models import ChatChannel, ChatInboxEntry, ChatMessage
+
+
+@receiver(post_save, sender=ChatMessage)
+def message_saved(sender, instance, created, **kwargs):
+    if created:
+        record_message(instance)
+
+
+@receiver(m2m_changed, sender=ChatChannel.users.through)
+def channel_users_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # Forward changes come from a channel with user ids, reverse ones from a user with channel ids
+    if action == 'post_add':
+        if reverse:
+            add_inbox_entries(pk_set, [instance.id])
+        else:
+            add_inbox_entries([instance.id], pk_set)
+    elif action == 'post_remove':
+        if reverse:
+            ChatInboxEntry.objects.filter(user=instance, channel_id__in=pk_set).delete()
+        else:
+            ChatInboxEntry.objects.filter(channel=instance, user_id__in=pk_set).delete()
+    elif action == 'post_clear':
+        if reverse:
+            ChatInboxEntry.objects.filter(user=instance).delete()
+        else:
+            ChatInboxEntry.objects.filter(channel=instance).delete()
@@ -0,0 +1,14 @@
+from celery import shared_task
+from django.utils import timezone
+
+from .outbox import dispatch_pending, schedule_dispatch
+
+
+@shared_task
+def dispatch_chat_outbox(reschedule=True):
+    processed, next_attempt_at = dispatch_pending()
+    # The periodic run does not reschedule, it would start another chain of retries every time
+    if reschedule and next_attempt_at is not None:
+        # Come back for the events waiting on a retry
+        schedule_dispatch(countdown=max((next_attempt_at - timezone.now()).total_seconds(), 1))
+    return processed
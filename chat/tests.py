@@ -1,3 +1,117 @@
+from datetime import timedelta
+from unittest import mock
+
 from django.test import TestCase
+from django.utils import timezone
+from pubnub.exceptions import PubNubException
+
+from .models import ChatOutboxEvent
+from .outbox import BACKOFF_BASE, MAX_ATTEMPTS, dispatch_batch, dispatch_pending, enqueue_event
+
+
+class OutboxTests(TestCase):
+    """
+    Publishing the events of chat.outbox, with PubNub mocked
+    """
+
+    def setUp(self):
+        self.publish = mock.patch('chat.outbox.publish_message').start()
+        self.addCleanup(mock.patch.stopall)
+
+    def enqueue(self, key):
+        return enqueue_event('channel-1', {'text': key}, 'sender-1', key)
+
+    def event(self, key):
+        return ChatOutboxEvent.objects.get(dedup_key=key)
+
+    def make_due(self):
+        ChatOutboxEvent.objects.filter(status='Pending').update(next_attempt_at=timezone.now())
+
+    def test_event_is_published_once(self):
+        self.enqueue('a')
+        self.assertIsNone(self.enqueue('a'))
+
+        self.assertEqual(dispatch_batch(), 1)
+        self.assertEqual(dispatch_batch(), 0)
+
+        self.publish.assert_called_once_with('channel-1', {'text': 'a'}, 'sender-1')
+        event = self.event('a')
+        self.assertEqual(event.status, 'Published')
+        self.assertEqual(event.attempts, 1)
+        self.assertIsNotNone(event.published_at)
+
+    def test_failed_event_is_retried_with_a_backoff(self):
+        self.enqueue('a')
+        self.publish.side_effect = PubNubException(errormsg='unavailable')
+
+        before = timezone.now()
+        dispatch_batch()
+
+        event = self.event('a')
+        self.assertEqual(event.status, 'Pending')
+        self.assertEqual(event.attempts, 1)
+        self.assertIn('unavailable', event.last_error)
+        delay = BACKOFF_BASE * 2
+        self.assertGreaterEqual(event.next_attempt_at, before + timedelta(seconds=delay))
+        self.assertLessEqual(event.next_attempt_at, timezone.now() + timedelta(seconds=delay * 1.25))
+
+        # Not due before its backoff
+        self.assertEqual(dispatch_batch(), 0)
+
+        self.publish.side_effect = None
+        self.make_due()
+        dispatch_batch()
+        self.assertEqual(self.event('a').status, 'Published')
+        self.assertEqual(self.event('a').attempts, 2)
+
+    def test_event_fails_once_the_attempts_run_out(self):
+        self.enqueue('a')
+        self.publish.side_effect = ConnectionError('connection reset')
+
+        for _ in range(MAX_ATTEMPTS):
+            self.make_due()
+            dispatch_batch()
+
+        event = self.event('a')
+        self.assertEqual(event.status, 'Failed')
+        self.assertEqual(event.attempts, MAX_ATTEMPTS)
+        self.make_due()
+        self.assertEqual(dispatch_batch(), 0)
+
+    def test_unexpected_error_does_not_stop_the_batch(self):
+        for key in 'abc':
+            self.enqueue(key)
+        self.publish.side_effect = [None, ValueError('bad message'), None]
+
+        self.assertEqual(dispatch_batch(), 3)
+
+        self.assertEqual(self.event('a').status, 'Published')
+        self.assertEqual(self.event('b').status, 'Pending')
+        self.assertEqual(self.event('b').last_error, 'bad message')
+        self.assertEqual(self.event('c').status, 'Published')
+
+    def test_interrupted_batch_records_what_was_published(self):
+        for key in 'abc':
+            self.enqueue(key)
+        self.publish.side_effect = [None, KeyboardInterrupt]
+
+        with self.assertRaises(KeyboardInterrupt):
+            dispatch_batch()
+
+        self.assertEqual(self.event('a').status, 'Published')
+        # Still claimed, they are retried once the claim times out
+        for key in 'bc':
+            event = self.event(key)
+            self.assertEqual(event.status, 'Pending')
+            self.assertEqual(event.attempts, 0)
+            self.assertGreater(event.next_attempt_at, timezone.now())
+
+    def test_pending_events_are_drained_in_batches(self):
+        for key in 'abcde':
+            self.enqueue(key)
+
+        processed, next_attempt_at = dispatch_pending(batch_size=2)
 
-# Create your tests here.
+        self.assertEqual(processed, 5)
+        self.assertIsNone(next_attempt_at)
+        self.assertEqual(self.publish.call_count, 5)
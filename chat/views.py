@@ -7,43 +7,80 @@ from django.contrib.auth import get_user_model
 
 from rest_framework import status
 
-from .models import ChatChannel, ChatMessage
-from .serializers import ChatChannelSerializer, MyChatChannelSerializer
+from .models import ChatChannel, ChatInboxEntry, ChatMessage
+from orders.serializers import ORDER_LIST_RELATED
 
-from blessn.settings import PUBNUB_PUBLISH_KEY, PUBNUB_SUBSCRIBE_KEY
+from .serializers import ChatChannelSerializer, ChatHistoryMessageSerializer, ChatInboxEntrySerializer, ChatUserSerializer
+from .pagination import ChatInboxCursorPagination, ChatMessageHistoryPagination
+from .inbox import mark_channel_read, read_watermarks
+
+from .outbox import enqueue_event
 from django_filters.rest_framework import DjangoFilterBackend
 
 from customadmin.utils import contains_banned_words
+from home.uploads import DirectUploadError, attach_direct_upload, get_direct_upload
 
 User = get_user_model()
 
 
-from pubnub.pubnub import PubNub
-from pubnub.exceptions import PubNubException
-from pubnub.pnconfiguration import PNConfiguration
+from django.db import transaction
+from django.db.models import Sum
 from django.core.files.storage import default_storage
 
 
 class ChatChannelViewSet(ModelViewSet):
     serializer_class = ChatChannelSerializer
     permission_classes = (IsAuthenticated,)
-    queryset = ChatChannel.objects.all()
+    queryset = ChatChannel.objects.select_related(*(f'order__{field}' for field in ORDER_LIST_RELATED)).prefetch_related('users')
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['order']
 
     @action(detail=False, methods=["get"])
     def my_chats(self, request):
-        user_channels = request.user.chat_channels.all()
-        serializer = MyChatChannelSerializer(user_channels, many=True, context={"request": request})
-        serialized_data = serializer.data
-
-        # Sum up the unread messages count from each channel in the serialized data
-        total_unread_messages = sum(channel.get('unread_messages_count', 0) for channel in serialized_data)
+        """
+        The inbox of the user, one page of channels by last activity, read from the ChatInboxEntry rows
+        """
+        entries = ChatInboxEntry.objects.filter(user=request.user)
+        paginator = ChatInboxCursorPagination()
+        page = paginator.paginate_queryset(
+            entries.select_related('channel__order', 'channel__last_message').prefetch_related('channel__users'),
+            request,
+            view=self
+        )
+        serializer = ChatInboxEntrySerializer(page, many=True, context={"request": request})
 
-        # Include the total unread messages count in the response
         response_data = {
-            'channels': serialized_data,
-            'total_unread_messages': total_unread_messages
+            'channels': serializer.data,
+            'total_unread_messages': entries.aggregate(total=Sum('unread_count'))['total'] or 0,
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link(),
+        }
+
+        return Response(response_data)
+
+    @action(detail=True, methods=["get"])
+    def messages(self, request, pk=None):
+        """
+        One page of the channel history, newest first, see ChatMessageHistoryPagination
+        for the before/after cursors. Senders are listed once per page in `senders`.
+        """
+        channel = self.get_object()
+        if not request.user.is_superuser and not channel.users.filter(id=request.user.id).exists():
+            return Response({"error": "You are not a member of this channel"}, status=status.HTTP_403_FORBIDDEN)
+
+        paginator = ChatMessageHistoryPagination()
+        page = paginator.paginate_queryset(ChatMessage.objects.filter(channel=channel), request, view=self)
+
+        sender_ids = {message.sender_id for message in page if message.sender_id is not None}
+        senders = User.objects.filter(id__in=sender_ids) if sender_ids else []
+        response_data = paginator.get_paginated_data(
+            ChatHistoryMessageSerializer(
+                page, many=True, context={"request": request, "read_watermarks": read_watermarks(channel)}
+            ).data
+        )
+        response_data['senders'] = {
+            str(sender['id']): sender
+            for sender in ChatUserSerializer(senders, many=True, context={"request": request}).data
         }
 
         return Response(response_data)
@@ -64,21 +101,28 @@ class ChatChannelViewSet(ModelViewSet):
             return Response({"error": "Channel not found"}, status=status.HTTP_404_NOT_FOUND)
 
         file = request.FILES.get('file', None)
+        upload_id = request.data.get('upload_id')
         file_url = None  # Initialize file_url
         file_type = ""
         filename = ""
-        if file:
+        upload = None
+        if upload_id:
+            # Uploaded straight to S3 beforehand, see home.uploads
+            try:
+                upload = get_direct_upload(user, upload_id, 'chat_attachment')
+            except DirectUploadError as error:
+                return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+            filename = upload.name
+            file_url = default_storage.url(filename)
+            file_type = upload.content_type
+            file_info = {'name': upload.filename, 'size': upload.size}
+        elif file:
             # Save file and get filename
             filename = default_storage.save(file.name, file)
             # Generate URL for PubNub message
             file_url = default_storage.url(filename)
             file_type = file.content_type
-
-        mypubnubconfig = PNConfiguration()
-        mypubnubconfig.subscribe_key = PUBNUB_SUBSCRIBE_KEY
-        mypubnubconfig.publish_key = PUBNUB_PUBLISH_KEY
-        mypubnubconfig.user_id = sender_uuid
-        pubnub = PubNub(mypubnubconfig)
+            file_info = {'name': file.name, 'size': file.size}
 
         message_data = {
             'content': text,
@@ -86,34 +130,48 @@ class ChatChannelViewSet(ModelViewSet):
             'channel': str(channel.id),
         }
 
-        if file:
+        if filename:
             message_data['file'] = {
-                'name': file.name,
+                'name': file_info['name'],
                 'url': file_url,  # Use the S3 URL
-                'size': file.size,
-                'type': file.content_type,
+                'size': file_info['size'],
+                'type': file_type,
             }
 
-        try:
-            ChatMessage.objects.create(
+        # The message is published to PubNub by the outbox dispatcher once it is saved
+        with transaction.atomic():
+            if upload is not None:
+                # Attached along with the message, a message that can not be saved leaves the upload usable
+                try:
+                    attach_direct_upload(upload)
+                except DirectUploadError as error:
+                    return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+            message = ChatMessage.objects.create(
                 text=text,
                 sender=user,
                 channel=channel,
-                file=filename if file else None,
+                file=filename or None,
                 file_type=file_type
             )
+            message_data['message_id'] = str(message.id)
+            enqueue_event(channel.id, message_data, sender_uuid, dedup_key=f'chat_message:{message.id}')
 
-            pubnub.publish().channel(str(channel.id)).message(message_data).sync()
-
-            return Response("Message Sent", status=status.HTTP_200_OK)
-        except PubNubException as e:
-            return Response(f"Message not sent due to the following error: {str(e)}", status=status.HTTP_400_BAD_REQUEST)
+        return Response("Message Sent", status=status.HTTP_200_OK)
 
     @action(detail=False, methods=["post"])
     def mark_as_read(self, request):
         channel_id = request.data.get('channel_id')
         channel = ChatChannel.objects.get(id=channel_id)
-        user = request.user
-        messages = channel.messages.exclude(sender=user)
-        messages.update(read=True)
+        message = None
+        # Without a message_id everything in the channel is read
+        message_id = request.data.get('message_id')
+        if message_id:
+            try:
+                message_id = int(message_id)
+            except (TypeError, ValueError):
+                return Response({"error": "message_id must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+            message = ChatMessage.objects.filter(id=message_id, channel=channel).first()
+            if message is None:
+                return Response({"error": "Message not found"}, status=status.HTTP_404_NOT_FOUND)
+        mark_channel_read(channel, request.user, message)
         return Response("Messages marked as read", status=status.HTTP_200_OK)
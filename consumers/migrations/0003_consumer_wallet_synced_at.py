@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 11:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consumers', '0002_consumer_stripe_account'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='consumer',
+            name='wallet_synced_at',
+            field=models.DateTimeField(blank=True, help_text='When the cards of the Stripe customer were first copied to the local djstripe tables', null=True),
+        ),
+    ]
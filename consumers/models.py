@@ -13,3 +13,8 @@ class Consumer(models.Model):
         blank=True,
         on_delete=models.CASCADE
     )
+    wallet_synced_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        help_text="When the cards of the Stripe customer were first copied to the local djstripe tables"
+    )
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class ContributorsConfig(AppConfig):
     name = 'contributors'
+
+    def ready(self):
+        import contributors.signals  # noqa F401
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.28 on 2026-10-18 10:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contributors', '0008_auto_20240604_0817'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contributorphotovideo',
+            name='preview_clip',
+            field=models.FileField(blank=True, null=True, upload_to='contributor_display_files'),
+        ),
+        migrations.AddField(
+            model_name='contributorphotovideo',
+            name='preview_image',
+            field=models.FileField(blank=True, null=True, upload_to='contributor_display_files'),
+        ),
+    ]
@@ -62,3 +62,6 @@ class ContributorPhotoVideo(models.Model):
     description = models.TextField(blank=True)
     media_type = models.CharField(max_length=255, blank=True)
     thumbnail = models.FileField(upload_to="contributor_display_files", blank=True, null=True)
+    # Generated from the file, see home.media
+    preview_image = models.FileField(upload_to="contributor_display_files", blank=True, null=True)
+    preview_clip = models.FileField(upload_to="contributor_display_files", blank=True, null=True)
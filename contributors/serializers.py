@@ -1,5 +1,5 @@
 from django.contrib.auth import get_user_model
-from django.db.models import Avg, Sum
+from django.db import transaction
 
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
@@ -8,8 +8,9 @@ from .models import Contributor, ContributorPhotoVideo, Tag
 from categories.serializers import CategorySerializer
 
 from blessn.settings import BOOKING_FEE
-from users.models import Follow
 from customadmin.utils import contains_banned_words
+from home.api.v1.serializers import DirectUploadFileMixin, attach_validated_upload
+from .utils import get_contributor_stats
 
 
 User = get_user_model()
@@ -32,10 +33,13 @@ class AdminTagSerializer(serializers.ModelSerializer):
         return obj.contributors.count()
 
 
-class ContributorPhotoVideoSerializer(serializers.ModelSerializer):
+class ContributorPhotoVideoSerializer(DirectUploadFileMixin, serializers.ModelSerializer):
+    upload_purpose = 'contributor_media'
+
     class Meta:
         model = ContributorPhotoVideo
         fields = '__all__'
+        read_only_fields = ['preview_image', 'preview_clip']
         extra_kwargs = {'contributor': {'required': False}}
 
     def validate_title(self, value):
@@ -57,12 +61,14 @@ class ContributorSerializer(serializers.ModelSerializer):
         model = Contributor
         fields = '__all__'
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         photos_videos_data = validated_data.pop('photos_videos', None)
         contributor = super().update(instance, validated_data)
 
         if photos_videos_data is not None:
             for photo_video_data in photos_videos_data:
+                attach_validated_upload(photo_video_data)  # In the same transaction as the ContributorPhotoVideo
                 photo_video_serializer = ContributorPhotoVideoSerializer(data=photo_video_data)
                 if photo_video_serializer.is_valid(raise_exception=True):
                     photo_video_serializer.save(contributor=contributor)
@@ -72,23 +78,12 @@ class ContributorSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         rep = super().to_representation(instance)
         if instance.category:
-            rep['category'] = CategorySerializer(instance.category).data
-        rep['rating'] = instance.reviews.aggregate(Avg('rating'))['rating__avg']
-        rep['rating_count'] = instance.reviews.count()
-        rep['post_count'] = instance.posts.all().count()
-        user = instance.user
-        followers_count = Follow.objects.filter(followed=user).count()
-        following_count = Follow.objects.filter(follower=user).count()
-
-        rep['followers_count'] = followers_count
-        rep['following_count'] = following_count
-
-        earnings = instance.orders.aggregate(total_earnings=Sum('video_fee'))['total_earnings']
-        earnings = earnings if earnings is not None else 0
-
-        rep['earnings'] = earnings
+            rep['category'] = CategorySerializer(instance.category, context=self.context).data
 
-        pending_booking_requests = instance.orders.filter(status='Pending').count()
-        rep['pending_booking_requests'] = pending_booking_requests
+        # List serializers precompute the stats of the whole page in one go, see users.utils
+        stats = self.context.get('contributor_stats', {}).get(instance.id)
+        if stats is None:
+            stats = get_contributor_stats([instance])[instance.id]
+        rep.update(stats)
         rep['booking_fee'] = BOOKING_FEE
         return rep
@@ -0,0 +1,17 @@
+from django.db.models.signals import post_init, post_save
+from django.dispatch import receiver
+
+from home.media import remember_source_file
+from home.tasks import schedule_media_derivatives
+
+from .models import ContributorPhotoVideo
+
+
+@receiver(post_init, sender=ContributorPhotoVideo)
+def photo_video_loaded(sender, instance, **kwargs):
+    remember_source_file(instance)
+
+
+@receiver(post_save, sender=ContributorPhotoVideo)
+def photo_video_saved(sender, instance, created, **kwargs):
+    schedule_media_derivatives(instance, created)
@@ -0,0 +1,55 @@
+from django.db.models import Avg, Count, Q, Sum
+
+from orders.models import Order, Review
+from posts.models import Post
+from users.models import Follow
+
+
+def get_contributor_stats(contributors):
+    """
+    Computes the aggregate figures shown in ContributorSerializer for several
+    Contributors at once, using one grouped query per figure instead of one
+    query per figure and Contributor
+    """
+    contributors = list(contributors)
+    contributor_ids = [contributor.id for contributor in contributors]
+    user_ids = [contributor.user_id for contributor in contributors]
+
+    reviews = {
+        row['contributor_id']: row for row in Review.objects.filter(contributor_id__in=contributor_ids)
+        .values('contributor_id').annotate(rating=Avg('rating'), rating_count=Count('id'))
+    }
+    post_counts = dict(
+        Post.objects.filter(contributor_id__in=contributor_ids)
+        .values('contributor_id').annotate(count=Count('id')).values_list('contributor_id', 'count')
+    )
+    followers_counts = dict(
+        Follow.objects.filter(followed_id__in=user_ids)
+        .values('followed_id').annotate(count=Count('id')).values_list('followed_id', 'count')
+    )
+    following_counts = dict(
+        Follow.objects.filter(follower_id__in=user_ids)
+        .values('follower_id').annotate(count=Count('id')).values_list('follower_id', 'count')
+    )
+    orders = {
+        row['contributor_id']: row for row in Order.objects.filter(contributor_id__in=contributor_ids)
+        .values('contributor_id').annotate(
+            earnings=Sum('video_fee'),
+            pending_booking_requests=Count('id', filter=Q(status='Pending'))
+        )
+    }
+
+    stats = {}
+    for contributor in contributors:
+        review = reviews.get(contributor.id, {})
+        order = orders.get(contributor.id, {})
+        stats[contributor.id] = {
+            'rating': review.get('rating'),
+            'rating_count': review.get('rating_count', 0),
+            'post_count': post_counts.get(contributor.id, 0),
+            'followers_count': followers_counts.get(contributor.user_id, 0),
+            'following_count': following_counts.get(contributor.user_id, 0),
+            'earnings': order.get('earnings') or 0,
+            'pending_booking_requests': order.get('pending_booking_requests', 0),
+        }
+    return stats
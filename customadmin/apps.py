@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class CustomadminConfig(AppConfig):
     name = 'customadmin'
+
+    def ready(self):
+        import customadmin.signals  # noqa F401
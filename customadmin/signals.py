@@ -0,0 +1,12 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import BannedWord
+from .utils import banned_word_matcher
+
+
+@receiver(post_save, sender=BannedWord)
+@receiver(post_delete, sender=BannedWord)
+def banned_words_changed(sender, **kwargs):
+    transaction.on_commit(banned_word_matcher.invalidate)
@@ -1,3 +1,92 @@
-from django.test import TestCase
+import re
 
-# Create your tests here.
+from django.test import TestCase, TransactionTestCase
+
+from .models import BannedWord
+from .utils import BannedWordMatcher, _BannedWordMatcherCache, contains_banned_words, fields_with_banned_words
+
+
+def regex_search(words, text):
+    # The word boundary regex the matcher replaced, the reference for its results
+    pattern = r'\b(' + '|'.join(re.escape(word) for word in words) + r')\b'
+    return re.search(pattern, text, re.IGNORECASE) is not None
+
+
+class BannedWordMatcherTests(TestCase):
+    """
+    The Aho-Corasick automaton of customadmin.utils
+    """
+
+    def test_matches_whole_words_only(self):
+        matcher = BannedWordMatcher(['bad'])
+
+        self.assertEqual(matcher.search('a bad day'), 'bad')
+        self.assertEqual(matcher.search('bad'), 'bad')
+        self.assertEqual(matcher.search('(bad)'), 'bad')
+        self.assertIsNone(matcher.search('badge'))
+        self.assertIsNone(matcher.search('sinbad'))
+        self.assertIsNone(matcher.search('bad_word'))
+        self.assertIsNone(matcher.search('bad2'))
+
+    def test_ignores_case(self):
+        matcher = BannedWordMatcher(['Bad'])
+
+        self.assertEqual(matcher.search('BAD news'), 'bad')
+        self.assertEqual(matcher.search('bAd'), 'bad')
+
+    def test_finds_overlapping_words(self):
+        matcher = BannedWordMatcher(['he', 'she', 'hers', 'his'])
+
+        # "she", "he" and "hers" all end inside "shers", none of them on word boundaries
+        self.assertIsNone(matcher.search('shers'))
+        self.assertEqual(matcher.search('not hers'), 'hers')
+        self.assertEqual(matcher.search('ushe she'), 'she')
+
+    def test_finds_a_word_inside_a_longer_banned_word(self):
+        matcher = BannedWordMatcher(['bad', 'badword', 'word'])
+
+        self.assertEqual(matcher.search('a badword'), 'badword')
+        self.assertEqual(matcher.search('swordfish word'), 'word')
+
+    def test_empty_matcher_and_text(self):
+        self.assertIsNone(BannedWordMatcher([]).search('anything'))
+        self.assertIsNone(BannedWordMatcher(['', 'bad']).search(''))
+        self.assertIsNone(BannedWordMatcher(['bad']).search(None))
+
+    def test_agrees_with_the_word_boundary_regex(self):
+        words = ['ass', 'class', 'f**k', 'c++', 'no-go', 'über', 'a b']
+        texts = [
+            'first class', 'classic', 'pass', 'ass', 'f**k', 'what f**k', 'f**king', 'c++ code', 'c++x',
+            'no-go zone', 'a no-goal', 'Über alles', 'überall', 'a b c', 'ab', 'glass ass', '', 'ASS!',
+        ]
+        matcher = BannedWordMatcher(words)
+        for text in texts:
+            with self.subTest(text=text):
+                self.assertEqual(matcher.search(text) is not None, regex_search(words, text))
+
+
+class BannedWordCacheTests(TransactionTestCase):
+    """
+    The compiled matcher is recompiled in every process once a BannedWord changes
+    """
+
+    def test_changes_reach_every_process(self):
+        other_process = _BannedWordMatcherCache()
+        self.assertFalse(contains_banned_words('a bad day'))
+        self.assertIsNone(other_process.get().search('a bad day'))
+
+        word = BannedWord.objects.create(word='bad')
+        self.assertTrue(contains_banned_words('a bad day'))
+        self.assertEqual(other_process.get().search('a bad day'), 'bad')
+
+        word.delete()
+        self.assertFalse(contains_banned_words('a bad day'))
+        self.assertIsNone(other_process.get().search('a bad day'))
+
+    def test_fields_with_banned_words(self):
+        BannedWord.objects.create(word='bad')
+
+        self.assertEqual(
+            fields_with_banned_words({'title': 'Bad title', 'description': 'fine', 'tags': 'so bad'}),
+            ['title', 'tags']
+        )
@@ -1,15 +1,135 @@
-import re
+import threading
+from collections import deque
+
+from django.core.cache import cache
 
 from .models import BannedWord
 
 
+# Bumped whenever a BannedWord changes so every process recompiles its matcher
+BANNED_WORDS_VERSION_CACHE_KEY = 'banned_words:version'
+
+
+def _fold(text):
+    # Lowercases character by character so positions in the folded text match the original
+    return ''.join(char if len(char.lower()) != 1 else char.lower() for char in text)
+
+
+def _is_word_char(char):
+    return char.isalnum() or char == '_'
+
+
+class BannedWordMatcher:
+    """
+    An Aho-Corasick automaton over the banned words, matching them case
+    insensitively on word boundaries in a single scan of the text
+    """
+
+    def __init__(self, words):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+
+        for word in {_fold(word) for word in words if word}:
+            state = 0
+            for char in word:
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            self.output[state].append(word)
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fail = self.fail[state]
+                while fail and char not in self.goto[fail]:
+                    fail = self.fail[fail]
+                self.fail[next_state] = self.goto[fail].get(char, 0)
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+    def _on_boundaries(self, text, start, end):
+        """
+        Same rule as a regex \\b around the word: each edge of the match must
+        sit between a word and a non word character
+        """
+        before = _is_word_char(text[start - 1]) if start > 0 else False
+        after = _is_word_char(text[end]) if end < len(text) else False
+        return (
+            before != _is_word_char(text[start]) and
+            after != _is_word_char(text[end - 1])
+        )
+
+    def search(self, text):
+        """
+        Returns the first banned word found in the text, or None
+        """
+        if not text or len(self.goto) == 1:
+            return None
+        text = _fold(text)
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            for word in self.output[state]:
+                if self._on_boundaries(text, index + 1 - len(word), index + 1):
+                    return word
+        return None
+
+
+class _BannedWordMatcherCache:
+    """
+    Holds the compiled matcher of this process, recompiled when the shared version stamp moves
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._matcher = None
+        self._version = None
+
+    def _shared_version(self):
+        version = cache.get(BANNED_WORDS_VERSION_CACHE_KEY)
+        if version is None:
+            cache.add(BANNED_WORDS_VERSION_CACHE_KEY, 0, timeout=None)
+            version = cache.get(BANNED_WORDS_VERSION_CACHE_KEY, 0)
+        return version
+
+    def get(self):
+        version = self._shared_version()
+        matcher = self._matcher
+        if matcher is None or self._version != version:
+            with self._lock:
+                if self._matcher is None or self._version != version:
+                    self._matcher = BannedWordMatcher(BannedWord.objects.values_list('word', flat=True))
+                    self._version = version
+                matcher = self._matcher
+        return matcher
+
+    def invalidate(self):
+        try:
+            cache.incr(BANNED_WORDS_VERSION_CACHE_KEY)
+        except ValueError:
+            cache.add(BANNED_WORDS_VERSION_CACHE_KEY, 1, timeout=None)
+        with self._lock:
+            self._matcher = None
+
+
+banned_word_matcher = _BannedWordMatcherCache()
+
+
 def contains_banned_words(input_text):
-    banned_words = BannedWord.objects.values_list('word', flat=True)
-    if not banned_words:
-        return False
+    return banned_word_matcher.get().search(input_text) is not None
 
-    pattern = r'\b(' + '|'.join(re.escape(word) for word in banned_words) + r')\b'
-    regex = re.compile(pattern, re.IGNORECASE)
 
-    # Search the input text for any matches
-    return bool(regex.search(input_text))
+def fields_with_banned_words(fields):
+    """
+    Checks several fields against the same compiled matcher, returns the names
+    of the fields containing a banned word in the order they were given
+    """
+    matcher = banned_word_matcher.get()
+    return [name for name, text in fields.items() if matcher.search(text) is not None]
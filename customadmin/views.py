@@ -17,13 +17,13 @@ from .serializers import RegistrationCountSerializer, BannedWordSerializer
 from users.serializers import AdminUserSerializer, UserSerializer
 from users.models import User
 from orders.models import Order
-from orders.serializers import OrderSerializer
+from orders.serializers import ORDER_LIST_RELATED, OrderListSerializer
 from categories.models import Category
 from categories.serializers import CategorySerializer
 from contributors.models import Tag, Contributor
 from contributors.serializers import AdminTagSerializer
 from posts.models import Post
-from posts.serializers import PostSerializer
+from posts.serializers import PostSerializer, prefetch_post_list
 from payments.models import BookingFee
 
 from feedback.serializers import FeedbackSerializer
@@ -228,7 +228,7 @@ class AdminUserViewSet(ModelViewSet):
             else:
                 return Response({"error": "This user does not have a consumer profile."}, status=status.HTTP_404_NOT_FOUND)
 
-        serializer = OrderSerializer(orders, many=True)
+        serializer = OrderListSerializer(orders.select_related(*ORDER_LIST_RELATED), many=True)
         return Response(serializer.data)
 
     @action(detail=False, methods=['post'])
@@ -368,7 +368,7 @@ class AdminUserViewSet(ModelViewSet):
         except User.DoesNotExist:
             return Response({"error": "User does not exist."}, status=status.HTTP_400_BAD_REQUEST)
 
-        posts = Post.objects.filter(contributor=user.contributor)
+        posts = prefetch_post_list(Post.objects.filter(contributor=user.contributor), request)
         serializer = PostSerializer(posts, many=True, context={"request": request})
         return Response(serializer.data)
 
@@ -513,7 +513,7 @@ class AdminUserViewSet(ModelViewSet):
                 Q(contributor__user__name__icontains=search_name) | 
                 Q(consumer__user__name__icontains=search_name)
             )
-        serializer = OrderSerializer(orders, many=True)
+        serializer = OrderListSerializer(orders.select_related(*ORDER_LIST_RELATED), many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
@@ -1,4 +1,6 @@
 from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.db import transaction
 from django.http import HttpRequest
 from django.utils.translation import ugettext_lazy as _
 from allauth.account import app_settings as allauth_settings
@@ -9,6 +11,9 @@ from allauth.account.utils import setup_user_email
 from rest_framework import serializers
 from rest_auth.serializers import PasswordResetSerializer
 
+from home.models import DirectUpload
+from home.uploads import DirectUploadError, attach_direct_upload, get_direct_upload
+
 
 User = get_user_model()
 
@@ -74,3 +79,75 @@ class UserSerializer(serializers.ModelSerializer):
 class PasswordSerializer(PasswordResetSerializer):
     """Custom serializer for rest_auth to solve reset password error"""
     password_reset_form_class = ResetPasswordForm
+
+
+class DirectUploadSerializer(serializers.ModelSerializer):
+    url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = DirectUpload
+        fields = ['id', 'purpose', 'name', 'filename', 'content_type', 'size', 'status', 'url', 'created_at',
+                  'confirmed_at', 'attached_at']
+        read_only_fields = ['name', 'status', 'created_at', 'confirmed_at', 'attached_at']
+
+    def get_url(self, obj):
+        return default_storage.url(obj.name)
+
+
+# The validated data key DirectUploadFileMixin keeps the upload to attach under
+DIRECT_UPLOAD_FIELD = 'direct_upload'
+
+
+def attach_validated_upload(validated_data):
+    """
+    Attaches the upload DirectUploadFileMixin validated, if any, and removes it
+    from the validated data. Call it in the transaction saving the object
+    """
+    upload = validated_data.pop(DIRECT_UPLOAD_FIELD, None)
+    if upload is not None:
+        try:
+            attach_direct_upload(upload)
+        except DirectUploadError as error:
+            raise serializers.ValidationError({'upload_id': str(error)})
+
+
+class DirectUploadFileMixin:
+    """
+    Lets a model serializer take its file from a DirectUpload of the user, sent
+    as upload_id, instead of a file uploaded along with the request. The upload
+    is only attached in the transaction saving the object, so a request failing
+    before does not use it up. Serializers saving these objects themselves,
+    when nested, call attach_validated_upload on their data.
+    """
+    upload_purpose = None
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fields['upload_id'] = serializers.IntegerField(write_only=True, required=False)
+        fields['file'].required = False
+        return fields
+
+    def validate(self, attrs):
+        upload_id = attrs.pop('upload_id', None)
+        if upload_id is not None:
+            try:
+                upload = get_direct_upload(self.context['request'].user, upload_id, self.upload_purpose)
+            except DirectUploadError as error:
+                raise serializers.ValidationError({'upload_id': str(error)})
+            attrs[DIRECT_UPLOAD_FIELD] = upload
+            attrs['file'] = upload.name
+            if not attrs.get('media_type'):
+                attrs['media_type'] = upload.content_type
+        elif self.instance is None and not attrs.get('file'):
+            raise serializers.ValidationError({'file': "A file or an upload_id is required."})
+        return super().validate(attrs)
+
+    def create(self, validated_data):
+        with transaction.atomic():
+            attach_validated_upload(validated_data)
+            return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        with transaction.atomic():
+            attach_validated_upload(validated_data)
+            return super().update(instance, validated_data)
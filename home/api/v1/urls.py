@@ -4,6 +4,7 @@ from rest_framework.routers import DefaultRouter
 from home.api.v1.viewsets import (
     SignupViewSet,
     LoginViewSet,
+    DirectUploadViewSet,
 )
 
 from users.viewsets import UserViewSet
@@ -20,6 +21,7 @@ from posts.views import PostViewSet, CommentViewSet
 from chat.views import ChatChannelViewSet
 from customadmin.views import RegistrationStats, RegistrationStatsProfiles, ApplicationActivityStats, AdminUserViewSet, AdminFeedbackViewSet, \
     AdminCategoryViewSet, AdminBannedWordViewSet
+from search.views import SuggestView
 
 router = DefaultRouter()
 router.register("signup", SignupViewSet, basename="signup")
@@ -37,6 +39,7 @@ router.register('orders', OrderViewSet, basename='orders')
 router.register("posts", PostViewSet, basename='posts')
 router.register("comments", CommentViewSet, basename='comments')
 router.register("chat", ChatChannelViewSet, basename="chat")
+router.register("uploads", DirectUploadViewSet, basename="uploads")
 router.register("admin/admin-users", AdminUserViewSet, basename="admin-users")
 router.register("admin/admin-feedbacks", AdminFeedbackViewSet, basename="admin-feedbacks")
 router.register("admin/admin-categories", AdminCategoryViewSet, basename="admin-categories")
@@ -44,6 +47,7 @@ router.register("admin/admin-banned-words", AdminBannedWordViewSet, basename="ad
 
 urlpatterns = [
     path("", include(router.urls)),
+    path("suggest/", SuggestView.as_view(), name="suggest"),
     path("socials/", include(("socialauth.urls", "socialauth"), namespace="socialauth")),
     path("admin/registration-stats/", RegistrationStats.as_view(), name="registration-stats"),
     path("admin/registration-stats-profiles/", RegistrationStatsProfiles.as_view(), name="registration-stats-profiles"),
@@ -1,12 +1,17 @@
+from rest_framework import mixins, status
 from rest_framework.authtoken.serializers import AuthTokenSerializer
-from rest_framework.viewsets import ModelViewSet, ViewSet
+from rest_framework.decorators import action
+from rest_framework.viewsets import GenericViewSet, ModelViewSet, ViewSet
 from rest_framework.authtoken.models import Token
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
 from home.api.v1.serializers import (
+    DirectUploadSerializer,
     SignupSerializer,
     UserSerializer,
 )
+from home.uploads import DirectUploadError, confirm_direct_upload, create_direct_upload, direct_uploads_available
 
 
 class SignupViewSet(ModelViewSet):
@@ -28,3 +33,40 @@ class LoginViewSet(ViewSet):
         token, created = Token.objects.get_or_create(user=user)
         user_serializer = UserSerializer(user, context={'request': request})
         return Response({"token": token.key, "user": user_serializer.data})
+
+
+class DirectUploadViewSet(mixins.RetrieveModelMixin, GenericViewSet):
+    """
+    Presigned uploads straight to S3, so large media never goes through the app servers.
+    POST with purpose, filename, content_type and size to get the url and fields of
+    the form to upload the file with, then confirm it once S3 accepted the file and
+    pass its id as upload_id to the chat, post or contributor media endpoints.
+    """
+    serializer_class = DirectUploadSerializer
+    permission_classes = (IsAuthenticated,)
+
+    def get_queryset(self):
+        return self.request.user.direct_uploads.all()
+
+    def create(self, request):
+        if not direct_uploads_available():
+            return Response({"error": "Direct uploads need the S3 media storage"}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            upload, presigned_post = create_direct_upload(request.user, **serializer.validated_data)
+        except DirectUploadError as error:
+            return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+        response_data = self.get_serializer(upload).data
+        response_data['upload'] = presigned_post
+        return Response(response_data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=["post"])
+    def confirm(self, request, pk=None):
+        try:
+            upload = confirm_direct_upload(self.get_object())
+        except DirectUploadError as error:
+            return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.get_serializer(upload).data)
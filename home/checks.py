@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+
+# Cached data every web and Celery process must see: the ranked feed snapshots,
+# the suggestion index version and the banned word matcher version
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Each process has its own local memory cache, invalidations made by one
+    would never reach the others
+    """
+    backend = settings.CACHES['default']['BACKEND']
+    if settings.DEBUG or backend not in LOCAL_CACHE_BACKENDS:
+        return []
+    return [Error(
+        f"The default cache {backend} is not shared between processes",
+        hint="Set CACHE_URL to a shared cache such as dbcache://blessn_cache or memcache://host:port",
+        id='home.E001',
+    )]
@@ -0,0 +1,114 @@
+import mimetypes
+import os
+import subprocess
+from io import BytesIO
+from tempfile import TemporaryDirectory
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from .video import VideoProcessingError, ffmpeg_binary, probe_duration, video_source
+
+
+IMAGE = 'image'
+VIDEO = 'video'
+
+
+def media_kind(instance):
+    """
+    Tells images from videos by the file name, falling back to the media_type sent by the client
+    """
+    content_type, _ = mimetypes.guess_type(instance.file.name)
+    for kind in (IMAGE, VIDEO):
+        if (content_type or '').startswith(kind) or kind in (instance.media_type or '').lower():
+            return kind
+    return None
+
+
+def _resized_jpeg(image, width):
+    image = image.copy()
+    image.thumbnail((width, width * 4), Image.LANCZOS)
+    output = BytesIO()
+    image.save(output, format='JPEG', quality=80, optimize=True, progressive=True)
+    return output.getvalue()
+
+
+def _video_frame(source, duration):
+    """
+    Grabs a frame a little into the video, past any fade in, as a Pillow image
+    """
+    result = subprocess.run(
+        [
+            ffmpeg_binary(), '-hide_banner', '-nostdin', '-loglevel', 'error',
+            '-ss', str(min(1, duration / 2)), '-i', source,
+            '-frames:v', '1', '-f', 'image2pipe', '-c:v', 'png', 'pipe:1'
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+    if result.returncode != 0 or not result.stdout:
+        raise VideoProcessingError(f"Could not grab a frame of {source}: {result.stderr.decode(errors='replace')[-500:]}")
+    return Image.open(BytesIO(result.stdout))
+
+
+def _preview_clip(source, output_path):
+    subprocess.run(
+        [
+            ffmpeg_binary(), '-hide_banner', '-nostdin', '-y', '-loglevel', 'error',
+            '-t', str(settings.MEDIA_PREVIEW_CLIP_SECONDS), '-i', source,
+            '-vf', f'scale={settings.MEDIA_PREVIEW_CLIP_WIDTH}:-2', '-an',
+            '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '28', '-pix_fmt', 'yuv420p',
+            '-movflags', '+faststart', output_path
+        ],
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE
+    )
+
+
+def generate_derivatives(instance):
+    """
+    Renders the thumbnail, the preview image and, for videos, the preview clip
+    of a model instance and stores them next to its file. A thumbnail uploaded
+    by the client is kept as it is. Returns the names of the fields filled in.
+    """
+    kind = media_kind(instance)
+    if kind is None:
+        return []
+
+    if kind == IMAGE:
+        with instance.file.open('rb') as file:
+            image = Image.open(file)
+            image = ImageOps.exif_transpose(image).convert('RGB')
+    else:
+        source = video_source(instance.file)
+        image = _video_frame(source, probe_duration(source)).convert('RGB')
+
+    name, _ = os.path.splitext(os.path.basename(instance.file.name))
+    updated = []
+    if not instance.thumbnail:
+        instance.thumbnail.save(f'{name}_thumbnail.jpg', ContentFile(_resized_jpeg(image, settings.MEDIA_THUMBNAIL_WIDTH)), save=False)
+        updated.append('thumbnail')
+    instance.preview_image.save(f'{name}_preview.jpg', ContentFile(_resized_jpeg(image, settings.MEDIA_PREVIEW_WIDTH)), save=False)
+    updated.append('preview_image')
+
+    if kind == VIDEO:
+        with TemporaryDirectory() as tmp_dir:
+            output_path = os.path.join(tmp_dir, f'{name}_preview.mp4')
+            _preview_clip(source, output_path)
+            with open(output_path, 'rb') as file:
+                instance.preview_clip.save(os.path.basename(output_path), File(file), save=False)
+        updated.append('preview_clip')
+
+    # Only update the row if the file was not replaced in the meantime, and without sending post_save again
+    type(instance).objects.filter(pk=instance.pk, file=instance.file.name).update(
+        **{field: getattr(instance, field).name for field in updated}
+    )
+    return updated
+
+
+def remember_source_file(instance):
+    # Called from post_init, lets post_save tell whether the file was replaced
+    instance._derivatives_source = instance.file.name if instance.file else None
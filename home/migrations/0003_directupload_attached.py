@@ -0,0 +1,23 @@
+# Generated by Django 2.2.28 on 2026-10-18 11:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0002_directupload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='directupload',
+            name='attached_at',
+            field=models.DateTimeField(blank=True, help_text='When the file was attached to an object, an upload is attached once', null=True),
+        ),
+        migrations.AlterField(
+            model_name='directupload',
+            name='status',
+            field=models.CharField(choices=[('Pending', 'Pending'), ('Confirmed', 'Confirmed'), ('Attached', 'Attached')], default='Pending', max_length=255),
+        ),
+    ]
@@ -1 +1,59 @@
+from django.conf import settings
 from django.db import models
+
+
+class DirectUpload(models.Model):
+    """
+    A model to represent a file a client uploads straight to S3 with a
+    presigned POST, before it is attached to a chat message, a post or a
+    contributor's media, see home.uploads
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name='direct_uploads',
+        on_delete=models.CASCADE
+    )
+    purpose = models.CharField(
+        max_length=255,
+        choices=(
+            ('chat_attachment', 'Chat attachment'),
+            ('post_file', 'Post file'),
+            ('contributor_media', 'Contributor media')
+        )
+    )
+    name = models.CharField(
+        max_length=255,
+        unique=True,
+        help_text="The name of the file in the media storage"
+    )
+    filename = models.CharField(
+        max_length=255,
+        help_text="The name of the file on the client"
+    )
+    content_type = models.CharField(
+        max_length=255
+    )
+    size = models.BigIntegerField(
+        help_text="The size announced by the client, larger uploads are refused by S3"
+    )
+    status = models.CharField(
+        max_length=255,
+        choices=(
+            ('Pending', 'Pending'),
+            ('Confirmed', 'Confirmed'),
+            ('Attached', 'Attached')
+        ),
+        default='Pending'
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True
+    )
+    confirmed_at = models.DateTimeField(
+        blank=True,
+        null=True
+    )
+    attached_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        help_text="When the file was attached to an object, an upload is attached once"
+    )
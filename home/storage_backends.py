@@ -1,3 +1,5 @@
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
 from django.conf import settings
 from storages.backends.s3boto3 import S3Boto3Storage
 
@@ -5,3 +7,56 @@ from storages.backends.s3boto3 import S3Boto3Storage
 class MediaStorage(S3Boto3Storage):
     location = settings.AWS_MEDIA_LOCATION
     file_overwrite = False
+
+    def save_stream(self, name, file, max_length=None):
+        """
+        Saves a finished file as a multipart upload whose parts are sent in
+        parallel, AWS_S3_UPLOAD_CONCURRENCY at a time. Returns the name the
+        file was saved under.
+        """
+        name = self.get_available_name(name, max_length=max_length)
+        cleaned_name = self._clean_name(name)
+        key = self._normalize_name(cleaned_name)
+
+        config = TransferConfig(
+            multipart_threshold=settings.AWS_S3_UPLOAD_CHUNK_SIZE,
+            multipart_chunksize=settings.AWS_S3_UPLOAD_CHUNK_SIZE,
+            max_concurrency=settings.AWS_S3_UPLOAD_CONCURRENCY
+        )
+        # Only matters for a file that can not seek, whose parts are buffered in memory until they are sent
+        config.max_in_memory_upload_chunks = settings.AWS_S3_UPLOAD_CONCURRENCY
+
+        self.bucket.Object(key).upload_fileobj(file, ExtraArgs=self._get_write_parameters(key), Config=config)
+        return cleaned_name
+
+    def presigned_post(self, name, content_type, max_size, expires_in):
+        """
+        Returns the url and form fields of a presigned POST letting a client
+        upload a file of at most max_size bytes to name, straight to the bucket
+        """
+        key = self._normalize_name(self._clean_name(name))
+        fields = {'Content-Type': content_type}
+        conditions = [{'Content-Type': content_type}, ['content-length-range', 1, max_size]]
+        if self.default_acl:
+            fields['acl'] = self.default_acl
+            conditions.append({'acl': self.default_acl})
+        cache_control = self.object_parameters.get('CacheControl')
+        if cache_control:
+            fields['Cache-Control'] = cache_control
+            conditions.append({'Cache-Control': cache_control})
+
+        return self.bucket.meta.client.generate_presigned_post(
+            self.bucket_name, key, Fields=fields, Conditions=conditions, ExpiresIn=expires_in
+        )
+
+    def head(self, name):
+        """
+        Returns the metadata S3 has for a file, or None when it does not exist
+        """
+        key = self._normalize_name(self._clean_name(name))
+        try:
+            return self.bucket.meta.client.head_object(Bucket=self.bucket_name, Key=key)
+        except ClientError as error:
+            if error.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
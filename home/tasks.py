@@ -0,0 +1,27 @@
+from celery import shared_task
+from django.apps import apps
+from django.db import transaction
+
+from .media import generate_derivatives, remember_source_file
+
+
+@shared_task
+def generate_media_derivatives(model_label, pk):
+    instance = apps.get_model(model_label).objects.filter(pk=pk).first()
+    if instance is None:
+        return []
+    return generate_derivatives(instance)
+
+
+def schedule_media_derivatives(instance, created):
+    """
+    Queues the derivatives of a new or replaced file once the transaction commits
+    """
+    if not instance.file:
+        return
+    if not created and instance.file.name == getattr(instance, '_derivatives_source', None):
+        return
+    remember_source_file(instance)
+
+    label, pk = instance._meta.label, instance.pk
+    transaction.on_commit(lambda: generate_media_derivatives.delay(label, pk))
@@ -0,0 +1,106 @@
+import os
+import uuid
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+from .models import DirectUpload
+
+
+# Where the files of every purpose are stored, and the content types they may have
+UPLOAD_PURPOSES = {
+    'chat_attachment': ('messages/files', None),
+    'post_file': ('post_files', ('image/', 'video/')),
+    'contributor_media': ('contributor_display_files', ('image/', 'video/')),
+}
+
+
+class DirectUploadError(Exception):
+    pass
+
+
+def direct_uploads_available():
+    # Only S3, see home.storage_backends.MediaStorage, hands out presigned uploads
+    return hasattr(default_storage, 'presigned_post')
+
+
+def create_direct_upload(user, purpose, filename, content_type, size):
+    """
+    Reserves a name in the media storage for a file the client is about to
+    upload, returns the DirectUpload and the presigned POST to send it with
+    """
+    if purpose not in UPLOAD_PURPOSES:
+        raise DirectUploadError(f"Unknown purpose {purpose}")
+    upload_to, content_types = UPLOAD_PURPOSES[purpose]
+    if content_types and not content_type.startswith(content_types):
+        raise DirectUploadError(f"{content_type} files can not be uploaded as {purpose}")
+    if not 0 < size <= settings.DIRECT_UPLOAD_MAX_SIZE:
+        raise DirectUploadError(f"Files must be at most {settings.DIRECT_UPLOAD_MAX_SIZE} bytes")
+
+    filename = get_valid_filename(os.path.basename(filename)) or 'file'
+    upload = DirectUpload.objects.create(
+        user=user,
+        purpose=purpose,
+        name=f'{upload_to}/{uuid.uuid4().hex}/{filename}'[:255],
+        filename=filename[:255],
+        content_type=content_type,
+        size=size
+    )
+    presigned_post = default_storage.presigned_post(
+        upload.name, content_type, size, settings.DIRECT_UPLOAD_EXPIRES
+    )
+    return upload, presigned_post
+
+
+def confirm_direct_upload(upload):
+    """
+    Checks with a HEAD request that the file made it to S3 as announced
+    """
+    if upload.status != 'Pending':
+        return upload
+
+    metadata = default_storage.head(upload.name)
+    if metadata is None:
+        raise DirectUploadError("The file has not been uploaded")
+    if metadata['ContentLength'] > upload.size or metadata.get('ContentType') != upload.content_type:
+        default_storage.delete(upload.name)
+        raise DirectUploadError("The uploaded file does not match the upload")
+
+    upload.size = metadata['ContentLength']
+    upload.status = 'Confirmed'
+    upload.confirmed_at = timezone.now()
+    upload.save(update_fields=['size', 'status', 'confirmed_at'])
+    return upload
+
+
+def get_direct_upload(user, upload_id, purpose):
+    """
+    Returns the upload of the user to attach a file from, confirmed on the way
+    if the client skipped the confirm call. Raises DirectUploadError when it is
+    missing or already attached.
+    """
+    upload = DirectUpload.objects.filter(id=upload_id, user=user, purpose=purpose).first()
+    if upload is None:
+        raise DirectUploadError("Upload not found")
+    upload = confirm_direct_upload(upload)
+    if upload.status != 'Confirmed':
+        raise DirectUploadError("Upload already attached")
+    return upload
+
+
+def attach_direct_upload(upload):
+    """
+    Marks a confirmed upload as attached. An upload is attached once, so no two
+    objects share its file. Call it in the transaction saving the object the
+    file goes to: when that save fails the upload can still be attached again.
+    Raises DirectUploadError when it was attached in the meantime.
+    """
+    now = timezone.now()
+    attached = DirectUpload.objects.filter(id=upload.id, status='Confirmed').update(status='Attached', attached_at=now)
+    if not attached:
+        raise DirectUploadError("Upload already attached")
+    upload.status = 'Attached'
+    upload.attached_at = now
+    return upload
@@ -0,0 +1,57 @@
+import re
+import subprocess
+
+from django.conf import settings
+
+
+class VideoProcessingError(Exception):
+    pass
+
+
+def ffmpeg_binary():
+    if settings.FFMPEG_BINARY:
+        return settings.FFMPEG_BINARY
+    import imageio_ffmpeg
+    return imageio_ffmpeg.get_ffmpeg_exe()
+
+
+def video_source(field):
+    """
+    Returns what ffmpeg should read a FileField from: the local path when the
+    storage has one, otherwise its URL, which ffmpeg streams with range requests
+    instead of the whole file being downloaded first
+    """
+    try:
+        return field.path
+    except NotImplementedError:
+        return field.url
+
+
+def probe_video(source):
+    """
+    Returns the duration in seconds, the frame height and whether there is an
+    audio stream, read from what ffmpeg prints about its input
+    """
+    result = subprocess.run(
+        [ffmpeg_binary(), '-hide_banner', '-nostdin', '-i', source],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        universal_newlines=True
+    )
+    match = re.search(r'Duration: (\d+):(\d+):(\d+(?:\.\d+)?)', result.stderr)
+    if not match:
+        raise VideoProcessingError(f"Could not read the duration of {source}: {result.stderr[-500:]}")
+    hours, minutes, seconds = match.groups()
+    size = re.search(r'Stream #.*Video:.*?, (\d{2,5})x(\d{2,5})', result.stderr)
+    return {
+        'duration': int(hours) * 3600 + int(minutes) * 60 + float(seconds),
+        'height': int(size.group(2)) if size else None,
+        'has_audio': bool(re.search(r'Stream #.*Audio:', result.stderr)),
+    }
+
+
+def probe_duration(source):
+    """
+    Returns the duration of the video in seconds
+    """
+    return probe_video(source)['duration']
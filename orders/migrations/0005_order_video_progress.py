@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 10:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_order_video_processing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='video_progress',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Percentage of the watermarking done while video_processing is set'),
+        ),
+    ]
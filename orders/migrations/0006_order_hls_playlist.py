@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 10:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_order_video_progress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='hls_playlist',
+            field=models.FileField(blank=True, help_text='HLS master playlist of the blessn video, when VIDEO_HLS_ENABLED is set', max_length=255, null=True, upload_to='blessn_files/hls'),
+        ),
+    ]
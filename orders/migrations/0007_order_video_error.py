@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_order_hls_playlist'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='video_error',
+            field=models.TextField(blank=True, help_text='Why the last watermarking failed, the video is the one uploaded then'),
+        ),
+    ]
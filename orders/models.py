@@ -153,6 +153,21 @@ class Order(models.Model):
         default=0
     )
     video_processing = models.BooleanField(default=False)
+    video_progress = models.PositiveSmallIntegerField(
+        default=0,
+        help_text="Percentage of the watermarking done while video_processing is set"
+    )
+    video_error = models.TextField(
+        blank=True,
+        help_text="Why the last watermarking failed, the video is the one uploaded then"
+    )
+    hls_playlist = models.FileField(
+        upload_to="blessn_files/hls",
+        max_length=255,
+        blank=True,
+        null=True,
+        help_text="HLS master playlist of the blessn video, when VIDEO_HLS_ENABLED is set"
+    )
 
     def save(self, *args, **kwargs):
         self.total = self.video_fee + self.booking_fee
@@ -1,11 +1,76 @@
+from django.contrib.auth import get_user_model
 from rest_framework import serializers
+from consumers.models import Consumer
+from contributors.models import Contributor
+from dropdowns.models import Occasion
 from .models import Order
 from .tasks import process_video_and_update_order
 
+
+# The relations OrderListSerializer reads, to be joined by the querysets it serializes
+ORDER_LIST_RELATED = ('consumer__user', 'contributor__user', 'contributor__category', 'occasion')
+# The relations OrderSerializer expands with depth
+ORDER_DETAIL_RELATED = ORDER_LIST_RELATED + ('consumer__stripe_account', 'contributor__connect_account')
+
+
+class OrderUserSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = get_user_model()
+        fields = ('id', 'username', 'name', 'first_name', 'last_name', 'picture')
+
+
+class OrderConsumerSerializer(serializers.ModelSerializer):
+    user = OrderUserSerializer()
+
+    class Meta:
+        model = Consumer
+        fields = ('id', 'user')
+
+
+class OrderContributorSerializer(serializers.ModelSerializer):
+    user = OrderUserSerializer()
+    category = serializers.CharField(source='category.name', default=None)
+
+    class Meta:
+        model = Contributor
+        fields = ('id', 'user', 'category')
+
+
+class OrderOccasionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Occasion
+        fields = ('id', 'title')
+
+
+class OrderListSerializer(serializers.ModelSerializer):
+    """
+    The fields an order shows in lists, with the consumer, the contributor and the
+    occasion reduced to what is displayed. Querysets serialized with it should
+    select_related ORDER_LIST_RELATED.
+    """
+    consumer = OrderConsumerSerializer(read_only=True)
+    contributor = OrderContributorSerializer(read_only=True)
+    occasion = OrderOccasionSerializer(read_only=True)
+
+    class Meta:
+        model = Order
+        fields = ('id', 'consumer', 'contributor', 'video_for', 'occasion', 'turnaround_selected', 'video_fee',
+                  'booking_fee', 'total', 'status', 'blessn', 'hls_playlist', 'video_processing', 'video_progress',
+                  'video_error', 'flagged', 'flagged_reason', 'archived', 'reviewed', 'rating', 'paid_at',
+                  'delivered_at', 'cancel_requested_at', 'cancel_reason', 'refund_requested_at', 'created_at',
+                  'updated_at')
+        read_only_fields = fields
+
+
 class OrderSerializer(serializers.ModelSerializer):
+    """
+    The full order with its relations expanded, for a single order.
+    Lists use OrderListSerializer.
+    """
     class Meta:
         model = Order
         fields = '__all__'
+        read_only_fields = ('hls_playlist', 'video_error')
         depth = 3
 
     def create(self, validated_data):
@@ -22,6 +87,8 @@ class OrderSerializer(serializers.ModelSerializer):
         if blessn_file:
             instance.blessn = blessn_file
             instance.video_processing = True
+            instance.video_progress = 0
+            instance.hls_playlist = None
             instance.save()
             process_video_and_update_order.delay(instance.id)
         return super().update(instance, validated_data)
@@ -1,40 +1,79 @@
 from celery import shared_task
 from .models import Order
-import boto3
-from moviepy.editor import VideoFileClip, CompositeVideoClip, ImageClip
-from tempfile import NamedTemporaryFile
+from .video import HLS_PLAYLIST_NAME, package_hls, watermark_video
+from home.video import video_source
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import TemporaryDirectory
+from django.conf import settings
 from django.core.files import File
 import os
+import uuid
+
+# Files of an HLS package uploaded at the same time
+HLS_UPLOAD_WORKERS = 8
 
 @shared_task
 def process_video_and_update_order(order_id):
     order = Order.objects.get(id=order_id)
-    video_url = order.blessn.url
-
-    # Setup S3 client to download the video
-    s3 = boto3.client('s3', aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'), aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'))
-    bucket_name = video_url.split('/')[2].split('.')[0]  # Extract bucket name from URL
-    key = '/'.join(video_url.split('/')[3:])  # Extract key from URL
-
-    with NamedTemporaryFile(suffix='.mp4', delete=False) as tmp_file:
-        s3.download_file(bucket_name, key, tmp_file.name)
-        clip = VideoFileClip(tmp_file.name)
-        watermark = (ImageClip('logo.png', duration=clip.duration)
-                     .set_opacity(0.5)
-                     .resize(0.25)
-                     .set_position(('right', 'bottom')))
-        final_clip = CompositeVideoClip([clip, watermark])
-        output_path = tmp_file.name.replace('.mp4', '_watermarked.mp4')
-        final_clip.write_videofile(output_path, codec='libx264')
-
-    # Prepare the new video file for saving to the FileField
-    with open(output_path, 'rb') as file:
-        django_file = File(file)
-        order.blessn.save(os.path.basename(output_path), django_file, save=True)
+    Order.objects.filter(id=order_id).update(video_progress=0, video_error='')
+
+    def report_progress(percent):
+        Order.objects.filter(id=order_id).update(video_progress=percent)
+
+    name, _ = os.path.splitext(os.path.basename(order.blessn.name))
+    filename = f'{name}_watermarked.mp4'
+    source = video_source(order.blessn)
+    storage = order.blessn.storage
+
+    try:
+        with TemporaryDirectory() as tmp_dir:
+            # faststart needs a seekable output, so the video is encoded to disk before it is uploaded
+            output_path = os.path.join(tmp_dir, filename)
+            watermark_video(source, output_path, progress_callback=report_progress)
+
+            with open(output_path, 'rb') as file:
+                if hasattr(storage, 'save_stream'):
+                    # Upload the video to S3 in parts sent in parallel
+                    upload_name = order.blessn.field.generate_filename(order, filename)
+                    order.blessn.name = storage.save_stream(upload_name, file, max_length=order.blessn.field.max_length)
+                else:
+                    # Prepare the new video file for saving to the FileField
+                    order.blessn.save(filename, File(file), save=False)
+    except Exception as error:
+        # Record the failure rather than leave the order processing forever
+        Order.objects.filter(id=order_id).update(
+            video_processing=False, video_progress=0, video_error=str(error) or type(error).__name__
+        )
+        raise
 
     order.video_processing = False
-    order.save()
+    order.video_progress = 100
+    order.video_error = ''
+    order.save(update_fields=['blessn', 'video_processing', 'video_progress', 'video_error', 'updated_at'])
+
+    if settings.VIDEO_HLS_ENABLED:
+        package_order_video_hls.delay(order_id)
+
+
+@shared_task
+def package_order_video_hls(order_id):
+    order = Order.objects.get(id=order_id)
+    source_name = order.blessn.name
+    storage = order.blessn.storage
+    # A new prefix for every package, so the names of its segments never collide with older ones
+    prefix = f'blessn_files/hls/{order.id}/{uuid.uuid4().hex}'
+
+    with TemporaryDirectory() as tmp_dir:
+        package_hls(video_source(order.blessn), tmp_dir)
+
+        def upload(path):
+            name = f'{prefix}/{os.path.relpath(path, tmp_dir)}'.replace(os.sep, '/')
+            with open(path, 'rb') as file:
+                storage.save(name, File(file))
+
+        paths = [os.path.join(root, filename) for root, _, filenames in os.walk(tmp_dir) for filename in filenames]
+        with ThreadPoolExecutor(max_workers=HLS_UPLOAD_WORKERS) as executor:
+            list(executor.map(upload, paths))
 
-    # Cleanup temporary files
-    os.remove(tmp_file.name)
-    os.remove(output_path)
+    # The video may have been replaced while it was being packaged
+    Order.objects.filter(id=order_id, blessn=source_name).update(hls_playlist=f'{prefix}/{HLS_PLAYLIST_NAME}')
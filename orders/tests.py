@@ -1,3 +1,136 @@
+from unittest import mock
+
+import stripe
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from consumers.models import Consumer
+from contributors.models import Contributor
+from payments.models import Checkout, Payment
+from users.models import User
+
+from .models import Order
+
+
+class BulkActionTests(TestCase):
+    """
+    The bulk order action of OrderViewSet, with Stripe refunds mocked
+    """
+
+    url = '/api/v1/orders/bulk/'
+
+    def setUp(self):
+        self.admin = User.objects.create(email='admin@example.com', username='admin', is_superuser=True, is_staff=True)
+        consumer_user = User.objects.create(email='consumer@example.com', username='consumer')
+        contributor_user = User.objects.create(email='contributor@example.com', username='contributor')
+        self.consumer = Consumer.objects.create(user=consumer_user)
+        self.contributor = Contributor.objects.create(user=contributor_user)
+        other_consumer = Consumer.objects.create(user=User.objects.create(email='other@example.com', username='other'))
+        self.other_order = Order.objects.create(consumer=other_consumer, contributor=self.contributor, status='Delivered')
+
+        self.refund = mock.patch('stripe.Refund.create').start()
+        self.addCleanup(mock.patch.stopall)
+
+    def create_order(self, status, paid=False):
+        order = Order.objects.create(consumer=self.consumer, contributor=self.contributor, status=status)
+        if paid:
+            Checkout.objects.create(
+                order=order, consumer=self.consumer, payment_method='pm_1',
+                idempotency_key=f'key-{order.id}', payment_intent=f'pi_{order.id}'
+            )
+            Payment.objects.create(order=order, consumer=self.consumer, amount=20)
+        return order
+
+    def bulk(self, user, action, order_ids, **fields):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.post(self.url, {'action': action, 'order_ids': order_ids, **fields}, format='json')
+
+    def results(self, response):
+        return [(result['order_id'], result['result'], result['status']) for result in response.json()['results']]
+
+    def test_invalid_requests(self):
+        order = self.create_order('Delivered')
+
+        self.assertEqual(self.bulk(self.admin, 'delete', [order.id]).status_code, 400)
+        self.assertEqual(self.bulk(self.admin, 'mark_as_archived', []).status_code, 400)
+        self.assertEqual(self.bulk(self.admin, 'mark_as_archived', order.id).status_code, 400)
+        self.assertEqual(self.bulk(self.admin, 'mark_as_archived', ['first']).status_code, 400)
+        self.assertEqual(self.bulk(self.admin, 'mark_as_archived', list(range(1, 502))).status_code, 400)
+
+    def test_admin_actions_are_forbidden_to_other_users(self):
+        order = self.create_order('Delivered', paid=True)
+
+        response = self.bulk(self.consumer.user, 'mark_as_refunded', [order.id])
+
+        self.assertEqual(response.status_code, 403)
+        self.refund.assert_not_called()
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'Delivered')
+
+    def test_actions_are_scoped_to_the_role_of_the_user(self):
+        order = self.create_order('Delivered')
+
+        # The contributor of the order can not request a new video, only its consumer
+        response = self.bulk(self.contributor.user, 'request_new_video', [order.id])
+        self.assertEqual(response.json()['updated'], 0)
+        self.assertEqual(response.json()['results'], [{'order_id': order.id, 'result': 'not_found'}])
+
+        response = self.bulk(self.consumer.user, 'request_new_video', [order.id, self.other_order.id])
+        self.assertEqual(response.json()['updated'], 1)
+        self.assertEqual(response.json()['results'], [
+            {'order_id': order.id, 'result': 'ok', 'status': 'Redo Requested'},
+            {'order_id': self.other_order.id, 'result': 'not_found'},
+        ])
+        self.other_order.refresh_from_db()
+        self.assertEqual(self.other_order.status, 'Delivered')
+
+    def test_results_of_every_order(self):
+        delivered = self.create_order('Delivered')
+        pending = self.create_order('Pending')
+
+        response = self.bulk(self.consumer.user, 'request_refund', [pending.id, delivered.id, 0, delivered.id])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['updated'], 1)
+        self.assertEqual(response.json()['results'], [
+            {'order_id': pending.id, 'result': 'conflict', 'status': 'Pending'},
+            {'order_id': delivered.id, 'result': 'ok', 'status': 'Refund Requested'},
+            {'order_id': 0, 'result': 'not_found'},
+        ])
+
+    def test_orders_are_refunded_before_they_are_moved(self):
+        refunded = self.create_order('Refund Requested', paid=True)
+        failing = self.create_order('Refund Requested', paid=True)
+        closed = self.create_order('Cancelled', paid=True)
+
+        def refund(payment_intent, idempotency_key):
+            if payment_intent == f'pi_{failing.id}':
+                raise stripe.error.APIConnectionError("Stripe is down")
+
+        self.refund.side_effect = refund
+        with self.assertLogs('payments.refunds', level='WARNING'):
+            response = self.bulk(self.admin, 'mark_as_refunded', [refunded.id, failing.id, closed.id])
+
+        self.assertEqual(response.json()['updated'], 1)
+        self.assertEqual(response.json()['results'], [
+            {'order_id': refunded.id, 'result': 'ok', 'status': 'Refunded'},
+            {'order_id': failing.id, 'result': 'refund_failed', 'status': 'Refund Requested', 'error': "Stripe is down"},
+            {'order_id': closed.id, 'result': 'conflict', 'status': 'Cancelled'},
+        ])
+        self.assertEqual(self.refund.call_count, 2)
+        self.assertTrue(Payment.objects.get(order=refunded).refunded)
+        self.assertFalse(Payment.objects.get(order=failing).refunded)
+        self.assertFalse(Payment.objects.get(order=closed).refunded)
+
+        # Applied again, the failed order is refunded and the refunded one is not refunded twice
+        self.refund.reset_mock(side_effect=True)
+        response = self.bulk(self.admin, 'mark_as_refunded', [refunded.id, failing.id])
 
-# Create your tests here.
+        self.assertEqual(self.results(response), [
+            (refunded.id, 'ok', 'Refunded'),
+            (failing.id, 'ok', 'Refunded'),
+        ])
+        self.refund.assert_called_once_with(
+            payment_intent=f'pi_{failing.id}', idempotency_key=f'blessn-refund-payment-{Payment.objects.get(order=failing).id}'
+        )
@@ -0,0 +1,124 @@
+from django.db import transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import Order
+
+
+# Sent after every transition applied, with the updated order, the name of the
+# transition and the fields it changed
+order_transitioned = Signal()
+
+# Orders that were paid and are not closed yet
+OPEN_STATUSES = ('In Progress', 'Delivered', 'Redo Requested', 'Redone', 'Refund Requested', 'Cancel Requested')
+
+
+class Transition:
+    """
+    A change of an order allowed from some statuses only: the status it moves
+    to, the timestamp field set to the time of the transition and any other
+    fixed values. Without sources it applies whatever the status.
+    """
+
+    def __init__(self, target=None, sources=None, timestamp=None, values=None):
+        self.target = target
+        self.sources = tuple(sources) if sources else None
+        self.timestamp = timestamp
+        self.values = values or {}
+
+
+TRANSITIONS = {
+    'mark_as_delivered': Transition('Delivered', ('In Progress', 'Redo Requested', 'Redone'), 'delivered_at'),
+    'deny_cancellation': Transition('Delivered', ('Cancel Requested',), 'cancel_denied_at'),
+    'request_new_video': Transition('Redo Requested', ('Delivered', 'Redone'), 'redo_requested_at'),
+    'mark_as_redone': Transition('Redone', ('Redo Requested',), 'redone_at'),
+    'request_refund': Transition('Refund Requested', ('In Progress', 'Delivered', 'Redo Requested', 'Redone'), 'refund_requested_at'),
+    'mark_as_refunded': Transition('Refunded', OPEN_STATUSES, 'refunded_at'),
+    'mark_as_flagged': Transition('Flagged', OPEN_STATUSES, 'flagged_at', {'flagged': True}),
+    'request_cancellation': Transition('Cancel Requested', ('In Progress', 'Delivered', 'Redo Requested', 'Redone'), 'cancel_requested_at'),
+    'mark_as_cancelled': Transition('Cancelled', ('Pending',) + OPEN_STATUSES, 'cancelled_at'),
+    'mark_as_archived': Transition(values={'archived': True}),
+    'mark_as_unarchived': Transition(values={'archived': False}),
+}
+
+
+class TransitionError(Exception):
+
+    def __init__(self, order, name):
+        self.order = order
+        self.name = name
+        super().__init__(f"Order {order.id} can not be changed with {name} while it is {order.status}")
+
+
+def transition_changes(name, values=None):
+    """
+    The fields a transition writes, the extra values given take precedence
+    """
+    transition = TRANSITIONS[name]
+    now = timezone.now()
+    changes = dict(transition.values)
+    if transition.target:
+        changes['status'] = transition.target
+    if transition.timestamp:
+        changes[transition.timestamp] = now
+    changes.update(values or {})
+    changes['updated_at'] = now
+    return changes
+
+
+def transition_queryset(name, queryset=None):
+    """
+    The orders of queryset a transition may be applied to
+    """
+    transition = TRANSITIONS[name]
+    queryset = Order.objects.all() if queryset is None else queryset
+    if transition.sources:
+        queryset = queryset.filter(status__in=transition.sources)
+    return queryset
+
+
+def apply_transition(order_id, name, **values):
+    """
+    Applies a transition to the order locked with SELECT ... FOR UPDATE, writing
+    only the fields it changes, so concurrent actions can not overwrite each
+    other and a TransitionError reports the status that refused it. Returns the
+    updated order, raises Order.DoesNotExist or TransitionError when the order
+    is missing or in another status.
+    """
+    transition = TRANSITIONS[name]
+    changes = transition_changes(name, values)
+    with transaction.atomic():
+        order = Order.objects.select_for_update().get(id=order_id)
+        if transition.sources and order.status not in transition.sources:
+            raise TransitionError(order, name)
+        Order.objects.filter(id=order.id).update(**changes)
+    for field, value in changes.items():
+        setattr(order, field, value)
+
+    order_transitioned.send(sender=Order, order=order, name=name, changes=changes)
+    return order
+
+
+def apply_transition_bulk(order_ids, name, queryset=None, **values):
+    """
+    Applies a transition to many orders with one UPDATE. Orders missing from
+    queryset or in a status the transition does not allow are left as they
+    are. Returns the updated orders and the current status of the others, by id.
+    """
+    queryset = Order.objects.all() if queryset is None else queryset
+    # The scope may join the order to nullable relations, the rows are locked by id
+    # alone since PostgreSQL can not lock the nullable side of an outer join
+    scoped_ids = set(queryset.filter(id__in=set(order_ids)).values_list('id', flat=True))
+    changes = transition_changes(name, values)
+    with transaction.atomic():
+        updated_ids = list(
+            transition_queryset(name, Order.objects.filter(id__in=scoped_ids))
+            .select_for_update().values_list('id', flat=True)
+        )
+        Order.objects.filter(id__in=updated_ids).update(**changes)
+
+    updated = list(Order.objects.filter(id__in=updated_ids))
+    skipped = dict(Order.objects.filter(id__in=scoped_ids - set(updated_ids)).values_list('id', 'status'))
+    for order in updated:
+        order_transitioned.send(sender=Order, order=order, name=name, changes=changes)
+    return updated, skipped
@@ -0,0 +1,269 @@
+import mimetypes
+import os
+import re
+import subprocess
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_EXCEPTION, wait
+from tempfile import TemporaryDirectory
+
+from django.conf import settings
+
+from home.video import VideoProcessingError, ffmpeg_binary, probe_duration, probe_video
+
+
+# Seconds between two progress reports while encoding
+PROGRESS_INTERVAL = 2
+
+# Moves the index to the front of the finished MP4 so players can start and seek before the end is downloaded
+FASTSTART_FLAGS = '+faststart'
+
+HLS_PLAYLIST_NAME = 'master.m3u8'
+# Not known to every platform, and guessed as a Qt translation file on some
+mimetypes.add_type('application/vnd.apple.mpegurl', '.m3u8')
+mimetypes.add_type('video/mp2t', '.ts')
+
+
+def _watermark_filter():
+    # The logo at a quarter of its size and half opacity, in the bottom right corner
+    return (
+        '[1:v]format=rgba,colorchannelmixer=aa=0.5,scale=iw/4:-1[watermark];'
+        '[0:v][watermark]overlay=W-w:H-h,format=yuv420p[video]'
+    )
+
+
+def _encode_command(source, output, start=None, duration=None, movflags=FASTSTART_FLAGS):
+    command = [ffmpeg_binary(), '-hide_banner', '-nostdin', '-y', '-loglevel', 'error']
+    # Seeking before the input only reads the part of the source being encoded
+    if start is not None:
+        command += ['-ss', str(start)]
+    if duration is not None:
+        command += ['-t', str(duration)]
+    command += [
+        '-i', source,
+        '-i', settings.VIDEO_WATERMARK_PATH,
+        '-filter_complex', _watermark_filter(),
+        '-map', '[video]',
+        '-map', '0:a?',
+        '-c:v', 'libx264',
+        '-preset', settings.VIDEO_ENCODE_PRESET,
+        '-crf', str(settings.VIDEO_ENCODE_CRF),
+        '-threads', str(settings.VIDEO_ENCODE_THREADS),
+        '-c:a', 'aac',
+    ]
+    if movflags:
+        command += ['-movflags', movflags]
+    return command + ['-f', 'mp4', '-progress', 'pipe:2', '-nostats', output]
+
+
+def _concat_command(concat_list, output, movflags=FASTSTART_FLAGS):
+    return [
+        ffmpeg_binary(), '-hide_banner', '-nostdin', '-y', '-loglevel', 'error',
+        '-f', 'concat', '-safe', '0', '-i', concat_list,
+        '-c', 'copy', '-movflags', movflags,
+        '-f', 'mp4', output
+    ]
+
+
+class _Progress:
+    """
+    Collects how many seconds each running ffmpeg process has encoded so far
+    """
+
+    def __init__(self, total_seconds):
+        self.total_seconds = total_seconds
+        self.encoded = {}
+        self.lock = threading.Lock()
+
+    def update(self, segment, seconds):
+        with self.lock:
+            self.encoded[segment] = seconds
+
+    @property
+    def percent(self):
+        if not self.total_seconds:
+            return 0
+        with self.lock:
+            encoded = sum(self.encoded.values())
+        return min(int(encoded * 100 / self.total_seconds), 99)
+
+
+class _Processes:
+    """
+    The ffmpeg processes of one encoding, so they can all be killed when one
+    of them fails. Cancelling a future does not stop a process already running
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = []
+        self.killed = False
+
+    def start(self, command):
+        with self.lock:
+            if self.killed:
+                raise VideoProcessingError("The encoding was stopped")
+            process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            self.running.append(process)
+        return process
+
+    def kill(self):
+        with self.lock:
+            self.killed = True
+            for process in self.running:
+                if process.poll() is None:
+                    process.kill()
+
+
+def _run_ffmpeg(command, progress=None, segment=0, processes=None):
+    """
+    Runs ffmpeg, reading its progress from stderr
+    """
+    if processes is not None:
+        process = processes.start(command)
+    else:
+        process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    errors = deque(maxlen=20)
+
+    # -progress writes key=value lines, out_time_us is the position reached in microseconds
+    for line in process.stderr:
+        line = line.decode(errors='replace').strip()
+        match = re.match(r'(\w+)=(.*)', line)
+        if not match:
+            errors.append(line)
+        elif progress and match.group(1) in ('out_time_us', 'out_time_ms') and match.group(2).isdigit():
+            progress.update(segment, int(match.group(2)) / 1000000)
+    if process.wait() != 0:
+        raise VideoProcessingError(f"ffmpeg exited with {process.returncode}: {' '.join(errors)[-1000:]}")
+
+
+def _segments(duration):
+    length = settings.VIDEO_SEGMENT_SECONDS
+    start = 0
+    while start < duration:
+        yield start, min(length, duration - start)
+        start += length
+
+
+def watermark_video(source, output_path, progress_callback=None):
+    """
+    Overlays the watermark on the video with ffmpeg and writes a faststart
+    H.264 MP4 to output_path. Videos longer than VIDEO_SEGMENT_THRESHOLD are
+    cut in segments encoded side by side and joined back without re-encoding.
+
+    progress_callback is called from the calling thread with the percentage done.
+    """
+    duration = probe_duration(source)
+    progress = _Progress(duration)
+    segmented = duration > settings.VIDEO_SEGMENT_THRESHOLD and settings.VIDEO_ENCODE_WORKERS > 1
+
+    with TemporaryDirectory() as tmp_dir:
+        if segmented:
+            segments = list(_segments(duration))
+            segment_paths = [os.path.join(tmp_dir, f'segment_{index:04d}.mp4') for index in range(len(segments))]
+            commands = [
+                _encode_command(source, path, start=start, duration=length, movflags=None)
+                for path, (start, length) in zip(segment_paths, segments)
+            ]
+        else:
+            commands = [_encode_command(source, output_path)]
+
+        # Each thread only waits on its own ffmpeg process, the encoding itself runs in parallel processes
+        processes = _Processes()
+        with ThreadPoolExecutor(max_workers=min(settings.VIDEO_ENCODE_WORKERS, len(commands))) as executor:
+            futures = [
+                executor.submit(_run_ffmpeg, command, progress, index, processes)
+                for index, command in enumerate(commands)
+            ]
+            try:
+                last_percent = None
+                while True:
+                    done, pending = wait(futures, timeout=PROGRESS_INTERVAL, return_when=FIRST_EXCEPTION)
+                    failed = [future for future in done if future.exception()]
+                    if failed:
+                        for future in pending:
+                            future.cancel()
+                        raise failed[0].exception()
+                    if progress_callback and progress.percent != last_percent:
+                        last_percent = progress.percent
+                        progress_callback(last_percent)
+                    if not pending:
+                        break
+            finally:
+                # Leaving the executor waits for its threads, so the processes still running are stopped first
+                processes.kill()
+
+        if segmented:
+            concat_list = os.path.join(tmp_dir, 'segments.txt')
+            with open(concat_list, 'w') as file:
+                file.writelines(f"file '{path}'\n" for path in segment_paths)
+            _run_ffmpeg(_concat_command(concat_list, output_path))
+
+    if progress_callback:
+        progress_callback(100)
+    return output_path
+
+
+def _hls_renditions(height):
+    """
+    The configured (height, kbps) renditions that do not upscale the source,
+    or the smallest one when the source is smaller than all of them
+    """
+    renditions = sorted(settings.VIDEO_HLS_RENDITIONS)
+    if height:
+        fitting = [rendition for rendition in renditions if rendition[0] <= height]
+        renditions = fitting or renditions[:1]
+    return renditions
+
+
+def package_hls(source, output_dir):
+    """
+    Encodes the video into HLS renditions of several bitrates in one ffmpeg run,
+    writing each variant playlist and its segments to a stream_<n> directory
+    and the master playlist to output_dir. Returns the path of the master playlist.
+    """
+    info = probe_video(source)
+    renditions = _hls_renditions(info['height'])
+
+    split = ''.join(f'[v{index}]' for index in range(len(renditions)))
+    filters = [f'[0:v]split={len(renditions)}{split}'] + [
+        f'[v{index}]scale=-2:{height}[v{index}out]'
+        for index, (height, kbps) in enumerate(renditions)
+    ]
+    command = [
+        ffmpeg_binary(), '-hide_banner', '-nostdin', '-y', '-loglevel', 'error',
+        '-i', source,
+        '-filter_complex', ';'.join(filters),
+    ]
+    stream_map = []
+    for index, (height, kbps) in enumerate(renditions):
+        command += [
+            '-map', f'[v{index}out]',
+            f'-c:v:{index}', 'libx264',
+            f'-b:v:{index}', f'{kbps}k',
+            f'-maxrate:v:{index}', f'{int(kbps * 1.07)}k',
+            f'-bufsize:v:{index}', f'{kbps * 2}k',
+        ]
+        if info['has_audio']:
+            command += ['-map', '0:a', f'-c:a:{index}', 'aac', f'-b:a:{index}', '128k']
+            stream_map.append(f'v:{index},a:{index}')
+        else:
+            stream_map.append(f'v:{index}')
+
+    seconds = settings.VIDEO_HLS_SEGMENT_SECONDS
+    command += [
+        '-preset', settings.VIDEO_ENCODE_PRESET,
+        '-threads', str(settings.VIDEO_ENCODE_THREADS),
+        '-pix_fmt', 'yuv420p',
+        # Keyframes on segment boundaries so every rendition switches at the same points
+        '-force_key_frames', f'expr:gte(t,n_forced*{seconds})',
+        '-f', 'hls',
+        '-hls_time', str(seconds),
+        '-hls_playlist_type', 'vod',
+        '-hls_segment_filename', os.path.join(output_dir, 'stream_%v', 'segment_%04d.ts'),
+        '-master_pl_name', HLS_PLAYLIST_NAME,
+        '-var_stream_map', ' '.join(stream_map),
+        os.path.join(output_dir, 'stream_%v', 'index.m3u8'),
+    ]
+    _run_ffmpeg(command)
+    return os.path.join(output_dir, HLS_PLAYLIST_NAME)
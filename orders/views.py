@@ -4,17 +4,18 @@ from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.permissions import IsAuthenticated
 
-from .serializers import OrderSerializer
+from .serializers import ORDER_DETAIL_RELATED, ORDER_LIST_RELATED, OrderListSerializer, OrderSerializer
 from .models import Order, Review
 from .filters import OrderFilter
+from .transitions import TRANSITIONS, TransitionError, apply_transition, apply_transition_bulk
 
 from chat.models import ChatChannel, ChatMessage
 
-from payments.models import Payment
+from payments.refunds import refund_orders
 
 from django_filters.rest_framework import DjangoFilterBackend
-
-from datetime import datetime
+from django.db import transaction
+from django.db.models import Q
 
 import stripe
 
@@ -26,6 +27,38 @@ else:
     stripe.api_key = STRIPE_TEST_SECRET_KEY
 
 
+# Actions that refund the payments of the orders they close. The orders are
+# moved only once their payments were refunded, they must not show closed before
+REFUND_TRANSITIONS = ('mark_as_refunded', 'mark_as_flagged', 'mark_as_cancelled')
+# The request field each action stores on the orders
+TRANSITION_FIELDS = {
+    'deny_cancellation': 'cancel_denied_reason',
+    'mark_as_flagged': 'flagged_reason',
+    'mark_as_cancelled': 'cancel_reason',
+}
+BULK_MAX_ORDERS = 500
+# The side of an order allowed to apply each action in bulk, the others are for admins only
+BULK_ACTION_ROLES = {
+    'request_new_video': ('consumer',),
+    'request_refund': ('consumer',),
+    'request_cancellation': ('consumer',),
+    'mark_as_delivered': ('contributor',),
+    'mark_as_redone': ('contributor',),
+    'deny_cancellation': ('contributor',),
+    'mark_as_archived': ('consumer', 'contributor'),
+    'mark_as_unarchived': ('consumer', 'contributor'),
+}
+
+
+def refund_failed_response(failed):
+    return Response(
+        {'detail': 'Some payments could not be refunded', 'failed_payments': [
+            {'payment_id': payment.id, 'error': error} for payment, error in failed
+        ]},
+        status=status.HTTP_400_BAD_REQUEST
+    )
+
+
 class OrderViewSet(ModelViewSet):
     serializer_class = OrderSerializer
     permission_classes = (IsAuthenticated,)
@@ -33,23 +66,72 @@ class OrderViewSet(ModelViewSet):
     filter_backends = (DjangoFilterBackend,)
     filterset_class = OrderFilter
 
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return OrderListSerializer
+        return OrderSerializer
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            return queryset.select_related(*ORDER_LIST_RELATED)
+        return queryset.select_related(*ORDER_DETAIL_RELATED)
+
+    def apply_transition(self, request, name, retry=False, **values):
+        """
+        Applies a transition of orders.transitions to the order_id of the request,
+        returns the updated order or the error response. With retry an order the
+        transition already moved is returned as it is.
+        """
+        try:
+            return apply_transition(request.data.get('order_id'), name, **values), None
+        except (Order.DoesNotExist, ValueError):
+            return None, Response({'detail': 'Order not found'}, status=status.HTTP_404_NOT_FOUND)
+        except TransitionError as e:
+            if retry and e.order.status == TRANSITIONS[name].target:
+                return e.order, None
+            return None, Response({'detail': str(e), 'status': e.order.status}, status=status.HTTP_409_CONFLICT)
+
+    def apply_refund_transition(self, request, name, **values):
+        """
+        Refunds the payments of the order first and applies the transition only
+        when all of them were refunded, the order keeps its status otherwise.
+        A call whose refunds failed can be sent again, only the payments left
+        are refunded.
+
+        The order stays locked from the status check to the transition, so no
+        other action can move it after its payments were refunded. The
+        idempotency key of each refund keeps a payment from being refunded
+        twice should the transaction be rolled back after Stripe refunded it.
+        """
+        transition = TRANSITIONS[name]
+        with transaction.atomic():
+            try:
+                order = Order.objects.select_for_update().get(id=request.data.get('order_id'))
+            except (Order.DoesNotExist, ValueError):
+                return Response({'detail': 'Order not found'}, status=status.HTTP_404_NOT_FOUND)
+            if order.status != transition.target and order.status not in transition.sources:
+                error = TransitionError(order, name)
+                return Response({'detail': str(error), 'status': order.status}, status=status.HTTP_409_CONFLICT)
+
+            _, failed = refund_orders([order])
+            if failed:
+                return refund_failed_response(failed)
+            _, error_response = self.apply_transition(request, name, retry=True, **values)
+        return error_response or Response(status=status.HTTP_200_OK)
+
     @action(detail=False, methods=['post'])
     def mark_as_delivered(self, request):
-        order_id = request.data.get('order_id')
-        order = Order.objects.get(id=order_id)
-        order.status = 'Delivered'
-        order.delivered_at = datetime.now()
-        order.save()
-        return Response(status=status.HTTP_200_OK)
+        _, error_response = self.apply_transition(request, 'mark_as_delivered')
+        return error_response or Response(status=status.HTTP_200_OK)
 
     @action(detail=False, methods=['post'])
     def deny_cancellation(self, request):
-        order_id = request.data.get('order_id')
-        order = Order.objects.get(id=order_id)
-        order.status = 'Delivered'
-        order.cancel_denied_at = datetime.now()
-        order.cancel_denied_reason = request.data.get('cancel_denied_reason', '')
-        order.save()
+        order, error_response = self.apply_transition(
+            request, 'deny_cancellation', cancel_denied_reason=request.data.get('cancel_denied_reason', '')
+        )
+        if error_response is not None:
+            return error_response
         channel = ChatChannel.objects.get(order=order)
         ChatMessage.objects.create(
             channel=channel,
@@ -60,88 +142,38 @@ class OrderViewSet(ModelViewSet):
 
     @action(detail=False, methods=['post'])
     def request_new_video(self, request):
-        order_id = request.data.get('order_id')
-        order = Order.objects.get(id=order_id)
-        order.status = 'Redo Requested'
-        order.redo_requested_at = datetime.now()
-        order.save()
-        return Response(status=status.HTTP_200_OK)
+        _, error_response = self.apply_transition(request, 'request_new_video')
+        return error_response or Response(status=status.HTTP_200_OK)
 
     @action(detail=False, methods=['post'])
     def mark_as_redone(self, request):
-        order_id = request.data.get('order_id')
-        order = Order.objects.get(id=order_id)
-        order.status = 'Redone'
-        order.redone_at = datetime.now()
-        order.save()
-        return Response(status=status.HTTP_200_OK)
+        _, error_response = self.apply_transition(request, 'mark_as_redone')
+        return error_response or Response(status=status.HTTP_200_OK)
 
     @action(detail=False, methods=['post'])
     def request_refund(self, request):
-        order_id = request.data.get('order_id')
-        order = Order.objects.get(id=order_id)
-        order.status = 'Refund Requested'
-        order.refund_requested_at = datetime.now()
-        order.save()
-        return Response(status=status.HTTP_200_OK)
+        _, error_response = self.apply_transition(request, 'request_refund')
+        return error_response or Response(status=status.HTTP_200_OK)
 
     @action(detail=False, methods=['post'])
     def mark_as_refunded(self, request):
-        order_id = request.data.get('order_id')
-        order = Order.objects.get(id=order_id)
-
-        payments = Payment.objects.filter(order=order)
-        for payment in payments:
-            payment_intent = payment.consumer_payment_intent.id
-            stripe.Refund.create(
-                payment_intent=payment_intent,
-            )
-            payment.refunded = True
-            payment.save()
-
-        order.refunded_at = datetime.now()
-        order.status = 'Refunded'
-        order.save()
-        return Response(status=status.HTTP_200_OK)
+        return self.apply_refund_transition(request, 'mark_as_refunded')
 
     @action(detail=False, methods=['post'])
     def mark_as_archived(self, request):
-        order_id = request.data.get('order_id')
-        order = Order.objects.get(id=order_id)
-        order.archived = True
-        order.save()
-        return Response(status=status.HTTP_200_OK)
+        _, error_response = self.apply_transition(request, 'mark_as_archived')
+        return error_response or Response(status=status.HTTP_200_OK)
 
     @action(detail=False, methods=['post'])
     def mark_as_flagged(self, request):
-        flagged_reason = request.data.get('flagged_reason', '')
-        order_id = request.data.get('order_id')
-        order = Order.objects.get(id=order_id)
-        order.status = 'Flagged'
-        order.flagged = True
-        order.flagged_reason = flagged_reason
-        order.flagged_at = datetime.now()
-        order.save()
-        
-        payments = Payment.objects.filter(order=order)
-        for payment in payments:
-            payment_intent = payment.consumer_payment_intent.id
-            stripe.Refund.create(
-                payment_intent=payment_intent,
-            )
-            payment.refunded = True
-            payment.save()
-
-        return Response(status=status.HTTP_200_OK)
-
+        return self.apply_refund_transition(
+            request, 'mark_as_flagged', flagged_reason=request.data.get('flagged_reason', '')
+        )
 
     @action(detail=False, methods=['post'])
     def mark_as_unarchived(self, request):
-        order_id = request.data.get('order_id')
-        order = Order.objects.get(id=order_id)
-        order.archived = False
-        order.save()
-        return Response(status=status.HTTP_200_OK)
+        _, error_response = self.apply_transition(request, 'mark_as_unarchived')
+        return error_response or Response(status=status.HTTP_200_OK)
 
     @action(detail=False, methods=['post'])
     def leave_a_review(self, request):
@@ -164,29 +196,92 @@ class OrderViewSet(ModelViewSet):
 
     @action(detail=False, methods=['post'])
     def request_cancellation(self, request):
-        order_id = request.data.get('order_id')
-        order = Order.objects.get(id=order_id)
-        order.status = 'Cancel Requested'
-        order.cancel_requested_at = datetime.now()
-        order.save()
-        return Response(status=status.HTTP_200_OK)
+        _, error_response = self.apply_transition(request, 'request_cancellation')
+        return error_response or Response(status=status.HTTP_200_OK)
 
     @action(detail=False, methods=['post'])
     def mark_as_cancelled(self, request):
-        cancel_reason = request.data.get('cancel_reason', '')
-        order_id = request.data.get('order_id')
-        order = Order.objects.get(id=order_id)
-        order.status = 'Cancelled'
-        order.cancelled_at = datetime.now()
-        order.cancel_reason = cancel_reason
-        order.save()
-
-        payments = Payment.objects.filter(order=order)
-        for payment in payments:
-            payment_intent = payment.consumer_payment_intent.id
-            stripe.Refund.create(
-                payment_intent=payment_intent,
+        return self.apply_refund_transition(
+            request, 'mark_as_cancelled', cancel_reason=request.data.get('cancel_reason', '')
+        )
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Applies one of the order actions, given as action, to the orders of order_ids
+        at once, with the reason fields of the single actions. Admins may apply any
+        action to any order, other users the actions of BULK_ACTION_ROLES to the
+        orders they are the consumer or contributor of.
+        Returns the result of every order: ok, conflict, not_found or refund_failed.
+        """
+        name = request.data.get('action')
+        order_ids = request.data.get('order_ids')
+        if name not in TRANSITIONS:
+            return Response({'detail': f"action must be one of {', '.join(TRANSITIONS)}"}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(order_ids, list) or not order_ids or len(order_ids) > BULK_MAX_ORDERS:
+            return Response({'detail': f'order_ids must be a list of 1 to {BULK_MAX_ORDERS} ids'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            order_ids = [int(order_id) for order_id in order_ids]
+        except (TypeError, ValueError):
+            return Response({'detail': 'order_ids must be a list of ids'}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = Order.objects.all()
+        if not request.user.is_superuser:
+            roles = BULK_ACTION_ROLES.get(name, ())
+            if not roles:
+                return Response({'detail': f'Only admins can apply {name}'}, status=status.HTTP_403_FORBIDDEN)
+            scope = Q()
+            for role in roles:
+                scope |= Q(**{f'{role}__user': request.user})
+            queryset = queryset.filter(scope)
+        values = {}
+        if name in TRANSITION_FIELDS:
+            values[TRANSITION_FIELDS[name]] = request.data.get(TRANSITION_FIELDS[name], '')
+
+        transition = TRANSITIONS[name]
+        order_ids = list(dict.fromkeys(order_ids))
+        refund_failed = {}
+        with transaction.atomic():
+            if name in REFUND_TRANSITIONS:
+                # Only the orders whose payments were all refunded are moved. They stay
+                # locked until then, see apply_refund_transition
+                refundable_ids = queryset.filter(id__in=order_ids).filter(
+                    Q(status__in=transition.sources) | Q(status=transition.target)
+                ).values_list('id', flat=True)
+                locked = Order.objects.select_for_update().filter(id__in=list(refundable_ids)).filter(
+                    Q(status__in=transition.sources) | Q(status=transition.target)
+                )
+                _, failed = refund_orders(list(locked))
+                refund_failed = {payment.order_id: error for payment, error in failed}
+
+            updated, skipped = apply_transition_bulk(
+                [order_id for order_id in order_ids if order_id not in refund_failed], name, queryset=queryset, **values
             )
-            payment.refunded = True
-            payment.save()
-        return Response(status=status.HTTP_200_OK)
+        results = {order.id: {'order_id': order.id, 'result': 'ok', 'status': order.status} for order in updated}
+        for order_id, order_status in skipped.items():
+            # Orders an earlier call already refunded and moved, their payments left were refunded above
+            retried = name in REFUND_TRANSITIONS and order_status == transition.target
+            results[order_id] = {'order_id': order_id, 'result': 'ok' if retried else 'conflict', 'status': order_status}
+        for order_id, order_status in Order.objects.filter(id__in=refund_failed).values_list('id', 'status'):
+            results[order_id] = {
+                'order_id': order_id, 'result': 'refund_failed', 'status': order_status, 'error': refund_failed[order_id]
+            }
+
+        if name == 'deny_cancellation':
+            channels = {channel.order_id: channel for channel in ChatChannel.objects.filter(order__in=updated)}
+            for order in updated:
+                if order.id in channels and order.contributor_id:
+                    ChatMessage.objects.create(
+                        channel=channels[order.id],
+                        text=f"Your cancellation request has been denied. Reason: {order.cancel_denied_reason}",
+                        sender=order.contributor.user
+                    )
+
+        response_data = {
+            'action': name,
+            'updated': len(updated),
+            'results': [
+                results.get(order_id, {'order_id': order_id, 'result': 'not_found'}) for order_id in order_ids
+            ],
+        }
+        return Response(response_data)
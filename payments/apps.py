@@ -3,3 +3,15 @@ from django.apps import AppConfig
 
 class PaymentsConfig(AppConfig):
     name = 'payments'
+
+    def ready(self):
+        import stripe
+        from django.conf import settings
+
+        import payments.webhooks  # noqa F401
+
+        # Celery workers and management commands call Stripe without importing the views
+        if settings.STRIPE_LIVE_MODE == True:
+            stripe.api_key = settings.STRIPE_LIVE_SECRET_KEY
+        else:
+            stripe.api_key = settings.STRIPE_TEST_SECRET_KEY
@@ -0,0 +1,181 @@
+import logging
+
+import djstripe
+import stripe
+from django.db import transaction
+from django.utils import timezone
+
+from chat.outbox import enqueue_event
+from chat.publisher import SERVER_USER_ID
+from orders.models import Order
+
+from .customers import get_stripe_customer
+from .models import Checkout, Payment
+
+
+logger = logging.getLogger(__name__)
+
+RETURN_URL = 'http://localhost:8080/auth/'
+# Stripe errors worth retrying, the idempotency keys make the retried steps safe
+TRANSIENT_ERRORS = (stripe.error.APIConnectionError, stripe.error.RateLimitError, stripe.error.APIError)
+
+
+class CheckoutFailed(Exception):
+    pass
+
+
+def schedule_checkout(checkout):
+    from .tasks import process_checkout
+    transaction.on_commit(lambda: process_checkout.delay(checkout.id))
+
+
+def notify_checkout(checkout):
+    """
+    Tells the clients in the chat of the order that the checkout moved on
+    """
+    channel = getattr(checkout.order, 'chat_channel', None)
+    if channel is None:
+        return
+    enqueue_event(
+        channel.id,
+        {'type': 'checkout', 'order_id': checkout.order_id, 'checkout_id': checkout.id, 'status': checkout.status},
+        SERVER_USER_ID,
+        dedup_key=f'checkout:{checkout.id}:{checkout.status}:{checkout.payment_intent}'
+    )
+
+
+def _attach_payment_method(checkout, customer):
+    payment_method = stripe.PaymentMethod.retrieve(checkout.payment_method)
+    if payment_method.customer is None:
+        payment_method = stripe.PaymentMethod.attach(
+            payment_method.id,
+            customer=customer.id,
+            idempotency_key=f'checkout-{checkout.id}-attach'
+        )
+    elif payment_method.customer != customer.id:
+        raise CheckoutFailed("Payment method belongs to another customer")
+    return djstripe.models.PaymentMethod.sync_from_stripe_data(payment_method)
+
+
+def process(checkout):
+    """
+    Runs the Stripe steps of a checkout: resolving the customer, attaching
+    the payment method and confirming a PaymentIntent. Every step can be run
+    again after a failure, the Stripe calls carry idempotency keys derived
+    from the checkout.
+    """
+    # A stale copy of a checkout another worker already finished must not move it back
+    started = Checkout.objects.filter(id=checkout.id, status__in=('Pending', 'Processing')).update(
+        status='Processing', updated_at=timezone.now()
+    )
+    if not started:
+        checkout.refresh_from_db()
+        return checkout
+
+    try:
+        customer = get_stripe_customer(checkout.consumer.user)
+        _attach_payment_method(checkout, customer)
+        intent = stripe.PaymentIntent.create(
+            customer=customer.id,
+            payment_method=checkout.payment_method,
+            amount=int(checkout.order.total * 100),
+            currency='usd',
+            description=f'Charge for Order {checkout.order_id}',
+            confirm=True,
+            return_url=RETURN_URL,
+            metadata={'order_id': checkout.order_id, 'checkout_id': checkout.id},
+            idempotency_key=f'checkout-{checkout.id}-intent'
+        )
+    except TRANSIENT_ERRORS:
+        raise
+    except CheckoutFailed as e:
+        return fail_checkout(checkout, str(e))
+    except stripe.error.StripeError as e:
+        # Card declines come back as errors of the confirmation
+        if getattr(e, 'error', None) and getattr(e.error, 'payment_intent', None):
+            return update_from_payment_intent(checkout, e.error.payment_intent)
+        return fail_checkout(checkout, e.user_message or str(e))
+    return update_from_payment_intent(checkout, intent)
+
+
+def fail_checkout(checkout, error):
+    updated = Checkout.objects.filter(id=checkout.id).exclude(status__in=('Succeeded', 'Failed')).update(
+        status='Failed', error=error, updated_at=timezone.now()
+    )
+    checkout.refresh_from_db()
+    if updated:
+        notify_checkout(checkout)
+    return checkout
+
+
+def _charge_id(intent):
+    # latest_charge on recent API versions, the list of charges on older ones
+    charge = intent.get('latest_charge')
+    if charge is None:
+        charges = (intent.get('charges') or {}).get('data') or []
+        charge = charges[0] if charges else None
+    return charge.get('id') if isinstance(charge, dict) else charge
+
+
+def _sync_payment_intent(intent):
+    """
+    The djstripe PaymentIntent of a succeeded checkout, the Payment is refunded through it.
+    A failed sync does not fail the paid checkout, which keeps the intent id as well.
+    """
+    try:
+        # In a savepoint, so a failed sync does not break the transaction of the webhook
+        with transaction.atomic():
+            return djstripe.models.PaymentIntent.sync_from_stripe_data(intent)
+    except Exception:
+        logger.exception("Could not sync the PaymentIntent %s", intent['id'])
+        return None
+
+
+def update_from_payment_intent(checkout, intent):
+    """
+    Moves a checkout to the state of its PaymentIntent, from the worker or
+    the payment_intent webhooks, whichever comes first. The order is paid once.
+    """
+    intent_status = intent['status']
+    if intent_status == 'succeeded':
+        payment_intent = None
+        if not Checkout.objects.filter(id=checkout.id, status='Succeeded').exists():
+            payment_intent = _sync_payment_intent(intent)
+        with transaction.atomic():
+            updated = Checkout.objects.filter(id=checkout.id).exclude(status='Succeeded').update(
+                status='Succeeded', payment_intent=intent['id'], client_secret='', error='',
+                updated_at=timezone.now()
+            )
+            if updated:
+                now = timezone.now()
+                Payment.objects.create(
+                    order_id=checkout.order_id,
+                    consumer_id=checkout.consumer_id,
+                    amount=checkout.order.total,
+                    consumer_payment_intent=payment_intent,
+                    charge_id=_charge_id(intent),
+                    payment_method=djstripe.models.PaymentMethod.objects.filter(id=checkout.payment_method).first(),
+                )
+                Order.objects.filter(id=checkout.order_id, status='Pending').update(
+                    status='In Progress', paid_at=now, updated_at=now
+                )
+        checkout.refresh_from_db()
+        if updated:
+            notify_checkout(checkout)
+        return checkout
+
+    if intent_status in ('requires_payment_method', 'canceled'):
+        error = (intent.get('last_payment_error') or {}).get('message') or "The payment was not accepted"
+        return fail_checkout(checkout, error)
+
+    status = 'Requires Action' if intent_status in ('requires_action', 'requires_confirmation') else 'Processing'
+    previous = Checkout.objects.filter(id=checkout.id).values_list('status', 'payment_intent').first()
+    # The intent is always stored, the webhooks and checkout_status look the checkout up by it
+    Checkout.objects.filter(id=checkout.id).exclude(status__in=('Succeeded', 'Failed')).update(
+        status=status, payment_intent=intent['id'], client_secret=intent.get('client_secret') or '',
+        updated_at=timezone.now()
+    )
+    checkout.refresh_from_db()
+    if (checkout.status, checkout.payment_intent) != previous:
+        notify_checkout(checkout)
+    return checkout
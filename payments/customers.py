@@ -0,0 +1,115 @@
+import logging
+
+import djstripe
+import stripe
+from django.db.models import Q
+from django.utils import timezone
+
+from consumers.models import Consumer
+
+
+logger = logging.getLogger(__name__)
+
+
+def search_stripe_customer(email):
+    """
+    Looks a customer up by email with Stripe's search API, which only sees
+    customers created more than about a minute ago
+    """
+    escaped = email.replace('\\', '\\\\').replace("'", "\\'")
+    result = stripe.Customer.search(query=f"email:'{escaped}'", limit=1)
+    return result.data[0] if result.data else None
+
+
+def get_stripe_customer(user):
+    """
+    Returns the djstripe Customer of a user, creating it on Stripe when they
+    have none. It is looked for in order on the Consumer, in the local
+    djstripe Customer table and with Stripe's search, and saved on the
+    Consumer once found, so returning users cost no Stripe call at all.
+    """
+    consumer = user.consumer
+    if consumer.stripe_account_id:
+        return consumer.stripe_account
+
+    customer = djstripe.models.Customer.objects.filter(
+        Q(subscriber=user) | Q(email=user.email) if user.email else Q(subscriber=user),
+        date_purged__isnull=True
+    ).order_by('-created').first()
+
+    if customer is None:
+        stripe_customer = search_stripe_customer(user.email) if user.email else None
+        if stripe_customer is None:
+            # Concurrent checkouts of a new user create a single customer
+            stripe_customer = stripe.Customer.create(email=user.email, idempotency_key=f'blessn-customer-{user.id}')
+        customer = djstripe.models.Customer.sync_from_stripe_data(stripe_customer)
+
+    Consumer.objects.filter(id=consumer.id).update(stripe_account=customer)
+    consumer.stripe_account = customer
+    return customer
+
+
+def list_payment_methods(customer):
+    """
+    The cards of a customer, read from the local djstripe PaymentMethod table
+    that the Stripe webhooks keep up to date
+    """
+    return djstripe.models.PaymentMethod.objects.filter(customer=customer, type='card').order_by('-created')
+
+
+def set_default_payment_method(customer, payment_method):
+    """
+    Makes a card the default one of the customer on Stripe and locally
+    """
+    stripe_customer = stripe.Customer.modify(
+        customer.id,
+        invoice_settings={'default_payment_method': payment_method.id}
+    )
+    customer.invoice_settings = stripe_customer.invoice_settings
+    customer.default_payment_method = payment_method
+    customer.save(update_fields=['invoice_settings', 'default_payment_method'])
+
+
+def sync_customer_wallet(customer):
+    """
+    Copies the cards and the default card of a customer from Stripe to the
+    local tables, for customers whose cards were saved before the webhooks
+    """
+    stripe_customer = stripe.Customer.retrieve(customer.id)
+    payment_method_ids = []
+    for payment_method in stripe.PaymentMethod.list(customer=customer.id, type='card').auto_paging_iter():
+        djstripe.models.PaymentMethod.sync_from_stripe_data(payment_method)
+        payment_method_ids.append(payment_method.id)
+
+    # Cards detached while no webhook reached us
+    list_payment_methods(customer).exclude(id__in=payment_method_ids).update(customer=None)
+
+    default_id = (stripe_customer.invoice_settings or {}).get('default_payment_method')
+    customer.invoice_settings = stripe_customer.invoice_settings
+    customer.default_payment_method = djstripe.models.PaymentMethod.objects.filter(id=default_id).first()
+    customer.save(update_fields=['invoice_settings', 'default_payment_method'])
+    return len(payment_method_ids)
+
+
+def get_wallet_customer(user):
+    """
+    The djstripe Customer of a user, see get_stripe_customer, with its cards
+    copied from Stripe the first time its wallet is read while it has no local
+    cards, as for customers whose cards were saved before the webhooks. Later
+    reads rely on the webhooks alone.
+    """
+    customer = get_stripe_customer(user)
+    consumer = user.consumer
+    if consumer.wallet_synced_at is not None:
+        return customer
+
+    if not list_payment_methods(customer).exists():
+        try:
+            sync_customer_wallet(customer)
+        except stripe.error.StripeError:
+            # Tried again on the next read
+            logger.exception("Could not sync the wallet of customer %s", customer.id)
+            return customer
+    consumer.wallet_synced_at = timezone.now()
+    Consumer.objects.filter(id=consumer.id).update(wallet_synced_at=consumer.wallet_synced_at)
+    return customer
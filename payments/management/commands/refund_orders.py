@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.models import Order
+from payments.refunds import REFUND_WORKERS, refund_payments, refundable_payments
+
+
+class Command(BaseCommand):
+    help = "Refund the payments of orders on Stripe, in batches, for example after an incident"
+
+    def add_arguments(self, parser):
+        parser.add_argument('order_ids', nargs='*', type=int, help="The orders to refund")
+        parser.add_argument('--status', help="Refund every order with this status, such as Cancelled")
+        parser.add_argument('--workers', type=int, default=REFUND_WORKERS, help="Refunds sent at the same time")
+        parser.add_argument('--batch-size', type=int, default=500, help="Payments loaded and saved at once")
+        parser.add_argument('--dry-run', action='store_true', help="Only count the payments to refund")
+
+    def handle(self, *args, **kwargs) -> None:
+        if not kwargs['order_ids'] and not kwargs['status']:
+            raise CommandError("Pass order ids or --status")
+
+        orders = Order.objects.all()
+        if kwargs['order_ids']:
+            orders = orders.filter(id__in=kwargs['order_ids'])
+        if kwargs['status']:
+            orders = orders.filter(status=kwargs['status'])
+
+        payments = refundable_payments(orders)
+        if kwargs['dry_run']:
+            self.stdout.write(f"{payments.count()} payments would be refunded.")
+            return
+
+        refunded_count = failed_count = 0
+        last_id = 0
+        while True:
+            # Failed payments stay unrefunded, page by id so they are not picked up again
+            batch = list(payments.filter(id__gt=last_id)[:kwargs['batch_size']])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            refunded, failed = refund_payments(batch, max_workers=kwargs['workers'])
+            refunded_count += len(refunded)
+            failed_count += len(failed)
+            for payment, error in failed:
+                self.stderr.write(f"Payment {payment.id} of order {payment.order_id}: {error}")
+
+        self.stdout.write(self.style.SUCCESS(f"Successfully refunded {refunded_count} payments, {failed_count} failed."))
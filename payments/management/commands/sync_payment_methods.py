@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from consumers.models import Consumer
+from payments.customers import sync_customer_wallet
+
+
+class Command(BaseCommand):
+    help = "Copy the cards of every consumer from Stripe to the local djstripe tables"
+
+    def handle(self, *args, **kwargs) -> None:
+        customer_count = card_count = 0
+        for consumer in Consumer.objects.filter(stripe_account__isnull=False).select_related('stripe_account'):
+            card_count += sync_customer_wallet(consumer.stripe_account)
+            Consumer.objects.filter(id=consumer.id).update(wallet_synced_at=timezone.now())
+            customer_count += 1
+        self.stdout.write(self.style.SUCCESS(f"Successfully synced {card_count} cards of {customer_count} customers."))
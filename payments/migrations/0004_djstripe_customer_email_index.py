@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Indexes the emails of the local djstripe customers, see payments.customers
+    """
+
+    dependencies = [
+        ('payments', '0003_bookingfee'),
+        ('djstripe', '0008_2_5'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            "CREATE INDEX IF NOT EXISTS payments_djstripe_customer_email_idx ON djstripe_customer (email)",
+            "DROP INDEX IF EXISTS payments_djstripe_customer_email_idx"
+        ),
+    ]
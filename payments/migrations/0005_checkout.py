@@ -0,0 +1,35 @@
+# Generated by Django 2.2.28 on 2026-10-18 10:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consumers', '0002_consumer_stripe_account'),
+        ('orders', '0006_order_hls_playlist'),
+        ('payments', '0004_djstripe_customer_email_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Checkout',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payment_method', models.CharField(help_text='The Stripe id of the payment method to charge', max_length=255)),
+                ('idempotency_key', models.CharField(help_text='Sent by the client, placing the same order again returns this checkout', max_length=255)),
+                ('status', models.CharField(choices=[('Pending', 'Pending'), ('Processing', 'Processing'), ('Requires Action', 'Requires Action'), ('Succeeded', 'Succeeded'), ('Failed', 'Failed')], default='Pending', max_length=255)),
+                ('payment_intent', models.CharField(blank=True, help_text='The Stripe id of the PaymentIntent charging the order', max_length=255)),
+                ('client_secret', models.CharField(blank=True, help_text='Lets the client complete a PaymentIntent requiring an action', max_length=255)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('consumer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkouts', to='consumers.Consumer')),
+                ('order', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='checkout', to='orders.Order')),
+            ],
+            options={
+                'unique_together': {('consumer', 'idempotency_key')},
+            },
+        ),
+    ]
@@ -59,3 +59,61 @@ class BookingFee(models.Model):
         max_digits=8,
         decimal_places=2
     )
+
+
+class Checkout(models.Model):
+    """
+    A model to represent the payment of a new Order, driven step by step on
+    Stripe by a worker while the client polls it, see payments.checkout
+    """
+    order = models.OneToOneField(
+        Order,
+        on_delete=models.CASCADE,
+        related_name='checkout'
+    )
+    consumer = models.ForeignKey(
+        Consumer,
+        on_delete=models.CASCADE,
+        related_name='checkouts'
+    )
+    payment_method = models.CharField(
+        max_length=255,
+        help_text="The Stripe id of the payment method to charge"
+    )
+    idempotency_key = models.CharField(
+        max_length=255,
+        help_text="Sent by the client, placing the same order again returns this checkout"
+    )
+    status = models.CharField(
+        max_length=255,
+        choices=(
+            ('Pending', 'Pending'),
+            ('Processing', 'Processing'),
+            ('Requires Action', 'Requires Action'),
+            ('Succeeded', 'Succeeded'),
+            ('Failed', 'Failed')
+        ),
+        default='Pending'
+    )
+    payment_intent = models.CharField(
+        max_length=255,
+        blank=True,
+        help_text="The Stripe id of the PaymentIntent charging the order"
+    )
+    client_secret = models.CharField(
+        max_length=255,
+        blank=True,
+        help_text="Lets the client complete a PaymentIntent requiring an action"
+    )
+    error = models.TextField(
+        blank=True
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True
+    )
+
+    class Meta:
+        unique_together = ('consumer', 'idempotency_key')
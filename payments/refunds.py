@@ -0,0 +1,84 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import stripe
+
+from .models import Payment
+
+
+logger = logging.getLogger(__name__)
+
+# Refunds sent to Stripe at the same time
+REFUND_WORKERS = 8
+
+
+def payment_intent_id(payment):
+    """
+    The Stripe PaymentIntent that charged a payment, from the djstripe
+    PaymentIntent or the checkout of its order
+    """
+    if payment.consumer_payment_intent_id:
+        return payment.consumer_payment_intent.id
+    checkout = getattr(payment.order, 'checkout', None) if payment.order_id else None
+    return checkout.payment_intent if checkout and checkout.payment_intent else None
+
+
+def _refund(payment, payment_intent):
+    try:
+        # The key is derived from the payment, refunding it again never refunds twice
+        stripe.Refund.create(payment_intent=payment_intent, idempotency_key=f'blessn-refund-payment-{payment.id}')
+    except stripe.error.InvalidRequestError as e:
+        if e.code != 'charge_already_refunded':
+            raise
+
+
+def refund_payments(payments, max_workers=REFUND_WORKERS):
+    """
+    Refunds payments on Stripe with up to max_workers requests at the same
+    time, then flags the refunded ones with a single bulk_update. Payments
+    already flagged are skipped. Returns the refunded payments and the
+    (payment, error) pairs of the others.
+    """
+    refunded, failed, pending = [], [], []
+    for payment in payments:
+        if payment.refunded:
+            continue
+        payment_intent = payment_intent_id(payment)
+        if payment_intent is None:
+            failed.append((payment, "No payment intent to refund"))
+        else:
+            pending.append((payment, payment_intent))
+
+    if pending:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(pending))) as executor:
+            futures = {executor.submit(_refund, payment, payment_intent): payment for payment, payment_intent in pending}
+            for future in as_completed(futures):
+                payment = futures[future]
+                try:
+                    future.result()
+                except stripe.error.StripeError as e:
+                    logger.warning("Could not refund payment %s: %s", payment.id, e)
+                    failed.append((payment, e.user_message or str(e)))
+                except Exception as e:
+                    # Any other error only fails its own payment, the refunded ones are still flagged below
+                    logger.exception("Could not refund payment %s", payment.id)
+                    failed.append((payment, str(e)))
+                else:
+                    payment.refunded = True
+                    refunded.append(payment)
+
+    Payment.objects.bulk_update(refunded, ['refunded'])
+    return refunded, failed
+
+
+def refundable_payments(orders):
+    return Payment.objects.filter(order__in=orders, refunded=False).select_related(
+        'consumer_payment_intent', 'order__checkout'
+    ).order_by('id')
+
+
+def refund_orders(orders, max_workers=REFUND_WORKERS):
+    """
+    Refunds every payment of the orders not refunded yet, see refund_payments
+    """
+    return refund_payments(refundable_payments(orders), max_workers=max_workers)
@@ -1,5 +1,6 @@
+from djstripe.models import PaymentMethod
 from rest_framework import serializers
-from .models import Payment
+from .models import Checkout, Payment
 
 
 class PaymentSerializer(serializers.ModelSerializer):
@@ -11,3 +12,41 @@ class PaymentSerializer(serializers.ModelSerializer):
         model = Payment
         fields = '__all__'
         depth = 3
+
+
+class WalletPaymentMethodSerializer(serializers.ModelSerializer):
+    """
+    A card of a customer read from the local djstripe tables, in the shape of
+    the Stripe PaymentMethod objects the wallet screens already read.
+    metadata.default tells the default card of the customer.
+    """
+    object = serializers.SerializerMethodField()
+    created = serializers.SerializerMethodField()
+    customer = serializers.SerializerMethodField()
+    metadata = serializers.SerializerMethodField()
+
+    class Meta:
+        model = PaymentMethod
+        fields = ('id', 'object', 'billing_details', 'card', 'created', 'customer', 'livemode', 'metadata', 'type')
+
+    def get_object(self, obj):
+        return 'payment_method'
+
+    def get_created(self, obj):
+        return int(obj.created.timestamp()) if obj.created else None
+
+    def get_customer(self, obj):
+        return self.context['customer'].id
+
+    def get_metadata(self, obj):
+        metadata = dict(obj.metadata or {})
+        default_id = self.context['customer'].default_payment_method_id
+        if default_id:
+            metadata['default'] = str(obj.id == default_id)
+        return metadata
+
+
+class CheckoutSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Checkout
+        fields = ('id', 'order', 'status', 'payment_intent', 'client_secret', 'error', 'created_at', 'updated_at')
@@ -0,0 +1,17 @@
+from celery import shared_task
+
+from .checkout import TRANSIENT_ERRORS, fail_checkout, process
+from .models import Checkout
+
+
+@shared_task(bind=True, max_retries=5)
+def process_checkout(self, checkout_id):
+    checkout = Checkout.objects.select_related('order', 'consumer__user').filter(id=checkout_id).first()
+    if checkout is None:
+        return None
+    try:
+        return process(checkout).status
+    except TRANSIENT_ERRORS as e:
+        if self.request.retries >= self.max_retries:
+            return fail_checkout(checkout, "The payment could not be processed, please try again").status
+        raise self.retry(exc=e, countdown=2 ** self.request.retries)
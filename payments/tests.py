@@ -1,3 +1,316 @@
+from types import SimpleNamespace
+from unittest import mock
+
+import djstripe
+import stripe
 from django.test import TestCase
 
-# Create your tests here.
+from chat.models import ChatChannel, ChatOutboxEvent
+from consumers.models import Consumer
+from contributors.models import Contributor
+from orders.models import Order
+from users.models import User
+
+from .checkout import process, update_from_payment_intent
+from .customers import get_wallet_customer
+from .models import Checkout, Payment
+from .refunds import refund_orders
+from .tasks import process_checkout
+from .webhooks import payment_intent_handler
+
+
+def payment_intent(status, intent_id='pi_1', **fields):
+    intent = {
+        'id': intent_id,
+        'object': 'payment_intent',
+        'status': status,
+        'amount': 2000,
+        'currency': 'usd',
+        'client_secret': f'{intent_id}_secret',
+        'latest_charge': 'ch_1' if status == 'succeeded' else None,
+        'last_payment_error': None,
+        'metadata': {},
+    }
+    intent.update(fields)
+    return intent
+
+
+def sync_payment_intent(intent):
+    # Stands in for the djstripe sync, which needs the whole Stripe object graph
+    payment_intent, _ = djstripe.models.PaymentIntent.objects.update_or_create(id=intent['id'], defaults=dict(
+        amount=intent['amount'],
+        amount_capturable=0,
+        amount_received=intent['amount'],
+        capture_method='automatic',
+        client_secret=intent['client_secret'],
+        confirmation_method='automatic',
+        currency=intent['currency'],
+        payment_method_types=['card'],
+        status=intent['status'],
+    ))
+    return payment_intent
+
+
+def card_error(intent):
+    error = stripe.error.CardError("Your card was declined.", None, 'card_declined')
+    error.error = SimpleNamespace(payment_intent=intent)
+    return error
+
+
+def webhook_event(intent):
+    return SimpleNamespace(data={'object': intent})
+
+
+class CheckoutTests(TestCase):
+    """
+    The checkout state machine of payments.checkout, with every Stripe call mocked
+    """
+
+    def setUp(self):
+        consumer_user = User.objects.create(email='consumer@example.com', username='consumer')
+        contributor_user = User.objects.create(email='contributor@example.com', username='contributor')
+        self.consumer = Consumer.objects.create(user=consumer_user)
+        contributor = Contributor.objects.create(user=contributor_user)
+        self.order = Order.objects.create(consumer=self.consumer, contributor=contributor, video_fee=15, booking_fee=5)
+        self.channel = ChatChannel.objects.create(order=self.order)
+        self.checkout = Checkout.objects.create(
+            order=self.order, consumer=self.consumer, payment_method='pm_1', idempotency_key='key-1'
+        )
+
+        patches = [
+            mock.patch('payments.checkout.get_stripe_customer', return_value=SimpleNamespace(id='cus_1')),
+            mock.patch('stripe.PaymentMethod.retrieve', return_value=SimpleNamespace(id='pm_1', customer=None)),
+            mock.patch('stripe.PaymentMethod.attach', return_value=SimpleNamespace(id='pm_1', customer='cus_1')),
+            mock.patch('djstripe.models.PaymentMethod.sync_from_stripe_data'),
+            mock.patch('djstripe.models.PaymentIntent.sync_from_stripe_data', side_effect=sync_payment_intent),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.create_intent = mock.patch('stripe.PaymentIntent.create').start()
+        self.addCleanup(mock.patch.stopall)
+
+    def refresh(self):
+        self.checkout.refresh_from_db()
+        self.order.refresh_from_db()
+
+    def notifications(self):
+        return list(ChatOutboxEvent.objects.filter(channel=str(self.channel.id)).values_list('dedup_key', flat=True))
+
+    def test_succeeded_checkout_pays_the_order(self):
+        self.create_intent.return_value = payment_intent('succeeded')
+
+        process(self.checkout)
+
+        self.refresh()
+        self.assertEqual(self.checkout.status, 'Succeeded')
+        self.assertEqual(self.checkout.payment_intent, 'pi_1')
+        self.assertEqual(self.order.status, 'In Progress')
+        self.assertIsNotNone(self.order.paid_at)
+        payment = Payment.objects.get(order=self.order)
+        self.assertEqual(payment.amount, 20)
+        self.assertEqual(payment.consumer_payment_intent.id, 'pi_1')
+        self.assertEqual(payment.charge_id, 'ch_1')
+        kwargs = self.create_intent.call_args[1]
+        self.assertEqual(kwargs['amount'], 2000)
+        self.assertEqual(kwargs['idempotency_key'], f'checkout-{self.checkout.id}-intent')
+        self.assertEqual(self.notifications(), [f'checkout:{self.checkout.id}:Succeeded:pi_1'])
+
+    def test_replayed_checkout_pays_once(self):
+        self.create_intent.return_value = payment_intent('succeeded')
+
+        process(self.checkout)
+        process(self.checkout)
+        self.checkout.status = 'Processing'
+        process(self.checkout)
+
+        self.assertEqual(Payment.objects.filter(order=self.order).count(), 1)
+        keys = {call[1]['idempotency_key'] for call in self.create_intent.call_args_list}
+        self.assertEqual(keys, {f'checkout-{self.checkout.id}-intent'})
+        self.assertEqual(len(self.notifications()), 1)
+
+    def test_declined_card_fails_the_checkout(self):
+        self.create_intent.side_effect = card_error(payment_intent(
+            'requires_payment_method', last_payment_error={'message': "Your card was declined."}
+        ))
+
+        process(self.checkout)
+
+        self.refresh()
+        self.assertEqual(self.checkout.status, 'Failed')
+        self.assertEqual(self.checkout.error, "Your card was declined.")
+        self.assertEqual(self.order.status, 'Pending')
+        self.assertFalse(Payment.objects.exists())
+
+    def test_payment_method_of_another_customer_fails_the_checkout(self):
+        stripe.PaymentMethod.retrieve.return_value = SimpleNamespace(id='pm_1', customer='cus_other')
+
+        process(self.checkout)
+
+        self.refresh()
+        self.assertEqual(self.checkout.status, 'Failed')
+        self.create_intent.assert_not_called()
+
+    def test_3d_secure_completes_through_the_webhook(self):
+        self.create_intent.return_value = payment_intent('requires_action')
+
+        process(self.checkout)
+
+        self.refresh()
+        self.assertEqual(self.checkout.status, 'Requires Action')
+        self.assertEqual(self.checkout.payment_intent, 'pi_1')
+        self.assertEqual(self.checkout.client_secret, 'pi_1_secret')
+        self.assertEqual(self.order.status, 'Pending')
+
+        payment_intent_handler(webhook_event(payment_intent('succeeded')))
+
+        self.refresh()
+        self.assertEqual(self.checkout.status, 'Succeeded')
+        self.assertEqual(self.checkout.client_secret, '')
+        self.assertEqual(self.order.status, 'In Progress')
+        self.assertEqual(Payment.objects.filter(order=self.order).count(), 1)
+
+    def test_failed_3d_secure_fails_the_checkout(self):
+        self.create_intent.return_value = payment_intent('requires_action')
+        process(self.checkout)
+
+        payment_intent_handler(webhook_event(payment_intent(
+            'requires_payment_method', last_payment_error={'message': "Authentication failed."}
+        )))
+
+        self.refresh()
+        self.assertEqual(self.checkout.status, 'Failed')
+        self.assertEqual(self.checkout.error, "Authentication failed.")
+        self.assertEqual(self.order.status, 'Pending')
+
+    def test_processing_intent_is_stored(self):
+        # process() sets Processing itself before the intent comes back processing
+        self.create_intent.return_value = payment_intent('processing')
+
+        process(self.checkout)
+
+        self.refresh()
+        self.assertEqual(self.checkout.status, 'Processing')
+        self.assertEqual(self.checkout.payment_intent, 'pi_1')
+
+        payment_intent_handler(webhook_event(payment_intent('succeeded')))
+
+        self.refresh()
+        self.assertEqual(self.checkout.status, 'Succeeded')
+
+    def test_webhook_delivered_twice_pays_once(self):
+        self.create_intent.return_value = payment_intent('requires_action')
+        process(self.checkout)
+
+        event = webhook_event(payment_intent('succeeded'))
+        payment_intent_handler(event)
+        payment_intent_handler(event)
+
+        self.assertEqual(Payment.objects.filter(order=self.order).count(), 1)
+        self.assertEqual(self.notifications().count(f'checkout:{self.checkout.id}:Succeeded:pi_1'), 1)
+
+    def test_webhook_after_the_worker_pays_once(self):
+        self.create_intent.return_value = payment_intent('succeeded')
+        process(self.checkout)
+
+        payment_intent_handler(webhook_event(payment_intent('succeeded')))
+
+        self.assertEqual(Payment.objects.filter(order=self.order).count(), 1)
+        self.assertEqual(len(self.notifications()), 1)
+
+    def test_late_failure_does_not_undo_a_success(self):
+        self.create_intent.return_value = payment_intent('succeeded')
+        process(self.checkout)
+
+        update_from_payment_intent(self.checkout, payment_intent('requires_payment_method'))
+        update_from_payment_intent(self.checkout, payment_intent('processing'))
+
+        self.refresh()
+        self.assertEqual(self.checkout.status, 'Succeeded')
+        self.assertEqual(self.order.status, 'In Progress')
+
+    def test_failed_intent_sync_still_records_the_payment(self):
+        djstripe.models.PaymentIntent.sync_from_stripe_data.side_effect = stripe.error.APIConnectionError("down")
+        self.create_intent.return_value = payment_intent('succeeded')
+
+        with self.assertLogs('payments.checkout', level='ERROR'):
+            process(self.checkout)
+
+        payment = Payment.objects.get(order=self.order)
+        self.assertIsNone(payment.consumer_payment_intent_id)
+        self.assertEqual(payment.charge_id, 'ch_1')
+
+    def test_transient_errors_are_retried(self):
+        self.create_intent.side_effect = [stripe.error.APIConnectionError("down"), payment_intent('succeeded')]
+
+        process_checkout.apply(args=(self.checkout.id,))
+
+        self.refresh()
+        self.assertEqual(self.checkout.status, 'Succeeded')
+        self.assertEqual(self.create_intent.call_count, 2)
+
+    def test_checkout_fails_once_the_retries_run_out(self):
+        self.create_intent.side_effect = stripe.error.APIConnectionError("down")
+
+        process_checkout.apply(args=(self.checkout.id,))
+
+        self.refresh()
+        self.assertEqual(self.checkout.status, 'Failed')
+        self.assertEqual(self.create_intent.call_count, process_checkout.max_retries + 1)
+        self.assertFalse(Payment.objects.exists())
+
+
+class RefundTests(TestCase):
+
+    def setUp(self):
+        consumer = Consumer.objects.create(user=User.objects.create(email='consumer@example.com', username='consumer'))
+        self.order = Order.objects.create(consumer=consumer)
+        Checkout.objects.create(
+            order=self.order, consumer=consumer, payment_method='pm_1', idempotency_key='key-1', payment_intent='pi_1'
+        )
+        self.payments = [Payment.objects.create(order=self.order, consumer=consumer, amount=10) for _ in range(3)]
+
+    def test_unexpected_error_keeps_the_other_refunds(self):
+        def refund(payment_intent, idempotency_key):
+            if idempotency_key == f'blessn-refund-payment-{self.payments[1].id}':
+                raise ValueError("unexpected")
+
+        with mock.patch('stripe.Refund.create', side_effect=refund), self.assertLogs('payments.refunds', level='ERROR'):
+            refunded, failed = refund_orders([self.order])
+
+        self.assertEqual(len(refunded), 2)
+        self.assertEqual([(payment.id, error) for payment, error in failed], [(self.payments[1].id, "unexpected")])
+        self.assertEqual(
+            set(Payment.objects.filter(refunded=True).values_list('id', flat=True)),
+            {self.payments[0].id, self.payments[2].id}
+        )
+
+
+class WalletTests(TestCase):
+
+    def setUp(self):
+        self.customer = djstripe.models.Customer.objects.create(id='cus_1')
+        self.user = User.objects.create(email='consumer@example.com', username='consumer')
+        self.consumer = Consumer.objects.create(user=self.user, stripe_account=self.customer)
+        patch = mock.patch('payments.customers.sync_customer_wallet')
+        self.sync_customer_wallet = patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_empty_wallet_is_synced_once(self):
+        self.assertEqual(get_wallet_customer(self.user), self.customer)
+        get_wallet_customer(self.user)
+
+        self.sync_customer_wallet.assert_called_once_with(self.customer)
+        self.consumer.refresh_from_db()
+        self.assertIsNotNone(self.consumer.wallet_synced_at)
+
+    def test_failed_sync_is_tried_again(self):
+        self.sync_customer_wallet.side_effect = [stripe.error.APIConnectionError("down"), 0]
+
+        with self.assertLogs('payments.customers', level='ERROR'):
+            get_wallet_customer(self.user)
+        self.consumer.refresh_from_db()
+        self.assertIsNone(self.consumer.wallet_synced_at)
+
+        get_wallet_customer(self.user)
+        self.assertEqual(self.sync_customer_wallet.call_count, 2)
@@ -1,4 +1,4 @@
-from django.utils import timezone
+from django.db import IntegrityError, transaction
 
 from rest_framework import status
 from rest_framework.decorators import action
@@ -6,8 +6,10 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet
 
-from payments.models import Payment, BookingFee
-from payments.serializers import PaymentSerializer
+from payments.models import Payment, BookingFee, Checkout
+from payments.serializers import CheckoutSerializer, PaymentSerializer, WalletPaymentMethodSerializer
+from payments.checkout import schedule_checkout, update_from_payment_intent
+from payments.customers import get_wallet_customer, list_payment_methods, set_default_payment_method
 
 from orders.models import Order
 from chat.models import ChatChannel
@@ -18,9 +20,10 @@ from contributors.models import Contributor
 
 from dropdowns.models import Occasion
 
-from customadmin.utils import contains_banned_words
+from customadmin.utils import fields_with_banned_words
 
 from decimal import Decimal
+import uuid
 
 import stripe
 import djstripe
@@ -68,8 +71,21 @@ class PaymentViewSet(ModelViewSet):
 
     @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
     def place_an_order(self, request):
+        """
+        Creates the order and its checkout, then returns right away with 202 while a
+        worker charges the payment method, see payments.checkout. Poll checkout_status
+        or listen to the chat channel of the order for the outcome. Sending the same
+        idempotency_key again returns the checkout of the first request.
+        """
         payment_method = request.data.get('payment_method')
         consumer = request.user.consumer
+        idempotency_key = request.data.get('idempotency_key') or request.META.get('HTTP_IDEMPOTENCY_KEY')
+        if idempotency_key:
+            checkout = Checkout.objects.filter(consumer=consumer, idempotency_key=idempotency_key).first()
+            if checkout is not None:
+                return Response(CheckoutSerializer(checkout).data, status=status.HTTP_202_ACCEPTED)
+        if not payment_method:
+            return Response({'detail': 'Missing Payment Method ID'}, status=status.HTTP_400_BAD_REQUEST)
         try:
             contributor = Contributor.objects.get(id=request.data.get('contributor_id'))
         except:
@@ -88,16 +104,15 @@ class PaymentViewSet(ModelViewSet):
             return Response({'detail': 'Invalid turnaround selected'}, status=status.HTTP_400_BAD_REQUEST)
 
         video_for = request.data.get('video_for', '')
-        if contains_banned_words(video_for):
-            return Response({'detail': 'Video For contains a banned word.'}, status=status.HTTP_400_BAD_REQUEST)
-
         introduce_yourself = request.data.get('introduce_yourself', '')
-        if contains_banned_words(introduce_yourself):
-            return Response({'detail': 'Introduce Yourself contains a banned word.'}, status=status.HTTP_400_BAD_REQUEST)
-
         video_to_say = request.data.get('video_to_say', '')
-        if contains_banned_words(video_to_say):
-            return Response({'detail': 'Video To Say contains a banned word.'}, status=status.HTTP_400_BAD_REQUEST)
+        banned_fields = fields_with_banned_words({
+            'Video For': video_for,
+            'Introduce Yourself': introduce_yourself,
+            'Video To Say': video_to_say,
+        })
+        if banned_fields:
+            return Response({'detail': f'{banned_fields[0]} contains a banned word.'}, status=status.HTTP_400_BAD_REQUEST)
 
         if request.data.get('occasion_id') is not None:
             occasion = Occasion.objects.get(id=request.data.get('occasion_id'))
@@ -112,173 +127,105 @@ class PaymentViewSet(ModelViewSet):
 
         booking_fee = video_fee * Decimal((admin_booking_fee / 100))
 
-        order = Order.objects.create(
-            consumer=consumer,
-            contributor=contributor,
-            video_fee=video_fee,
-            booking_fee=booking_fee,
-            turnaround_selected=turnaround,
-            video_for=request.data.get('video_for', ''),
-            introduce_yourself=request.data.get('introduce_yourself', ''),
-            video_to_say=request.data.get('video_to_say', ''),
-            occasion=occasion
-        )
-
-        chat = ChatChannel.objects.create(
-            order=order
-        )
-        chat.users.add(consumer.user, contributor.user)
-        
-        amount_to_charge = order.total
-
-        if order.status != 'Pending':
-            return Response({'detail': 'Order needs to be in Pending status'}, status=status.HTTP_400_BAD_REQUEST)
-
-        try:
-            # Get the Stripe Customer Infomration
-            customers_data = stripe.Customer.list().data
-            customer = None
-            for customer_data in customers_data:
-                if customer_data.email == request.user.email:
-                    customer = customer_data
-                    break
-            if customer is None:
-                customer = stripe.Customer.create(email=request.user.email)
-
-            djstripe_customer = djstripe.models.Customer.sync_from_stripe_data(customer)
-            payment_method = stripe.PaymentMethod.retrieve(payment_method)
-            if payment_method.customer is None:
-                if payment_method.customer != djstripe_customer.id:
-                    payment_method = stripe.PaymentMethod.attach(payment_method, customer=customer)
-                else:
-                    return Response({"detail": "Payment method belongs to another cusomter"}, status=status.HTTP_400_BAD_REQUEST)
-            dj_payment_method = djstripe.models.PaymentMethod.sync_from_stripe_data(payment_method)
-
-        except Exception as e:
-            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
-
-        request.user.consumer.stripe_account = djstripe_customer
-        request.user.consumer.stripe_account.save()
-
-        # Create a PaymentIntent instead of Charge
-        try:
-            consumer_payment_intent = stripe.PaymentIntent.create(
-                customer=request.user.consumer.stripe_account.id,
-                payment_method=payment_method,
-                amount=int(amount_to_charge * 100),
-                currency='usd',
-                description=f'Charge for Order {order.id}',
-                confirm=True,
-                return_url='http://localhost:8080/auth/',
+        with transaction.atomic():
+            order = Order.objects.create(
+                consumer=consumer,
+                contributor=contributor,
+                video_fee=video_fee,
+                booking_fee=booking_fee,
+                turnaround_selected=turnaround,
+                video_for=request.data.get('video_for', ''),
+                introduce_yourself=request.data.get('introduce_yourself', ''),
+                video_to_say=request.data.get('video_to_say', ''),
+                occasion=occasion
             )
 
-        except Exception as e:
-            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
-                
+            chat = ChatChannel.objects.create(
+                order=order
+            )
+            chat.users.add(consumer.user, contributor.user)
+
+            try:
+                with transaction.atomic():
+                    checkout = Checkout.objects.create(
+                        order=order,
+                        consumer=consumer,
+                        payment_method=payment_method,
+                        idempotency_key=idempotency_key or uuid.uuid4().hex
+                    )
+            except IntegrityError:
+                # The same order was placed by a concurrent request
+                transaction.set_rollback(True)
+                checkout = None
+            else:
+                schedule_checkout(checkout)
 
-        Payment.objects.create(
-            order=order,
-            consumer=request.user.consumer,
-            amount=order.total,
-            payment_method=dj_payment_method,
-        )
-        order.status = 'In Progress'
-        order.paid_at = timezone.now()
-        order.save()
+        if checkout is None:
+            checkout = Checkout.objects.get(consumer=consumer, idempotency_key=idempotency_key)
+        return Response(CheckoutSerializer(checkout).data, status=status.HTTP_202_ACCEPTED)
 
-        request.user.consumer.save()
-        
-        return Response("Payment Successful", status=status.HTTP_201_CREATED)
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def checkout_status(self, request):
+        checkout = Checkout.objects.filter(
+            id=request.query_params.get('checkout_id'), consumer__user=request.user
+        ).select_related('order').first()
+        if checkout is None:
+            return Response({'detail': 'Checkout not found'}, status=status.HTTP_404_NOT_FOUND)
+        if checkout.status == 'Requires Action' and checkout.payment_intent:
+            # In case the webhook of the completed action did not arrive
+            try:
+                checkout = update_from_payment_intent(checkout, stripe.PaymentIntent.retrieve(checkout.payment_intent))
+            except stripe.error.StripeError:
+                pass
+        return Response(CheckoutSerializer(checkout).data)
+
+    def wallet_response(self, customer):
+        """
+        The cards of the customer from the local djstripe tables, as the list of Stripe PaymentMethods it replaces
+        """
+        serializer = WalletPaymentMethodSerializer(list_payment_methods(customer), many=True, context={'customer': customer})
+        return Response({'object': 'list', 'data': serializer.data, 'has_more': False, 'url': '/v1/payment_methods'})
 
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def my_cards(self, request):
-        profile = request.user.consumer
-        if profile.stripe_account:
-            customer_id = profile.stripe_account.id
-        else:
-            customers_data = stripe.Customer.list().data
-            customer = None
-            for customer_data in customers_data:
-                if customer_data.email == request.user.email:
-                    customer = customer_data
-                    break
-            if customer is None:
-                customer = stripe.Customer.create(email=request.user.email)
-            djstripe_customer = djstripe.models.Customer.sync_from_stripe_data(customer)
-            profile.stripe_account = djstripe_customer
-            profile.stripe_account.save()
-            customer_id = djstripe_customer.id
-        payment_methods = stripe.PaymentMethod.list(customer=customer_id, type='card')
-        return Response(payment_methods)
+        return self.wallet_response(get_wallet_customer(request.user))
 
     @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
     def set_default(self, request):
         payment_method_id = request.data.get('payment_method', None)
         if payment_method_id is None:
             return Response({'detail': 'Missing Payment Method ID'}, status=status.HTTP_400_BAD_REQUEST)
-        profile = request.user.consumer
-        if profile.stripe_account:
-            customer_id = profile.stripe_account.id
-        else:
-            customer_id = None
-        if not customer_id:
-            customers_data = stripe.Customer.list().data
-            customer = None
-            for customer_data in customers_data:
-                if customer_data.email == request.user.email:
-                    customer = customer_data
-                    break
-            if customer is None:
-                customer = stripe.Customer.create(email=request.user.email)
-            djstripe_customer = djstripe.models.Customer.sync_from_stripe_data(customer)
-            profile.stripe_account = djstripe_customer
-            profile.stripe_account.save()
-            customer_id = djstripe_customer.id
-        last_default_pms = stripe.PaymentMethod.list(customer=customer_id, type='card')
-        for method in last_default_pms:
-            if method.metadata:
-                stripe.PaymentMethod.modify(
-                    method.id,
-                    metadata={"default": "False"}
-                )
-        payment_method = stripe.PaymentMethod.modify(
-            payment_method_id,
-            metadata={"default": "True"})
-        djstripe.models.PaymentMethod.sync_from_stripe_data(payment_method)
-        payment_methods = stripe.PaymentMethod.list(customer=customer_id, type='card')
-        return Response(payment_methods)
+        customer = get_wallet_customer(request.user)
+        payment_method = list_payment_methods(customer).filter(id=payment_method_id).first()
+        if payment_method is None:
+            return Response({'detail': 'Payment method not found'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            set_default_payment_method(customer, payment_method)
+        except stripe.error.StripeError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return self.wallet_response(customer)
 
     @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
     def revoke_payment_method(self, request):
         payment_method_id = request.data.get('payment_method', None)
         if payment_method_id is None:
             return Response({'detail': 'Missing Payment Method ID'}, status=status.HTTP_400_BAD_REQUEST)
-        profile = request.user.consumer
-        if profile.stripe_account:
-            customer_id = profile.stripe_account.id
-        else:
-            customer_id = None
-        if not customer_id:
-            customers_data = stripe.Customer.list().data
-            customer = None
-            for customer_data in customers_data:
-                if customer_data.email == request.user.email:
-                    customer = customer_data
-                    break
-            if customer is None:
-                customer = stripe.Customer.create(email=request.user.email)
-            djstripe_customer = djstripe.models.Customer.sync_from_stripe_data(customer)
-            profile.stripe_account = djstripe_customer
-            profile.stripe_account.save()
-            customer_id = djstripe_customer.id
-        payment_method = stripe.PaymentMethod.detach(payment_method_id)
+        customer = get_wallet_customer(request.user)
+        if not list_payment_methods(customer).filter(id=payment_method_id).exists():
+            return Response({'detail': 'Payment method not found'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            payment_method = stripe.PaymentMethod.detach(payment_method_id)
+        except stripe.error.StripeError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         djstripe.models.PaymentMethod.sync_from_stripe_data(payment_method)
-        payment_methods = stripe.PaymentMethod.list(customer=customer_id, type='card')
-        return Response(payment_methods)
+        if customer.default_payment_method_id == payment_method_id:
+            # Stripe drops the default card of a customer when it is detached
+            customer.default_payment_method = None
+            customer.save(update_fields=['default_payment_method'])
+        return self.wallet_response(customer)
 
     @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
     def add_payment_method(self, request):
-        profile = request.user.consumer
         billing_details = request.data.get('billing_details', None)
 
         if billing_details is None:
@@ -302,29 +249,12 @@ class PaymentViewSet(ModelViewSet):
             if 'state' not in address:
                 return Response("Missing state in address", status=status.HTTP_400_BAD_REQUEST)
 
-        if profile.stripe_account:
-            customer_id = profile.stripe_account.id
-        else:
-            customer_id = None
-        if not customer_id:
-            customers_data = stripe.Customer.list().data
-            customer = None
-            for customer_data in customers_data:
-                if customer_data.email == request.user.email:
-                    customer = customer_data
-                    break
-            if customer is None:
-                customer = stripe.Customer.create(email=request.user.email)
-            djstripe_customer = djstripe.models.Customer.sync_from_stripe_data(customer)
-            profile.stripe_account = djstripe_customer
-            profile.stripe_account.save()
-            profile.save()
-            customer_id = djstripe_customer.id
+        customer = get_wallet_customer(request.user)
         payment_method_id = request.data.get('payment_method', None)
         if payment_method_id is None:
             return Response({'detail': 'Missing Payment Method ID'}, status=status.HTTP_400_BAD_REQUEST)
         try:    
-            payment_method = stripe.PaymentMethod.attach(payment_method_id, customer=customer_id)
+            payment_method = stripe.PaymentMethod.attach(payment_method_id, customer=customer.id)
             payment_method = stripe.PaymentMethod.modify(
                 payment_method['id'],
                 billing_details={
@@ -339,17 +269,11 @@ class PaymentViewSet(ModelViewSet):
                 }
             )
 
-            stripe.Customer.modify(
-                customer_id,
-                invoice_settings={
-                    'default_payment_method': payment_method['id'],
-                },
-            )
-            djstripe.models.PaymentMethod.sync_from_stripe_data(payment_method)
-            payment_methods = stripe.PaymentMethod.list(customer=customer_id, type='card')
+            dj_payment_method = djstripe.models.PaymentMethod.sync_from_stripe_data(payment_method)
+            set_default_payment_method(customer, dj_payment_method)
         except Exception as e:
             return Response({f"Stripe Error: {e}"}, status=status.HTTP_400_BAD_REQUEST)
-        return Response(payment_methods)
+        return self.wallet_response(customer)
 
     # Check Business Account
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
@@ -0,0 +1,18 @@
+from djstripe import webhooks
+
+from .checkout import update_from_payment_intent
+from .models import Checkout
+
+
+@webhooks.handler("payment_intent.succeeded", "payment_intent.payment_failed", "payment_intent.canceled")
+def payment_intent_handler(event):
+    """
+    Completes the checkouts left waiting on an action of the client, such as 3D Secure
+    """
+    intent = event.data.get("object", {})
+    checkout = Checkout.objects.select_related('order').filter(payment_intent=intent.get("id")).first()
+    if checkout is None:
+        checkout_id = (intent.get("metadata") or {}).get("checkout_id")
+        checkout = Checkout.objects.select_related('order').filter(id=checkout_id).first() if checkout_id else None
+    if checkout is not None:
+        update_from_payment_intent(checkout, intent)
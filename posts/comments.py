@@ -0,0 +1,119 @@
+from django.db.models import Count, OuterRef, Subquery
+
+from .models import Comment, CommentLike
+
+
+# Number of replies embedded under each comment of a thread page
+REPLY_PREVIEW_SIZE = 3
+# Number of top-level comments embedded in each Post of a list
+COMMENT_PREVIEW_SIZE = 3
+
+
+def load_comment_tree(post_ids, user=None):
+    """
+    Loads every Comment of the given Posts along with their like counts and the
+    likes of the given user in three queries, then links the replies to their
+    parents in memory using parent_comment_id.
+
+    Returns a dict of Comment id to Comment, with `reply_list`, `likes_total`
+    and `liked_by_user` set on every Comment.
+    """
+    comments = list(
+        Comment.objects.filter(post_id__in=post_ids).select_related('user').order_by('id')
+    )
+    likes_totals = dict(
+        CommentLike.objects.filter(comment__post_id__in=post_ids)
+        .values('comment_id').annotate(count=Count('id')).values_list('comment_id', 'count')
+    )
+    if user and user.is_authenticated:
+        liked_ids = set(
+            CommentLike.objects.filter(comment__post_id__in=post_ids, user=user).values_list('comment_id', flat=True)
+        )
+    else:
+        liked_ids = set()
+
+    nodes = {}
+    for comment in comments:
+        comment.reply_list = []
+        comment.likes_total = likes_totals.get(comment.id, 0)
+        comment.liked_by_user = comment.id in liked_ids
+        nodes[comment.id] = comment
+
+    for comment in comments:
+        parent = nodes.get(comment.parent_comment_id)
+        if parent is not None:
+            parent.reply_list.append(comment)
+    return nodes
+
+
+def load_comment_threads(comments, user=None, reply_preview_size=REPLY_PREVIEW_SIZE):
+    """
+    Prepares a page of Comments for CommentThreadSerializer: sets the number
+    of direct replies and the first `reply_preview_size` replies of every
+    Comment, plus the like counts and the likes of the given user, using a
+    fixed number of queries whatever the size of the threads.
+
+    The previewed replies are not expanded further, clients load them through
+    the replies endpoint of the Comment when their reply_count is not zero.
+    """
+    comments = list(comments)
+    parent_ids = [comment.id for comment in comments]
+
+    preview_ids = Comment.objects.filter(
+        parent_comment_id=OuterRef('parent_comment_id')
+    ).order_by('id').values('id')[:reply_preview_size]
+    previews = list(
+        Comment.objects.filter(parent_comment_id__in=parent_ids, id__in=Subquery(preview_ids))
+        .select_related('user').order_by('id')
+    ) if parent_ids and reply_preview_size > 0 else []
+
+    loaded = comments + previews
+    loaded_ids = [comment.id for comment in loaded]
+    reply_counts = dict(
+        Comment.objects.filter(parent_comment_id__in=loaded_ids)
+        .values('parent_comment_id').annotate(count=Count('id')).values_list('parent_comment_id', 'count')
+    )
+    likes_totals = dict(
+        CommentLike.objects.filter(comment_id__in=loaded_ids)
+        .values('comment_id').annotate(count=Count('id')).values_list('comment_id', 'count')
+    )
+    if user and user.is_authenticated:
+        liked_ids = set(
+            CommentLike.objects.filter(comment_id__in=loaded_ids, user=user).values_list('comment_id', flat=True)
+        )
+    else:
+        liked_ids = set()
+
+    for comment in loaded:
+        comment.reply_preview = []
+        comment.reply_count = reply_counts.get(comment.id, 0)
+        comment.likes_total = likes_totals.get(comment.id, 0)
+        comment.liked_by_user = comment.id in liked_ids
+
+    parents = {comment.id: comment for comment in comments}
+    for reply in previews:
+        parents[reply.parent_comment_id].reply_preview.append(reply)
+    return comments
+
+
+def load_comment_previews(post_ids, user=None, comment_preview_size=COMMENT_PREVIEW_SIZE):
+    """
+    Loads the first `comment_preview_size` top-level Comments of every given
+    Post, prepared for CommentThreadSerializer by load_comment_threads, so a
+    Post embeds a bounded preview of its comments whatever their number.
+    Clients load the rest through the threads endpoint.
+
+    Returns a dict of Post id to its previewed Comments.
+    """
+    post_ids = list(post_ids)
+    preview_ids = Comment.objects.filter(
+        post_id=OuterRef('post_id'), parent_comment__isnull=True
+    ).order_by('id').values('id')[:comment_preview_size]
+    comments = Comment.objects.filter(
+        post_id__in=post_ids, parent_comment__isnull=True, id__in=Subquery(preview_ids)
+    ).select_related('user').order_by('id') if post_ids and comment_preview_size > 0 else []
+
+    previews = {}
+    for comment in load_comment_threads(comments, user):
+        previews.setdefault(comment.post_id, []).append(comment)
+    return previews
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts.ranking import rebuild_post_rankings
+
+
+class Command(BaseCommand):
+    help = "Recompute the precomputed ranking of every post used by the ranked feed"
+
+    def handle(self, *args, **kwargs) -> None:
+        count = rebuild_post_rankings()
+        self.stdout.write(self.style.SUCCESS(f"Successfully rebuilt the ranking of {count} posts."))
@@ -0,0 +1,72 @@
+# Generated by Django 2.2.28 on 2026-10-18 09:41
+
+from django.db import migrations, models
+from django.db.models import Avg, Count
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+# The weights of posts.ranking when this migration was written, copied so the
+# migration keeps its behaviour whatever ranking.py becomes
+ANONYMOUS_WEIGHTS = (0.3, 0.3, 0.4)
+AUTHENTICATED_WEIGHTS = (0.2, 0.2, 0.25)
+
+
+def compute_scores(likes_count, follower_count, avg_rating):
+    def weighted(weights):
+        likes_weight, followers_weight, rating_weight = weights
+        return likes_count * likes_weight + follower_count * followers_weight + avg_rating * rating_weight
+    return {'score': weighted(ANONYMOUS_WEIGHTS), 'base_score': weighted(AUTHENTICATED_WEIGHTS)}
+
+
+def populate_post_rankings(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    PostRanking = apps.get_model('posts', 'PostRanking')
+    posts = Post.objects.annotate(
+        ranking_likes_count=Count('likes', distinct=True),
+        ranking_follower_count=Count('contributor__user__followers', distinct=True),
+        ranking_avg_rating=Coalesce(Avg('contributor__reviews__rating'), 0.0),
+    ).values_list('id', 'ranking_likes_count', 'ranking_follower_count', 'ranking_avg_rating')
+    PostRanking.objects.bulk_create([
+        PostRanking(
+            post_id=post_id,
+            likes_count=likes_count,
+            follower_count=follower_count,
+            avg_rating=float(avg_rating),
+            **compute_scores(likes_count, follower_count, float(avg_rating))
+        )
+        for post_id, likes_count, follower_count, avg_rating in posts.iterator()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0004_commentlike'),
+        ('orders', '0004_order_video_processing'),
+        ('users', '0012_user_is_email_verified'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostRanking',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ranking', serialize=False, to='posts.Post')),
+                ('likes_count', models.PositiveIntegerField(default=0)),
+                ('follower_count', models.PositiveIntegerField(default=0)),
+                ('avg_rating', models.FloatField(default=0)),
+                ('score', models.FloatField(default=0, help_text='Ranking score used for anonymous users')),
+                ('base_score', models.FloatField(default=0, help_text='Ranking score used for authenticated users, before the follow boost')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='postranking',
+            index=models.Index(fields=['-score', '-post'], name='posts_rank_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='postranking',
+            index=models.Index(fields=['-base_score', '-post'], name='posts_rank_base_score_idx'),
+        ),
+        migrations.RunPython(populate_post_rankings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.28 on 2026-10-18 10:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0005_postranking'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='postfile',
+            name='preview_clip',
+            field=models.FileField(blank=True, help_text='Generated from the file when it is a video, see home.media', null=True, upload_to='post_files'),
+        ),
+        migrations.AddField(
+            model_name='postfile',
+            name='preview_image',
+            field=models.FileField(blank=True, help_text='Generated from the file, see home.media', null=True, upload_to='post_files'),
+        ),
+    ]
@@ -45,6 +45,18 @@ class PostFile(models.Model):
         blank=True,
         null=True
     )
+    preview_image = models.FileField(
+        upload_to='post_files',
+        blank=True,
+        null=True,
+        help_text="Generated from the file, see home.media"
+    )
+    preview_clip = models.FileField(
+        upload_to='post_files',
+        blank=True,
+        null=True,
+        help_text="Generated from the file when it is a video, see home.media"
+    )
     created_at = models.DateTimeField(
         auto_now_add=True
     )
@@ -110,3 +122,46 @@ class CommentLike(models.Model):
 
     def __str__(self):
         return f"{self.user} likes {self.comment}"
+
+
+class PostRanking(models.Model):
+    """
+    A model to store the precomputed ranking signals of a Post, kept in sync
+    by the signals in posts.signals so the ranked feed does not need to
+    aggregate likes, followers and reviews on every request
+    """
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='ranking'
+    )
+    likes_count = models.PositiveIntegerField(
+        default=0
+    )
+    follower_count = models.PositiveIntegerField(
+        default=0
+    )
+    avg_rating = models.FloatField(
+        default=0
+    )
+    score = models.FloatField(
+        default=0,
+        help_text="Ranking score used for anonymous users"
+    )
+    base_score = models.FloatField(
+        default=0,
+        help_text="Ranking score used for authenticated users, before the follow boost"
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-score', '-post'], name='posts_rank_score_idx'),
+            models.Index(fields=['-base_score', '-post'], name='posts_rank_base_score_idx'),
+        ]
+
+    def __str__(self):
+        return f"Ranking of {self.post}"
@@ -1,5 +1,14 @@
-from rest_framework.pagination import PageNumberPagination
+import uuid
+from base64 import b64decode, b64encode
+from urllib import parse
+
+from django.core.cache import cache
+from django.db.models import Q
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, CursorPagination, PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 class ListPagination(PageNumberPagination):
     def paginate_queryset(self, queryset, request, view=None):
@@ -22,3 +31,115 @@ class ListPagination(PageNumberPagination):
             'count': self.count,
             'results': data,
         })
+
+
+class RankedFeedSnapshotPagination(BasePagination):
+    """
+    Pages through a frozen snapshot of the ranked post IDs. The first request
+    ranks the feed once and stores up to `snapshot_size` IDs in the cache,
+    following pages only slice that list, so scores changing mid-scroll do not
+    make posts skip or repeat and deep pages cost the same as the first one.
+    Once a full snapshot runs out, the next one is ranked from the posts after
+    its last (score, id) key, so the feed scrolls without an end.
+    """
+    page_size = 10
+    snapshot_size = 1000
+    snapshot_ttl = 60 * 30
+    # The annotation the queryset is ordered by, descending, before the id
+    score_field = 'ranking_score'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        snapshot_id, offset, after = self.decode_cursor(request)
+
+        snapshot = cache.get(self.get_cache_key(snapshot_id)) if snapshot_id and after is None else None
+        if snapshot is None:
+            # No cursor yet, the snapshot expired or the previous one ran out, rank the feed again
+            previous = snapshot_id if after is not None else None
+            snapshot_id, snapshot = self.create_snapshot(queryset, after, previous)
+
+        self.snapshot_id = snapshot_id
+        self.snapshot = snapshot
+        self.offset = offset
+        post_ids = snapshot['ids']
+        self.has_next = offset + self.page_size < len(post_ids) or snapshot['last'] is not None
+
+        page_ids = post_ids[offset:offset + self.page_size]
+        posts = queryset.in_bulk(page_ids)
+        return [posts[post_id] for post_id in page_ids if post_id in posts]
+
+    def create_snapshot(self, queryset, after=None, previous=None):
+        if after is not None:
+            score, pk = after
+            queryset = queryset.filter(
+                Q(**{f'{self.score_field}__lt': score}) | Q(**{self.score_field: score, 'pk__lt': pk})
+            )
+        entries = list(queryset.values_list('pk', self.score_field)[:self.snapshot_size])
+        snapshot = {
+            'ids': [pk for pk, _ in entries],
+            # Where the next snapshot starts, when there may be more posts
+            'last': entries[-1] if len(entries) == self.snapshot_size else None,
+            'previous': previous,
+        }
+        snapshot_id = uuid.uuid4().hex
+        cache.set(self.get_cache_key(snapshot_id), snapshot, self.snapshot_ttl)
+        return snapshot_id, snapshot
+
+    def get_cache_key(self, snapshot_id):
+        return f'ranked_feed:{snapshot_id}'
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, 0, None
+
+        try:
+            querystring = b64decode(encoded.encode('ascii')).decode('ascii')
+            tokens = parse.parse_qs(querystring, keep_blank_values=True)
+            snapshot_id = tokens['s'][0]
+            offset = int(tokens.get('o', ['0'])[0])
+            after = (float(tokens['k'][0]), int(tokens['i'][0])) if 'k' in tokens else None
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if offset < 0 or offset >= self.snapshot_size:
+            raise NotFound(self.invalid_cursor_message)
+        return snapshot_id, offset, after
+
+    def encode_cursor(self, **params):
+        querystring = parse.urlencode({key: str(value) for key, value in params.items()})
+        encoded = b64encode(querystring.encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if self.offset + self.page_size < len(self.snapshot['ids']):
+            return self.encode_cursor(s=self.snapshot_id, o=self.offset + self.page_size)
+        pk, score = self.snapshot['last']
+        return self.encode_cursor(s=self.snapshot_id, k=repr(score), i=pk)
+
+    def get_previous_link(self):
+        if self.offset > 0:
+            return self.encode_cursor(s=self.snapshot_id, o=max(self.offset - self.page_size, 0))
+        if self.snapshot['previous']:
+            # The last page of the snapshot this one continues
+            return self.encode_cursor(
+                s=self.snapshot['previous'], o=(self.snapshot_size - 1) // self.page_size * self.page_size
+            )
+        return None
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+class CommentThreadCursorPagination(CursorPagination):
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+    ordering = 'id'
@@ -0,0 +1,137 @@
+from django.db import transaction
+from django.db.models import Avg, Count, ExpressionWrapper, F, FloatField, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from orders.models import Review
+from users.models import Follow
+
+from .models import Post, PostRanking, Like
+
+
+# Weights used for authenticated users, the follow boost is applied per request
+FOLLOWED_WEIGHT = 1.35
+LIKES_WEIGHT = 0.2
+FOLLOWERS_WEIGHT = 0.2
+RATING_WEIGHT = 0.25
+
+# Weights used for unauthenticated users
+ANONYMOUS_LIKES_WEIGHT = 0.3
+ANONYMOUS_FOLLOWERS_WEIGHT = 0.3
+ANONYMOUS_RATING_WEIGHT = 0.4
+
+
+def _weighted(likes_count, follower_count, avg_rating, weights):
+    """
+    Combines the ranking signals, which may be plain values or F() expressions
+    """
+    likes_weight, followers_weight, rating_weight = weights
+    if not any(hasattr(value, 'resolve_expression') for value in (likes_count, follower_count, avg_rating)):
+        return likes_count * likes_weight + follower_count * followers_weight + avg_rating * rating_weight
+    return ExpressionWrapper(
+        likes_count * Value(likes_weight) +
+        follower_count * Value(followers_weight) +
+        avg_rating * Value(rating_weight),
+        output_field=FloatField()
+    )
+
+
+def compute_scores(likes_count, follower_count, avg_rating):
+    """
+    Returns the score and base_score values of a PostRanking for the given signals
+    """
+    return {
+        'score': _weighted(
+            likes_count, follower_count, avg_rating,
+            (ANONYMOUS_LIKES_WEIGHT, ANONYMOUS_FOLLOWERS_WEIGHT, ANONYMOUS_RATING_WEIGHT)
+        ),
+        'base_score': _weighted(
+            likes_count, follower_count, avg_rating,
+            (LIKES_WEIGHT, FOLLOWERS_WEIGHT, RATING_WEIGHT)
+        ),
+    }
+
+
+def _update_rankings(rankings, **values):
+    """
+    Updates the given signals on a PostRanking queryset and recomputes the
+    scores in the same statement, keeping the untouched signals as they are
+    """
+    likes_count = values.get('likes_count', F('likes_count'))
+    follower_count = values.get('follower_count', F('follower_count'))
+    avg_rating = values.get('avg_rating', F('avg_rating'))
+    values.update(compute_scores(likes_count, follower_count, avg_rating))
+    return rankings.update(updated_at=timezone.now(), **values)
+
+
+def _contributor_follower_count(contributor):
+    return Follow.objects.filter(followed_id=contributor.user_id).count()
+
+
+def _contributor_avg_rating(contributor_id):
+    avg_rating = Review.objects.filter(contributor_id=contributor_id).aggregate(Avg('rating'))['rating__avg']
+    return float(avg_rating or 0)
+
+
+def create_post_ranking(post):
+    """
+    Creates the ranking row of a newly created Post
+    """
+    follower_count = _contributor_follower_count(post.contributor)
+    avg_rating = _contributor_avg_rating(post.contributor_id)
+    ranking, created = PostRanking.objects.get_or_create(
+        post=post,
+        defaults=dict(
+            follower_count=follower_count,
+            avg_rating=avg_rating,
+            **compute_scores(0, follower_count, avg_rating)
+        )
+    )
+    return ranking
+
+
+def refresh_post_likes(post_id):
+    likes_count = Like.objects.filter(post_id=post_id).count()
+    return _update_rankings(PostRanking.objects.filter(post_id=post_id), likes_count=likes_count)
+
+
+def refresh_user_followers(user_id):
+    """
+    Refreshes the follower count on every Post of the followed user, if they are a Contributor
+    """
+    follower_count = Follow.objects.filter(followed_id=user_id).count()
+    rankings = PostRanking.objects.filter(post__contributor__user_id=user_id)
+    return _update_rankings(rankings, follower_count=follower_count)
+
+
+def refresh_contributor_rating(contributor_id):
+    avg_rating = _contributor_avg_rating(contributor_id)
+    rankings = PostRanking.objects.filter(post__contributor_id=contributor_id)
+    return _update_rankings(rankings, avg_rating=avg_rating)
+
+
+def rebuild_post_rankings(batch_size=500):
+    """
+    Recomputes the ranking rows of every Post from scratch
+    """
+    posts = Post.objects.annotate(
+        ranking_likes_count=Count('likes', distinct=True),
+        ranking_follower_count=Count('contributor__user__followers', distinct=True),
+        ranking_avg_rating=Coalesce(Avg('contributor__reviews__rating'), 0.0),
+    ).values_list('id', 'ranking_likes_count', 'ranking_follower_count', 'ranking_avg_rating')
+
+    rankings = []
+    for post_id, likes_count, follower_count, avg_rating in posts.iterator():
+        avg_rating = float(avg_rating)
+        rankings.append(PostRanking(
+            post_id=post_id,
+            likes_count=likes_count,
+            follower_count=follower_count,
+            avg_rating=avg_rating,
+            **compute_scores(likes_count, follower_count, avg_rating)
+        ))
+
+    with transaction.atomic():
+        PostRanking.objects.all().delete()
+        PostRanking.objects.bulk_create(rankings, batch_size=batch_size)
+    return len(rankings)
@@ -1,14 +1,72 @@
+from django.db import models, transaction
+from django.db.models import Count, Exists, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
 from rest_framework import serializers
 from .models import Post, PostFile, Like, Comment
-from home.api.v1.serializers import UserSerializer as MiniUserSerializer
+from .comments import load_comment_tree, load_comment_threads, load_comment_previews
+from home.api.v1.serializers import DirectUploadFileMixin, UserSerializer as MiniUserSerializer, attach_validated_upload
 
 from users.serializers import UserSerializer
+from users.utils import get_user_serializer_context
+
+
+def _post_count_subquery(queryset):
+    counts = queryset.filter(post=OuterRef('pk')).order_by().values('post').annotate(count=Count('pk')).values('count')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def prefetch_post_list(queryset, request=None):
+    """
+    Annotates and prefetches everything PostSerializer needs to serialize a
+    list of Posts, so a page costs a constant number of queries
+    """
+    queryset = queryset.annotate(
+        likes_total=_post_count_subquery(Like.objects.all()),
+        comments_total=_post_count_subquery(Comment.objects.all()),
+    ).select_related(
+        'contributor__user__consumer',
+        'contributor__category',
+    ).prefetch_related(
+        'post_files',
+        'contributor__photos_videos',
+        'contributor__tags',
+    )
+
+    user = getattr(request, 'user', None)
+    if user and user.is_authenticated:
+        queryset = queryset.annotate(
+            liked_by_user=Exists(Like.objects.filter(post=OuterRef('pk'), user=user))
+        )
+    return queryset
+
+
+class PostFileSerializer(DirectUploadFileMixin, serializers.ModelSerializer):
+    upload_purpose = 'post_file'
 
-
-class PostFileSerializer(serializers.ModelSerializer):
     class Meta:
         model = PostFile
-        fields = ['id', 'file', 'media_type', 'thumbnail', 'created_at']
+        fields = ['id', 'file', 'media_type', 'thumbnail', 'preview_image', 'preview_clip', 'created_at']
+        read_only_fields = ['preview_image', 'preview_clip']
+
+
+def _request_user(context):
+    request = context.get('request', None)
+    return request.user if request else None
+
+
+class CommentListSerializer(serializers.ListSerializer):
+    """
+    Serializes a list of Comments, loading the comment trees of their Posts in
+    one go instead of querying the replies and likes of every Comment
+    """
+
+    def to_representation(self, data):
+        comments = list(data.all() if isinstance(data, models.Manager) else data)
+        if any(not hasattr(comment, 'reply_list') for comment in comments):
+            nodes = load_comment_tree({comment.post_id for comment in comments}, _request_user(self.context))
+            comments = [nodes.get(comment.id, comment) for comment in comments]
+        return super().to_representation(comments)
 
 
 class CommentSerializer(serializers.ModelSerializer):
@@ -18,6 +76,7 @@ class CommentSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Comment
+        list_serializer_class = CommentListSerializer
         fields = ('id', 'post', 'user', 'text', 'created_at', 'parent_comment', 'replies', 'likes_count', 'is_liked_by_user')
         extra_kwargs = {
             "user": {
@@ -30,21 +89,26 @@ class CommentSerializer(serializers.ModelSerializer):
         Returns serialized replies for a given comment.
         """
         context = self.context if 'request' in self.context else {}
+        if hasattr(obj, 'reply_list'):
+            return CommentSerializer(obj.reply_list, many=True, context=context).data  # Loaded by load_comment_tree
         if obj.replies.exists():
             return CommentSerializer(obj.replies, many=True, context=context).data
         return []
 
     def get_likes_count(self, obj):
+        if hasattr(obj, 'likes_total'):
+            return obj.likes_total
         return obj.likes.count()  # Count the likes for this comment
 
     def get_is_liked_by_user(self, obj):
         """
         Check if the current user has liked this comment.
         """
-        request = self.context.get('request', None)  # Safely get the request
-        user = request.user if request else None  # Get the user from request
+        user = _request_user(self.context)  # Get the user from request
         if not user or not user.is_authenticated:
             return False
+        if hasattr(obj, 'liked_by_user'):
+            return obj.liked_by_user
         return obj.likes.filter(user=user).exists()
 
     def to_representation(self, instance):
@@ -54,15 +118,66 @@ class CommentSerializer(serializers.ModelSerializer):
         return rep
 
 
+class CommentThreadListSerializer(serializers.ListSerializer):
+    """
+    Serializes a page of a comment thread, loading reply counts, reply
+    previews and likes of the whole page at once
+    """
+
+    def to_representation(self, data):
+        comments = list(data.all() if isinstance(data, models.Manager) else data)
+        if any(not hasattr(comment, 'reply_preview') for comment in comments):
+            comments = load_comment_threads(comments, _request_user(self.context))
+        return super().to_representation(comments)
+
+
+class CommentThreadSerializer(CommentSerializer):
+    """
+    A lighter CommentSerializer for paginated threads, which only embeds the
+    first few direct replies of a comment along with its total reply count
+    """
+    reply_count = serializers.SerializerMethodField()
+
+    class Meta(CommentSerializer.Meta):
+        list_serializer_class = CommentThreadListSerializer
+        fields = CommentSerializer.Meta.fields + ('reply_count',)
+
+    def get_replies(self, obj):
+        """
+        Returns the previewed replies of a comment, see load_comment_threads.
+        """
+        return CommentThreadSerializer(obj.reply_preview, many=True, context=self.context).data
+
+    def get_reply_count(self, obj):
+        return obj.reply_count
+
+
+class PostListSerializer(serializers.ListSerializer):
+    """
+    Serializes a page of Posts, precomputing the data of their contributors' users
+    """
+
+    def to_representation(self, data):
+        posts = list(data.all() if isinstance(data, models.Manager) else data)
+        users = [post.contributor.user for post in posts]
+        self.context.update(get_user_serializer_context(users, self.context.get('request')))
+
+        comment_previews = load_comment_previews([post.id for post in posts], _request_user(self.context))
+        for post in posts:
+            post.top_level_comment_list = comment_previews.get(post.id, [])
+        return super().to_representation(posts)
+
+
 class PostSerializer(serializers.ModelSerializer):
     post_files = PostFileSerializer(many=True, required=False)
     likes_count = serializers.SerializerMethodField()
     is_liked_by_user = serializers.SerializerMethodField()
-    top_level_comments = serializers.SerializerMethodField()  # Top-level comments only
+    top_level_comments = serializers.SerializerMethodField()  # The first top-level comments only
     comments_count = serializers.SerializerMethodField()  # Total comment count
 
     class Meta:
         model = Post
+        list_serializer_class = PostListSerializer
         fields = ('id', 'contributor', 'title', 'description', 'created_at', 'post_files', 'likes_count', 
                   'is_liked_by_user', 'top_level_comments', 'comments_count')
         extra_kwargs = {
@@ -71,6 +186,7 @@ class PostSerializer(serializers.ModelSerializer):
             }
         }
 
+    @transaction.atomic
     def create(self, validated_data):
         post_files_data = validated_data.pop('post_files', None)
 
@@ -78,9 +194,11 @@ class PostSerializer(serializers.ModelSerializer):
 
         if post_files_data is not None:
             for post_file_data in post_files_data:
+                attach_validated_upload(post_file_data)  # In the same transaction as the PostFile
                 PostFile.objects.create(post=post, **post_file_data)
         return post
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         post_files_data = validated_data.pop('post_files', None)
         
@@ -89,21 +207,32 @@ class PostSerializer(serializers.ModelSerializer):
 
             instance.post_files.all().delete()  # Clear existing files
             for post_file_data in post_files_data:
+                attach_validated_upload(post_file_data)  # In the same transaction as the PostFile
                 PostFile.objects.create(post=instance, **post_file_data)
         return instance
 
     def get_top_level_comments(self, obj):
         """
-        Fetch only the top-level comments (those without a parent).
+        The first top-level comments with their reply counts and first replies,
+        see load_comment_previews. The others are loaded through the threads endpoint.
         """
-        top_level_comments = Comment.objects.filter(post=obj, parent_comment__isnull=True)  # Only top-level comments
-        return CommentSerializer(top_level_comments, many=True, context={'request': self.context.get('request')}).data
+        if hasattr(obj, 'top_level_comment_list'):
+            top_level_comments = obj.top_level_comment_list  # Loaded for the whole page by PostListSerializer
+        else:
+            top_level_comments = load_comment_previews([obj.id], _request_user(self.context)).get(obj.id, [])
+        return CommentThreadSerializer(
+            top_level_comments, many=True, context={'request': self.context.get('request')}
+        ).data
 
     def get_comments_count(self, obj):
+        if hasattr(obj, 'comments_total'):
+            return obj.comments_total
         return obj.comments.count()  # Total count of comments
 
     def get_likes_count(self, obj):
         """Returns the count of likes for the post."""
+        if hasattr(obj, 'likes_total'):
+            return obj.likes_total
         return Like.objects.filter(post=obj).count()
 
     def get_is_liked_by_user(self, obj):
@@ -112,12 +241,13 @@ class PostSerializer(serializers.ModelSerializer):
         user = request.user if request else None  # Get the user from request
 
         if user and user.is_authenticated:  # Check if user is valid and authenticated
+            if hasattr(obj, 'liked_by_user'):
+                return obj.liked_by_user
             return Like.objects.filter(post=obj, user=user).exists()  # Determine if the post is liked by the user
         return False
 
     def to_representation(self, instance):
-        context = self.context if 'request' in self.context else {}  # Safe access to context
         rep = super().to_representation(instance)
         user = instance.contributor.user
-        rep['user'] = UserSerializer(user, context=context).data  # Ensure context is passed
+        rep['user'] = UserSerializer(user, context=self.context).data  # Ensure context is passed
         return rep
@@ -0,0 +1,45 @@
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from home.media import remember_source_file
+from home.tasks import schedule_media_derivatives
+from orders.models import Review
+from users.models import Follow
+
+from .models import Post, PostFile, Like
+from .ranking import create_post_ranking, refresh_post_likes, refresh_user_followers, refresh_contributor_rating
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, **kwargs):
+    if created:
+        create_post_ranking(instance)
+
+
+@receiver(post_save, sender=Like)
+@receiver(post_delete, sender=Like)
+def like_changed(sender, instance, **kwargs):
+    refresh_post_likes(instance.post_id)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follow_changed(sender, instance, **kwargs):
+    refresh_user_followers(instance.followed_id)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def review_changed(sender, instance, **kwargs):
+    if instance.contributor_id:
+        refresh_contributor_rating(instance.contributor_id)
+
+
+@receiver(post_init, sender=PostFile)
+def post_file_loaded(sender, instance, **kwargs):
+    remember_source_file(instance)
+
+
+@receiver(post_save, sender=PostFile)
+def post_file_saved(sender, instance, created, **kwargs):
+    schedule_media_derivatives(instance, created)
@@ -1,3 +1,125 @@
 from django.test import TestCase
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from consumers.models import Consumer
+from contributors.models import Contributor
+from orders.models import Review
+from users.models import Follow, User
+
+from .models import Like, Post, PostRanking
+from .ranking import compute_scores, rebuild_post_rankings
+
+
+class PostRankingTests(TestCase):
+    """
+    The PostRanking rows kept in sync by posts.signals
+    """
+
+    def setUp(self):
+        self.contributor = Contributor.objects.create(
+            user=User.objects.create(email='contributor@example.com', username='contributor')
+        )
+        self.users = [
+            User.objects.create(email=f'user{index}@example.com', username=f'user{index}') for index in range(3)
+        ]
+        self.post = Post.objects.create(contributor=self.contributor, title='First')
+
+    def ranking(self, post=None):
+        return PostRanking.objects.get(post=post or self.post)
+
+    def assertSignals(self, ranking, likes_count, follower_count, avg_rating):
+        self.assertEqual(
+            (ranking.likes_count, ranking.follower_count, ranking.avg_rating),
+            (likes_count, follower_count, avg_rating)
+        )
+        scores = compute_scores(likes_count, follower_count, avg_rating)
+        self.assertAlmostEqual(ranking.score, scores['score'])
+        self.assertAlmostEqual(ranking.base_score, scores['base_score'])
+
+    def test_ranking_is_created_with_the_post(self):
+        self.assertSignals(self.ranking(), 0, 0, 0)
+
+        Follow.objects.create(follower=self.users[0], followed=self.contributor.user)
+        Review.objects.create(contributor=self.contributor, rating=4)
+        post = Post.objects.create(contributor=self.contributor, title='Second')
+
+        self.assertSignals(self.ranking(post), 0, 1, 4)
+
+    def test_likes_are_counted(self):
+        likes = [Like.objects.create(user=user, post=self.post) for user in self.users]
+        self.assertSignals(self.ranking(), 3, 0, 0)
+
+        likes[0].delete()
+        self.assertSignals(self.ranking(), 2, 0, 0)
+
+    def test_followers_are_counted_on_every_post(self):
+        post = Post.objects.create(contributor=self.contributor, title='Second')
+        follows = [Follow.objects.create(follower=user, followed=self.contributor.user) for user in self.users[:2]]
+
+        self.assertSignals(self.ranking(), 0, 2, 0)
+        self.assertSignals(self.ranking(post), 0, 2, 0)
+
+        follows[0].delete()
+        self.assertSignals(self.ranking(post), 0, 1, 0)
+
+    def test_reviews_are_averaged(self):
+        consumer = Consumer.objects.create(user=self.users[0])
+        Review.objects.create(consumer=consumer, contributor=self.contributor, rating=5)
+        review = Review.objects.create(consumer=consumer, contributor=self.contributor, rating=2)
+        self.assertSignals(self.ranking(), 0, 0, 3.5)
+
+        review.delete()
+        self.assertSignals(self.ranking(), 0, 0, 5)
+
+    def test_signals_keep_each_other(self):
+        Like.objects.create(user=self.users[0], post=self.post)
+        Follow.objects.create(follower=self.users[1], followed=self.contributor.user)
+        Review.objects.create(contributor=self.contributor, rating=3)
+
+        self.assertSignals(self.ranking(), 1, 1, 3)
+
+    def test_rebuild_matches_the_signals(self):
+        Like.objects.create(user=self.users[0], post=self.post)
+        Follow.objects.create(follower=self.users[1], followed=self.contributor.user)
+        Review.objects.create(contributor=self.contributor, rating=3)
+        PostRanking.objects.all().delete()
+
+        self.assertEqual(rebuild_post_rankings(), 1)
+        self.assertSignals(self.ranking(), 1, 1, 3)
+
+
+class RankedPostsTests(TestCase):
+    """
+    The ranked feed of PostViewSet, ordered by the PostRanking scores
+    """
+
+    url = '/api/v1/posts/ranked_posts/'
+
+    def setUp(self):
+        contributors = [
+            Contributor.objects.create(user=User.objects.create(email=f'contributor{index}@example.com', username=f'contributor{index}'))
+            for index in range(2)
+        ]
+        self.user = User.objects.create(email='user@example.com', username='user')
+        other_user = User.objects.create(email='other@example.com', username='other')
+        self.liked = Post.objects.create(contributor=contributors[0], title='Liked')
+        self.followed = Post.objects.create(contributor=contributors[1], title='Followed')
+        self.unranked = Post.objects.create(contributor=contributors[1], title='Unranked')
+        Like.objects.create(user=self.user, post=self.liked)
+        Like.objects.create(user=other_user, post=self.liked)
+        Follow.objects.create(follower=self.user, followed=contributors[1].user)
+        PostRanking.objects.filter(post=self.unranked).delete()
+
+    def ranked_ids(self, user=None):
+        client = APIClient()
+        if user:
+            client.force_authenticate(user)
+        response = client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return [post['id'] for post in response.json()['results']]
+
+    def test_posts_are_ordered_by_score(self):
+        self.assertEqual(self.ranked_ids(), [self.liked.id, self.followed.id, self.unranked.id])
+
+    def test_followed_contributors_are_boosted(self):
+        self.assertEqual(self.ranked_ids(self.user), [self.followed.id, self.unranked.id, self.liked.id])
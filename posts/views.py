@@ -3,27 +3,26 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 
 import math
-from django.db.models import Count, Avg, F, Value, IntegerField, FloatField, ExpressionWrapper, Case, When, Q
-
+from django.db.models import F, Value, IntegerField, FloatField, ExpressionWrapper, Case, When
 from django.db.models.functions import Coalesce
 
-from users.models import User
 from users.serializers import UserSerializer
-from categories.models import Category
 from categories.serializers import CategorySerializer
-from contributors.models import Contributor, Tag
 
 from .models import Post, Like, Comment, CommentLike
-from .serializers import PostSerializer, CommentSerializer
+from .serializers import PostSerializer, CommentSerializer, CommentThreadSerializer, prefetch_post_list
+from .ranking import FOLLOWED_WEIGHT
+from .pagination import RankedFeedSnapshotPagination, CommentThreadCursorPagination
 
 from django_filters.rest_framework import DjangoFilterBackend
 
-from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.exceptions import ValidationError
 from home.permissions import IsGetOrIsAuthenticated
 
 from users.models import Follow
-from customadmin.utils import contains_banned_words
+from customadmin.utils import contains_banned_words, fields_with_banned_words
+from search.utils import search_posts, search_users, search_categories
 
 
 class CustomPageNumberPagination(PageNumberPagination):
@@ -41,27 +40,23 @@ class CustomPageNumberPagination(PageNumberPagination):
         })
 
 
-class RankedPostsCursorPagination(CursorPagination):
-    page_size = 10
-    ordering = '-ranking_score'
-
-
 class PostViewSet(viewsets.ModelViewSet):
     queryset = Post.objects.all()
     serializer_class = PostSerializer
     permission_classes = [IsGetOrIsAuthenticated]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['contributor']
- 
 
-    def perform_create(self, serializer):
-        title = serializer.validated_data.get('title', '')
-        if contains_banned_words(title):
-            raise ValidationError({"error": "Post title contains banned words."})
+    def get_queryset(self):
+        return prefetch_post_list(super().get_queryset(), self.request)
 
-        description = serializer.validated_data.get('description', '')
-        if contains_banned_words(description):
-            raise ValidationError({"error": "Post description contains banned words."})
+    def perform_create(self, serializer):
+        banned_fields = fields_with_banned_words({
+            'title': serializer.validated_data.get('title', ''),
+            'description': serializer.validated_data.get('description', ''),
+        })
+        if banned_fields:
+            raise ValidationError({"error": f"Post {banned_fields[0]} contains banned words."})
 
         serializer.save(contributor=self.request.user.contributor) 
 
@@ -94,11 +89,9 @@ class PostViewSet(viewsets.ModelViewSet):
         else:
             followed_contributors_ids = []
 
-        posts = Post.objects.annotate(
-            likes_count=Count('likes', distinct=True),
-            follows_count=Count('contributor__user__followers', distinct=True),  # Assuming a reverse relation from User to Follow
-            average_rating=Coalesce(Avg('contributor__reviews__rating'), 0.0),
-        )
+        # Scores are precomputed in PostRanking, only the follow boost depends on the request user.
+        # A Post whose ranking row is missing still shows, with a score of 0
+        posts = Post.objects.all()
 
         if request.user.is_authenticated:
             posts = posts.annotate(
@@ -108,27 +101,17 @@ class PostViewSet(viewsets.ModelViewSet):
                     output_field=IntegerField()
                 ),
                 ranking_score=ExpressionWrapper(
-                    F('is_followed') * Value(1.35) +  # Adjusting weight for follow status
-                    F('likes_count') * Value(0.2) +  # New weight considering follow status
-                    F('follows_count') * Value(0.2) +  # Adjusted weight
-                    F('average_rating') * Value(0.25),  # Adjusted weight
+                    F('is_followed') * Value(FOLLOWED_WEIGHT) + Coalesce(F('ranking__base_score'), Value(0.0)),
                     output_field=FloatField()
                 )
             )
         else:
             # For unauthenticated users, or when follow status doesn't apply
-            posts = posts.annotate(
-                ranking_score=ExpressionWrapper(
-                    F('likes_count') * Value(0.3) +
-                    F('follows_count') * Value(0.3) +
-                    F('average_rating') * Value(0.4),
-                    output_field=FloatField()
-                )
-            )
+            posts = posts.annotate(ranking_score=Coalesce(F('ranking__score'), Value(0.0), output_field=FloatField()))
 
-        posts = posts.order_by('-ranking_score')
+        posts = prefetch_post_list(posts.order_by('-ranking_score', '-id'), request)
 
-        paginator = RankedPostsCursorPagination()
+        paginator = RankedFeedSnapshotPagination()
         page = paginator.paginate_queryset(posts, request, self)
 
         if page is not None:
@@ -156,23 +139,19 @@ class PostViewSet(viewsets.ModelViewSet):
         response_data = {}
 
         if obj_type in [None, "posts"]:  # Return Posts by default or if specified
-            matching_posts = Post.objects.filter(
-                Q(title__icontains=query) | Q(description__icontains=query)
-            ).order_by('-created_at')
+            matching_posts = prefetch_post_list(search_posts(query))
             paginated_posts = paginator.paginate_queryset(matching_posts, request)
             post_serializer = PostSerializer(paginated_posts, many=True)
             response_data["posts"] = paginator.get_paginated_response(post_serializer.data).data
 
         if obj_type in [None, "users"]:  # Return Users if specified or by default
-            tag_matches = Tag.objects.filter(name__icontains=query)
-            matching_contributors = Contributor.objects.filter(tags__in=tag_matches).distinct()
-            matching_users = User.objects.filter(Q(contributor__in=matching_contributors) | Q(name__icontains=query))
+            matching_users = search_users(query)
             paginated_users = paginator.paginate_queryset(matching_users, request)
             user_serializer = UserSerializer(paginated_users, many=True)
             response_data["users"] = paginator.get_paginated_response(user_serializer.data).data
 
         if obj_type in [None, "categories"]:  # Return all matching Categories
-            matching_categories = Category.objects.filter(name__icontains=query).distinct()
+            matching_categories = search_categories(query)
             category_serializer = CategorySerializer(matching_categories, many=True)
             response_data["categories"] = category_serializer.data  # No pagination
 
@@ -207,6 +186,32 @@ class CommentViewSet(viewsets.ModelViewSet):
 
         serializer.save(user=user, parent_comment=parent_comment)
 
+    @action(detail=False, methods=['get'])
+    def threads(self, request):
+        """
+        Cursor-paginated top-level comments of a post, each with its reply count and first replies.
+        """
+        if not request.query_params.get('post'):
+            return Response({"error": "Query parameter 'post' is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        comments = self.filter_queryset(self.get_queryset()).filter(parent_comment__isnull=True).select_related('user')
+        paginator = CommentThreadCursorPagination()
+        page = paginator.paginate_queryset(comments, request, self)
+        serializer = CommentThreadSerializer(page, many=True, context={'request': request})
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=['get'])
+    def replies(self, request, pk=None):
+        """
+        Cursor-paginated direct replies of a comment, used to expand a thread.
+        """
+        comment = self.get_object()
+        replies = Comment.objects.filter(parent_comment=comment).select_related('user')
+        paginator = CommentThreadCursorPagination()
+        page = paginator.paginate_queryset(replies, request, self)
+        serializer = CommentThreadSerializer(page, many=True, context={'request': request})
+        return paginator.get_paginated_response(serializer.data)
+
     @action(detail=True, methods=['post'])
     def like(self, request, pk=None):
         """
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from search.utils import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Recreate the full-text search index of every post and user"
+
+    def handle(self, *args, **kwargs) -> None:
+        post_count, user_count = rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(f"Successfully indexed {post_count} posts and {user_count} users."))
@@ -0,0 +1,117 @@
+# Generated by Django 2.2.28 on 2026-10-18 09:53
+
+from django.conf import settings
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class RunSQLOnPostgreSQL(migrations.RunSQL):
+    """
+    Full-text and trigram indexes only exist on PostgreSQL, other databases skip them
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+def trigram_index(table, column):
+    """
+    A trigram index on UPPER(column::text), the expression icontains compiles
+    to on PostgreSQL, so the lookup can use it
+    """
+    name = f'{table}_{column}_upper_trgm_idx'
+    return RunSQLOnPostgreSQL(
+        f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin ((UPPER({column}::text)) gin_trgm_ops);',
+        f'DROP INDEX IF EXISTS {name};'
+    )
+
+
+def populate_search_index(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    User = apps.get_model('users', 'User')
+    PostSearchIndex = apps.get_model('search', 'PostSearchIndex')
+    UserSearchIndex = apps.get_model('search', 'UserSearchIndex')
+
+    PostSearchIndex.objects.bulk_create(
+        (PostSearchIndex(post_id=post.id, title=post.title, body=post.description)
+         for post in Post.objects.only('id', 'title', 'description').iterator()),
+        batch_size=500
+    )
+
+    user_indexes = []
+    for user in User.objects.prefetch_related('contributor__tags'):
+        names = dict.fromkeys(name for name in (user.name, user.first_name, user.last_name) if name)
+        contributor = getattr(user, 'contributor', None)
+        tags = [tag.name for tag in contributor.tags.all()] if contributor else []
+        user_indexes.append(UserSearchIndex(user_id=user.id, name=' '.join(names), tags=' '.join(tags)))
+    UserSearchIndex.objects.bulk_create(user_indexes, batch_size=500)
+
+    if schema_editor.connection.vendor == 'postgresql':
+        PostSearchIndex.objects.update(
+            vector=SearchVector('title', weight='A', config='english') + SearchVector('body', weight='B', config='english')
+        )
+        UserSearchIndex.objects.update(
+            vector=SearchVector('name', weight='A', config='simple') + SearchVector('tags', weight='B', config='simple')
+        )
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('users', '0012_user_is_email_verified'),
+        ('posts', '0005_postranking'),
+        ('categories', '0003_category_created_at'),
+        ('contributors', '0008_auto_20240604_0817'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostSearchIndex',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_index', serialize=False, to='posts.Post')),
+                ('title', models.TextField(blank=True)),
+                ('body', models.TextField(blank=True)),
+                ('vector', django.contrib.postgres.search.SearchVectorField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Post search index',
+            },
+        ),
+        migrations.CreateModel(
+            name='UserSearchIndex',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_index', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('name', models.TextField(blank=True)),
+                ('tags', models.TextField(blank=True)),
+                ('vector', django.contrib.postgres.search.SearchVectorField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'User search index',
+            },
+        ),
+        RunSQLOnPostgreSQL('CREATE EXTENSION IF NOT EXISTS pg_trgm;', migrations.RunSQL.noop),
+        RunSQLOnPostgreSQL(
+            'CREATE INDEX IF NOT EXISTS search_postsearchindex_vector_idx ON search_postsearchindex USING gin (vector);',
+            'DROP INDEX IF EXISTS search_postsearchindex_vector_idx;'
+        ),
+        RunSQLOnPostgreSQL(
+            'CREATE INDEX IF NOT EXISTS search_usersearchindex_vector_idx ON search_usersearchindex USING gin (vector);',
+            'DROP INDEX IF EXISTS search_usersearchindex_vector_idx;'
+        ),
+        trigram_index('search_postsearchindex', 'title'),
+        trigram_index('search_postsearchindex', 'body'),
+        trigram_index('search_usersearchindex', 'name'),
+        trigram_index('search_usersearchindex', 'tags'),
+        trigram_index('categories_category', 'name'),
+        trigram_index('contributors_tag', 'name'),
+        migrations.RunPython(populate_search_index, migrations.RunPython.noop),
+    ]
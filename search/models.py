@@ -0,0 +1,58 @@
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models
+
+from posts.models import Post
+from users.models import User
+
+
+class PostSearchIndex(models.Model):
+    """
+    A model to store the searchable text of a Post. On PostgreSQL the vector
+    column holds the weighted full-text vector, backed by GIN indexes created
+    in the migrations
+    """
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='search_index'
+    )
+    title = models.TextField(
+        blank=True
+    )
+    body = models.TextField(
+        blank=True
+    )
+    vector = SearchVectorField(
+        null=True,
+        blank=True
+    )
+
+    class Meta:
+        verbose_name_plural = "Post search index"
+
+
+class UserSearchIndex(models.Model):
+    """
+    A model to store the searchable text of a User profile: their names and,
+    for Contributors, their tag names
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='search_index'
+    )
+    name = models.TextField(
+        blank=True
+    )
+    tags = models.TextField(
+        blank=True
+    )
+    vector = SearchVectorField(
+        null=True,
+        blank=True
+    )
+
+    class Meta:
+        verbose_name_plural = "User search index"
@@ -0,0 +1,104 @@
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from categories.models import Category
+from contributors.models import Contributor, Tag
+from posts.models import Post
+from users.models import User
+
+from .utils import index_posts, index_users
+from .suggest import (
+    CONTRIBUTOR_NAME_FIELDS, contributor_name, update_contributor_suggestion, remove_contributor_suggestion,
+    update_tag_suggestion, remove_tag_suggestion,
+    update_category_suggestion, remove_category_suggestion
+)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, **kwargs):
+    index_posts([instance])
+
+
+@receiver(post_init, sender=User)
+def user_loaded(sender, instance, **kwargs):
+    # Lets user_saved tell whether the name was changed, without loading deferred fields
+    if not instance.get_deferred_fields().intersection(CONTRIBUTOR_NAME_FIELDS):
+        instance._suggestion_name = contributor_name(instance)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields, **kwargs):
+    # Saves of other fields, like last_login on every login, leave the index as it is
+    if update_fields is not None and not set(update_fields).intersection(CONTRIBUTOR_NAME_FIELDS):
+        return
+    index_users([instance])
+
+    name = contributor_name(instance)
+    if not created and name == getattr(instance, '_suggestion_name', None):
+        return
+    instance._suggestion_name = name
+    contributor = Contributor.objects.filter(user=instance).first()
+    if contributor:
+        transaction.on_commit(lambda: update_contributor_suggestion(contributor))
+
+
+@receiver(m2m_changed, sender=Contributor.tags.through)
+def contributor_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            index_users([instance.user])
+        return
+
+    # Tags edited from the Tag side, pk_set holds Contributor ids
+    if action == 'pre_clear':
+        instance._search_user_ids = list(instance.contributors.values_list('user_id', flat=True))
+    elif action == 'post_clear':
+        index_users(User.objects.filter(id__in=getattr(instance, '_search_user_ids', [])))
+    elif action in ('post_add', 'post_remove'):
+        index_users(User.objects.filter(contributor__id__in=pk_set))
+
+
+@receiver(post_save, sender=Tag)
+def tag_saved(sender, instance, created, **kwargs):
+    if not created:
+        index_users(User.objects.filter(contributor__tags=instance))
+    transaction.on_commit(lambda: update_tag_suggestion(instance))
+
+
+@receiver(pre_delete, sender=Tag)
+def tag_deleting(sender, instance, **kwargs):
+    instance._search_user_ids = list(instance.contributors.values_list('user_id', flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+def tag_deleted(sender, instance, **kwargs):
+    index_users(User.objects.filter(id__in=getattr(instance, '_search_user_ids', [])))
+    tag_id = instance.id
+    transaction.on_commit(lambda: remove_tag_suggestion(tag_id))
+
+
+# Suggestions are only updated once the change is committed, so other
+# processes never rebuild their index from uncommitted data
+
+@receiver(post_save, sender=Contributor)
+def contributor_saved(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: update_contributor_suggestion(instance))
+
+
+@receiver(post_delete, sender=Contributor)
+def contributor_deleted(sender, instance, **kwargs):
+    contributor_id = instance.id
+    transaction.on_commit(lambda: remove_contributor_suggestion(contributor_id))
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, **kwargs):
+    transaction.on_commit(lambda: update_category_suggestion(instance))
+
+
+@receiver(post_delete, sender=Category)
+def category_deleted(sender, instance, **kwargs):
+    category_id = instance.id
+    transaction.on_commit(lambda: remove_category_suggestion(category_id))
@@ -0,0 +1,265 @@
+import heapq
+import re
+import threading
+import time
+
+from django.core.cache import cache
+
+from categories.models import Category
+from contributors.models import Contributor, Tag
+
+
+CONTRIBUTOR = 'contributor'
+TAG = 'tag'
+CATEGORY = 'category'
+SUGGESTION_TYPES = (CONTRIBUTOR, TAG, CATEGORY)
+
+# Bumped on every change so each process knows when its copy of the index is stale
+VERSION_CACHE_KEY = 'suggest_index:version'
+# Seconds a process serves its index before it checks the version again, so a
+# process rebuilds at most once per interval however often the others write
+VERSION_CHECK_INTERVAL = 10
+
+
+def _words(label):
+    return set(re.findall(r'\w+', label.lower()))
+
+
+def _new_node():
+    return {'children': {}, 'keys': set()}
+
+
+class PrefixTrie:
+    """
+    A prefix tree over the words of the suggestion labels. Every node keeps the
+    keys of all the entries below it, so a lookup is a single walk down the prefix
+    """
+
+    def __init__(self):
+        self.root = _new_node()
+        self.entries = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _find(self, prefix):
+        node = self.root
+        for char in prefix:
+            node = node['children'].get(char)
+            if node is None:
+                return None
+        return node
+
+    def insert(self, key, entry):
+        self.remove(key)
+        self.entries[key] = entry
+        for word in _words(entry['name']):
+            node = self.root
+            node['keys'].add(key)
+            for char in word:
+                node = node['children'].setdefault(char, _new_node())
+                node['keys'].add(key)
+
+    def remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        for word in _words(entry['name']):
+            node = self.root
+            node['keys'].discard(key)
+            for char in word:
+                child = node['children'].get(char)
+                if child is None:
+                    break
+                child['keys'].discard(key)
+                if not child['keys']:
+                    # Nothing else lives below this branch
+                    del node['children'][char]
+                    break
+                node = child
+
+    def search(self, query, types=SUGGESTION_TYPES, limit=10):
+        """
+        Returns the entries having a word starting with every word of the query.
+        Safe to run while the trie is changed: each set of keys is copied in a
+        single step and the entries removed in the meantime are skipped
+        """
+        matches = None
+        for word in _words(query):
+            node = self._find(word)
+            if node is None:
+                return []
+            matches = set(node['keys']) if matches is None else matches & node['keys']
+        if not matches:
+            return []
+
+        query = query.strip().lower()
+        entries = [self.entries.get(key) for key in matches if key[0] in types]
+        entries = (entry for entry in entries if entry is not None)
+        # Labels starting with the whole query come first, then the shortest ones
+        return heapq.nsmallest(
+            limit,
+            entries,
+            key=lambda entry: (not entry['name'].lower().startswith(query), len(entry['name']), entry['name'])
+        )
+
+
+# The User fields the label of a contributor is made of
+CONTRIBUTOR_NAME_FIELDS = ('name', 'first_name', 'last_name')
+
+
+def contributor_name(user):
+    return user.name or ' '.join(name for name in (user.first_name, user.last_name) if name)
+
+
+def _contributor_entry(contributor):
+    user = contributor.user
+    return {'type': CONTRIBUTOR, 'id': contributor.id, 'user_id': user.id, 'name': contributor_name(user)}
+
+
+def _tag_entry(tag):
+    return {'type': TAG, 'id': tag.id, 'name': tag.name}
+
+
+def _category_entry(category):
+    return {'type': CATEGORY, 'id': category.id, 'name': category.name}
+
+
+def _build_trie():
+    trie = PrefixTrie()
+    for contributor in Contributor.objects.select_related('user'):
+        _insert(trie, CONTRIBUTOR, contributor.id, _contributor_entry(contributor))
+    for tag in Tag.objects.filter(active=True):
+        _insert(trie, TAG, tag.id, _tag_entry(tag))
+    for category in Category.objects.all():
+        _insert(trie, CATEGORY, category.id, _category_entry(category))
+    return trie
+
+
+def _insert(trie, kind, obj_id, entry):
+    if entry['name']:
+        trie.insert((kind, obj_id), entry)
+    else:
+        trie.remove((kind, obj_id))
+
+
+class SuggestionIndex:
+    """
+    The in-process typeahead index. Saves update the local trie in place and bump
+    a version stamp in the shared cache. Every process checks the stamp at most
+    every VERSION_CHECK_INTERVAL seconds and rebuilds its copy when it moved.
+
+    Lookups never wait on a lock: one thread rebuilds the trie while the others
+    keep serving the current one, which is swapped once the new one is complete
+    """
+
+    def __init__(self):
+        # Serializes the changes made to the trie in place
+        self._lock = threading.Lock()
+        # Held by the thread rebuilding the trie
+        self._build_lock = threading.Lock()
+        self._trie = None
+        self._version = None
+        self._next_check = 0
+
+    def _shared_version(self):
+        version = cache.get(VERSION_CACHE_KEY)
+        if version is None:
+            cache.add(VERSION_CACHE_KEY, 0, timeout=None)
+            version = cache.get(VERSION_CACHE_KEY, 0)
+        return version
+
+    def _bump_shared_version(self):
+        try:
+            return cache.incr(VERSION_CACHE_KEY)
+        except ValueError:
+            # The stamp was evicted, start over from a new one
+            cache.add(VERSION_CACHE_KEY, 0, timeout=None)
+            return cache.incr(VERSION_CACHE_KEY)
+
+    def _refresh(self):
+        # Called with the build lock held
+        version = self._shared_version()
+        if self._trie is None or self._version != version:
+            trie = _build_trie()
+            with self._lock:
+                self._trie = trie
+                self._version = version
+        self._next_check = time.monotonic() + VERSION_CHECK_INTERVAL
+
+    def _current_trie(self):
+        if self._trie is not None and time.monotonic() < self._next_check:
+            return self._trie
+        # Threads finding another one rebuilding serve the trie they have, unless there is none yet
+        if self._build_lock.acquire(blocking=self._trie is None):
+            try:
+                if self._trie is None or time.monotonic() >= self._next_check:
+                    self._refresh()
+            finally:
+                self._build_lock.release()
+        return self._trie
+
+    def search(self, query, types=SUGGESTION_TYPES, limit=10):
+        return self._current_trie().search(query, types=types, limit=limit)
+
+    def update(self, kind, obj_id, entry=None):
+        """
+        Inserts, replaces or, without an entry, removes a single suggestion
+        """
+        version = self._bump_shared_version()
+        with self._lock:
+            if self._trie is None:
+                return
+            if entry is None:
+                self._trie.remove((kind, obj_id))
+            else:
+                _insert(self._trie, kind, obj_id, entry)
+            # Only keep the local trie current if no other process changed it in between
+            if self._version is not None and version == self._version + 1:
+                self._version = version
+            else:
+                self._version = None
+
+    def rebuild(self):
+        with self._build_lock:
+            version = self._bump_shared_version()
+            trie = _build_trie()
+            with self._lock:
+                self._trie = trie
+                self._version = version
+            self._next_check = time.monotonic() + VERSION_CHECK_INTERVAL
+        return len(trie)
+
+
+suggestion_index = SuggestionIndex()
+
+
+def suggest(query, types=SUGGESTION_TYPES, limit=10):
+    return suggestion_index.search(query, types=types, limit=limit)
+
+
+def update_contributor_suggestion(contributor):
+    suggestion_index.update(CONTRIBUTOR, contributor.id, _contributor_entry(contributor))
+
+
+def remove_contributor_suggestion(contributor_id):
+    suggestion_index.update(CONTRIBUTOR, contributor_id)
+
+
+def update_tag_suggestion(tag):
+    if tag.active:
+        suggestion_index.update(TAG, tag.id, _tag_entry(tag))
+    else:
+        suggestion_index.update(TAG, tag.id)
+
+
+def remove_tag_suggestion(tag_id):
+    suggestion_index.update(TAG, tag_id)
+
+
+def update_category_suggestion(category):
+    suggestion_index.update(CATEGORY, category.id, _category_entry(category))
+
+
+def remove_category_suggestion(category_id):
+    suggestion_index.update(CATEGORY, category_id)
@@ -0,0 +1,147 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection, transaction
+from django.db.models import F, Q
+
+from categories.models import Category
+from posts.models import Post
+from users.models import User
+
+from .models import PostSearchIndex, UserSearchIndex
+
+
+# Posts are matched with stemming, names and tags are matched as they are written
+POST_SEARCH_CONFIG = 'english'
+USER_SEARCH_CONFIG = 'simple'
+
+
+def is_full_text_search_available():
+    """
+    Full-text vectors and their indexes only exist on PostgreSQL, other
+    databases (SQLite in local development and tests) fall back to icontains
+    """
+    return connection.vendor == 'postgresql'
+
+
+def _post_search_vector():
+    return (
+        SearchVector('title', weight='A', config=POST_SEARCH_CONFIG) +
+        SearchVector('body', weight='B', config=POST_SEARCH_CONFIG)
+    )
+
+
+def _user_search_vector():
+    return (
+        SearchVector('name', weight='A', config=USER_SEARCH_CONFIG) +
+        SearchVector('tags', weight='B', config=USER_SEARCH_CONFIG)
+    )
+
+
+def _user_document(user):
+    names = dict.fromkeys(name for name in (user.name, user.first_name, user.last_name) if name)
+    contributor = getattr(user, 'contributor', None)
+    tags = [tag.name for tag in contributor.tags.all()] if contributor else []
+    return {'name': ' '.join(names), 'tags': ' '.join(tags)}
+
+
+def index_posts(posts):
+    """
+    Creates or refreshes the search index rows of the given Posts
+    """
+    posts = list(posts)
+    for post in posts:
+        PostSearchIndex.objects.update_or_create(
+            post=post,
+            defaults={'title': post.title, 'body': post.description}
+        )
+    if is_full_text_search_available():
+        PostSearchIndex.objects.filter(post__in=posts).update(vector=_post_search_vector())
+
+
+def index_users(users):
+    """
+    Creates or refreshes the search index rows of the given Users
+    """
+    users = list(users)
+    for user in users:
+        UserSearchIndex.objects.update_or_create(user=user, defaults=_user_document(user))
+    if is_full_text_search_available():
+        UserSearchIndex.objects.filter(user__in=users).update(vector=_user_search_vector())
+
+
+def rebuild_search_index(batch_size=500):
+    """
+    Recreates the search index rows of every Post and User
+    """
+    with transaction.atomic():
+        PostSearchIndex.objects.all().delete()
+        PostSearchIndex.objects.bulk_create(
+            (PostSearchIndex(post_id=post.id, title=post.title, body=post.description)
+             for post in Post.objects.only('id', 'title', 'description').iterator()),
+            batch_size=batch_size
+        )
+        UserSearchIndex.objects.all().delete()
+        UserSearchIndex.objects.bulk_create(
+            [UserSearchIndex(user_id=user.id, **_user_document(user))
+             for user in User.objects.select_related('contributor').prefetch_related('contributor__tags')],
+            batch_size=batch_size
+        )
+        if is_full_text_search_available():
+            PostSearchIndex.objects.update(vector=_post_search_vector())
+            UserSearchIndex.objects.update(vector=_user_search_vector())
+    return PostSearchIndex.objects.count(), UserSearchIndex.objects.count()
+
+
+def _prefix_search_query(query, config):
+    """
+    Turns the raw user input into a tsquery matching every word as a prefix,
+    so partial words typed so far still match
+    """
+    terms = re.findall(r'\w+', query)
+    if not terms:
+        return None
+    return SearchQuery(' & '.join(f'{term}:*' for term in terms), search_type='raw', config=config)
+
+
+def search_posts(query):
+    """
+    Returns the Posts matching the query, the most relevant first. On PostgreSQL
+    every branch of the filter has its own index on search_postsearchindex, the
+    vector a GIN index and icontains the trigram indexes on UPPER(column::text),
+    so the OR is answered with a bitmap OR of the three.
+    """
+    substring_match = Q(search_index__title__icontains=query) | Q(search_index__body__icontains=query)
+    search_query = _prefix_search_query(query, POST_SEARCH_CONFIG)
+    if not is_full_text_search_available() or search_query is None:
+        return Post.objects.filter(substring_match).order_by('-created_at')
+
+    return Post.objects.filter(
+        Q(search_index__vector=search_query) | substring_match
+    ).annotate(
+        rank=SearchRank(F('search_index__vector'), search_query)
+    ).order_by('-rank', '-created_at')
+
+
+def search_users(query):
+    """
+    Returns the Users whose name or Contributor tags match the query, the most
+    relevant first, indexed like search_posts
+    """
+    substring_match = Q(search_index__name__icontains=query) | Q(search_index__tags__icontains=query)
+    search_query = _prefix_search_query(query, USER_SEARCH_CONFIG)
+    if not is_full_text_search_available() or search_query is None:
+        return User.objects.filter(substring_match).order_by('id')
+
+    return User.objects.filter(
+        Q(search_index__vector=search_query) | substring_match
+    ).annotate(
+        rank=SearchRank(F('search_index__vector'), search_query)
+    ).order_by('-rank', 'id')
+
+
+def search_categories(query):
+    """
+    Returns the Categories whose name contains the query, backed by a trigram index on UPPER(name::text) on PostgreSQL
+    """
+    return Category.objects.filter(name__icontains=query).order_by('name')
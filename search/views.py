@@ -0,0 +1,39 @@
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from home.permissions import IsGetOrIsAuthenticated
+
+from .suggest import SUGGESTION_TYPES, suggest
+
+
+class SuggestView(APIView):
+    """
+    Typeahead suggestions of Contributor, Tag and Category names, served from
+    the in-process prefix index without touching the database
+    """
+    permission_classes = [IsGetOrIsAuthenticated]
+    default_limit = 10
+    max_limit = 25
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({"error": "Query parameter 'q' is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        types = SUGGESTION_TYPES
+        obj_type = request.query_params.get('type')
+        if obj_type:
+            types = tuple(obj_type.split(','))
+            if any(t not in SUGGESTION_TYPES for t in types):
+                return Response(
+                    {"error": f"Invalid type parameter. Choose from {', '.join(SUGGESTION_TYPES)}."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        try:
+            limit = min(int(request.query_params.get('limit', self.default_limit)), self.max_limit)
+        except ValueError:
+            return Response({"error": "limit must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({"results": suggest(query, types=types, limit=max(limit, 1))}, status=status.HTTP_200_OK)
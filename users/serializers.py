@@ -113,12 +113,16 @@ class UserSerializer(serializers.ModelSerializer):
     def get_is_blocked(self, obj):
         request = self.context.get('request', None)
         if request and hasattr(request, 'user') and request.user.is_authenticated:
+            if 'blocked_user_ids' in self.context:
+                return obj.pk in self.context['blocked_user_ids']
             return request.user.blocked_users.filter(pk=obj.pk).exists()
         return False
 
     def get_is_followed(self, obj):
         request = self.context.get('request', None)
         if request and hasattr(request, 'user') and request.user.is_authenticated:
+            if 'followed_user_ids' in self.context:
+                return obj.pk in self.context['followed_user_ids']
             return Follow.objects.filter(follower=request.user, followed=obj).exists()
         return False
 
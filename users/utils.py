@@ -0,0 +1,35 @@
+from django.db.models import Count
+
+from contributors.models import Contributor
+from contributors.utils import get_contributor_stats
+from .models import Follow
+
+
+def get_user_serializer_context(users, request=None):
+    """
+    Precomputes, for a page of Users, everything UserSerializer would otherwise
+    query once per User: the contributor stats, the contributor counts of their
+    categories and whether the request user blocks or follows them
+    """
+    users = list(users)
+    user_ids = [user.id for user in users]
+    contributors = [user.contributor for user in users if hasattr(user, 'contributor')]
+    category_ids = {contributor.category_id for contributor in contributors if contributor.category_id}
+
+    context = {
+        'contributor_stats': get_contributor_stats(contributors),
+        'category_contributor_counts': dict(
+            Contributor.objects.filter(category_id__in=category_ids)
+            .values('category_id').annotate(count=Count('id')).values_list('category_id', 'count')
+        ) if category_ids else {},
+    }
+
+    user = getattr(request, 'user', None)
+    if user and user.is_authenticated:
+        context['blocked_user_ids'] = set(
+            user.blocked_users.filter(pk__in=user_ids).values_list('pk', flat=True)
+        )
+        context['followed_user_ids'] = set(
+            Follow.objects.filter(follower=user, followed_id__in=user_ids).values_list('followed_id', flat=True)
+        )
+    return context